@@ -4,5 +4,13 @@ CELERY_BEAT_SCHEDULE = {
     "check_repositories_update": {
         "task": "pilot.tasks.check_users_repositories_update",
         "schedule": crontab(minute="*/1"),
-    }
+    },
+    "flush_task_outcomes": {
+        "task": "pilot.tasks.flush_task_outcomes",
+        "schedule": crontab(minute="*/5"),
+    },
+    "prune_task_results": {
+        "task": "pilot.tasks.prune_task_results",
+        "schedule": crontab(minute=30),
+    },
 }
@@ -0,0 +1,132 @@
+import json
+import logging
+import random
+
+# Attributes every LogRecord has; anything else on a record came from `extra`.
+RESERVED_ATTRS = frozenset(
+    vars(logging.LogRecord("", logging.INFO, "", 0, "", (), None))
+) | {"message", "asctime", "sampled"}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats log records as single-line JSON objects.
+
+    The message is only interpolated here, so records dropped by level or sampling
+    never pay for it. Values passed through `extra` become top-level keys.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in RESERVED_ATTRS:
+                payload[key] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps a random share of the records of each logger.
+
+    Rates are matched on the longest logger-name prefix, so "pilot" covers
+    "pilot.clients" unless the latter has a rate of its own. Loggers without a rate
+    are not sampled, and records at WARNING or above always pass, as do records
+    already sampled by the caller through `sampled`.
+
+    Args:
+        rates (dict[str, float] | None): Share of records to keep per logger name.
+    """
+
+    def __init__(self, rates: dict[str, float] | None = None):
+        super().__init__()
+        self.rates = rates or {}
+        self._resolved: dict[str, float] = {}
+
+    def _rate(self, name: str) -> float:
+        rate = self._resolved.get(name)
+        if rate is None:
+            prefix = max(
+                (
+                    prefix
+                    for prefix in self.rates
+                    if name == prefix or name.startswith(f"{prefix}.")
+                ),
+                key=len,
+                default=None,
+            )
+            rate = self.rates[prefix] if prefix is not None else 1.0
+            self._resolved[name] = rate
+        return rate
+
+    def configure(self, rates: dict[str, float] | None) -> None:
+        self.rates = rates or {}
+        self._resolved.clear()
+
+    def keep(self, name: str) -> bool:
+        rate = self._rate(name)
+        return rate >= 1.0 or random.random() < rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or getattr(record, "sampled", False):
+            return True
+        return self.keep(record.name)
+
+
+_sampling_filter = SamplingFilter()
+
+
+def get_sampling_filter(rates: dict[str, float] | None = None) -> SamplingFilter:
+    """
+    Configures and returns the sampling filter shared by LOGGING and `sampled`.
+
+    Args:
+        rates (dict[str, float] | None): Share of records to keep per logger name.
+
+    Returns:
+        SamplingFilter: The shared filter.
+    """
+    _sampling_filter.configure(rates)
+    return _sampling_filter
+
+
+def sampled(logger: logging.Logger, level: int = logging.INFO) -> bool:
+    """
+    Decides up front whether a record would survive level filtering and sampling.
+
+    Hot paths call this before building a record and pass `extra={"sampled": True}`
+    when logging, so the record is not sampled a second time by the handler.
+
+    Args:
+        logger (logging.Logger): The logger the record would go to.
+        level (int): The level of the record.
+
+    Returns:
+        bool: True if the record should be logged.
+    """
+    if not logger.isEnabledFor(level):
+        return False
+    return level >= logging.WARNING or _sampling_filter.keep(logger.name)
+
+
+def parse_sampling_rates(value: str) -> dict[str, float]:
+    """
+    Parses sampling rates written as "logger=rate" pairs separated by commas.
+
+    Args:
+        value (str): The rates, e.g. "pilot.clients=0.01,pilot.tasks=0.1".
+
+    Returns:
+        dict[str, float]: The sampling rate of each logger.
+    """
+    rates = {}
+    for pair in filter(None, (item.strip() for item in value.split(","))):
+        name, rate = pair.split("=")
+        rates[name.strip()] = float(rate)
+    return rates
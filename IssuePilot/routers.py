@@ -0,0 +1,97 @@
+import contextvars
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+
+REPLICA_ALIAS = "replica"
+
+_read_alias: contextvars.ContextVar[str | None] = contextvars.ContextVar(
+    "read_alias", default=None
+)
+
+
+def _has_replica() -> bool:
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+def _get_pin_key(user_id: int) -> str:
+    return f"db_primary_pin:{user_id}"
+
+
+def pin_to_primary(user_id: int) -> None:
+    """
+    Sends the replica reads of a user to the primary for a while after a write,
+    so the user reads their own writes while the replicas catch up.
+
+    Args:
+        user_id (int): The ID of the user who wrote.
+    """
+    cache.set(_get_pin_key(user_id), 1, settings.DB_REPLICA_PIN_SECONDS)
+
+
+@contextmanager
+def read_from_replica(user_id: int | None = None):
+    """
+    Routes the reads made inside the block to the replica.
+
+    Reads stay on the primary when no replica is configured or the user wrote
+    recently. Writes always go to the primary.
+
+    Args:
+        user_id (int | None): The user the reads are made for, if any.
+    """
+    alias = REPLICA_ALIAS if _has_replica() else None
+    if alias and user_id is not None and cache.get(_get_pin_key(user_id)):
+        alias = None
+    token = _read_alias.set(alias)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+@contextmanager
+def read_from_primary():
+    """
+    Routes the reads made inside the block back to the primary, for reads that
+    decide what to write or lock rows, inside an otherwise read-only path.
+    """
+    token = _read_alias.set(None)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def iter_from_replica(items: Iterator, user_id: int | None = None) -> Iterator:
+    """
+    Iterates a lazy iterator with its reads routed to the replica, for responses
+    that are consumed after the view returned.
+
+    Args:
+        items (Iterator): The iterator to consume.
+        user_id (int | None): The user the reads are made for, if any.
+    """
+    with read_from_replica(user_id):
+        yield from items
+
+
+class ReplicaRouter:
+    """
+    Database router that sends reads made inside read_from_replica to the
+    replica and everything else to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == "default"
@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 import os
 from pathlib import Path
 
+from IssuePilot.log import parse_sampling_rates
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -44,6 +46,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     # Local apps
     "pilot",
     "users",
@@ -58,6 +61,7 @@ if not DEBUG:
 
 
 MIDDLEWARE = [
+    "IssuePilot.tracing.TracingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -92,6 +96,14 @@ WSGI_APPLICATION = "IssuePilot.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# Every process shares one connection pool per database between its threads or
+# greenlets. Size DB_POOL_MAX_SIZE to the queries a process runs at once, not to
+# its concurrency: a gevent worker with -c 200 rarely needs more than 20.
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", default="2"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", default="10"))
+# Seconds to wait for a free connection before the query fails.
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", default="10"))
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.postgresql",
@@ -100,9 +112,29 @@ DATABASES = {
         "PASSWORD": os.getenv("DB_PASSWORD", default="password"),
         "HOST": os.getenv("DB_HOST", default="localhost"),
         "PORT": os.getenv("DB_PORT", default="5432"),
+        # Django checks pooled connections before it hands them out.
+        "OPTIONS": {
+            "pool": {
+                "min_size": DB_POOL_MIN_SIZE,
+                "max_size": DB_POOL_MAX_SIZE,
+                "timeout": DB_POOL_TIMEOUT,
+            }
+        },
     }
 }
 
+# Read-only paths read from the replica when DB_REPLICA_HOST is set.
+if DB_REPLICA_HOST := os.getenv("DB_REPLICA_HOST"):
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "HOST": DB_REPLICA_HOST,
+        "PORT": os.getenv("DB_REPLICA_PORT", default=DATABASES["default"]["PORT"]),
+        "TEST": {"MIRROR": "default"},
+    }
+DATABASE_ROUTERS = ["IssuePilot.routers.ReplicaRouter"]
+# Seconds a user's reads stay on the primary after they change subscriptions.
+DB_REPLICA_PIN_SECONDS = int(os.getenv("DB_REPLICA_PIN_SECONDS", default="10"))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -152,6 +184,35 @@ CACHES = {
     }
 }
 
+# Cache of the pilot app: bumping PILOT_CACHE_VERSION drops every cached value.
+PILOT_CACHE_VERSION = int(os.getenv("PILOT_CACHE_VERSION", default="1"))
+# Seconds a process keeps the generation of a cache namespace before rereading it.
+PILOT_CACHE_GENERATION_TTL = float(os.getenv("PILOT_CACHE_GENERATION_TTL", default="5"))
+# Size in bytes from which cached values are compressed.
+PILOT_CACHE_COMPRESS_MIN_SIZE = int(
+    os.getenv("PILOT_CACHE_COMPRESS_MIN_SIZE", default="1024")
+)
+
+# API throttling: requests allowed per user, or per client address when anonymous,
+# for each throttle scope. NUM_PROXIES is the number of proxies in front of the
+# app, used to find the client address in X-Forwarded-For.
+REST_FRAMEWORK = {
+    "DEFAULT_THROTTLE_RATES": {
+        "subscribe": os.getenv("THROTTLE_RATE_SUBSCRIBE", default="60/min"),
+        "history": os.getenv("THROTTLE_RATE_HISTORY", default="30/min"),
+        "read": os.getenv("THROTTLE_RATE_READ", default="120/min"),
+        "register": os.getenv("THROTTLE_RATE_REGISTER", default="10/hour"),
+        "account": os.getenv("THROTTLE_RATE_ACCOUNT", default="30/min"),
+    },
+    "NUM_PROXIES": int(os.getenv("THROTTLE_NUM_PROXIES", default="1")),
+}
+
+# API token authentication cache: seconds a token is kept in Redis, and in the
+# LRU of each process, which is only invalidated in the process that changed it.
+AUTH_CACHE_TTL = int(os.getenv("AUTH_CACHE_TTL", default="60"))
+AUTH_LOCAL_CACHE_TTL = float(os.getenv("AUTH_LOCAL_CACHE_TTL", default="5"))
+AUTH_LOCAL_CACHE_SIZE = int(os.getenv("AUTH_LOCAL_CACHE_SIZE", default="10000"))
+
 # Celery Configuration Options
 CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", default="django-db")
 CELERY_BROKER_URL = os.getenv(
@@ -165,19 +226,151 @@ CELERY_ACCEPT_CONTENT = ["application/json"]
 CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = True
 CELERY_TASK_DEFAULT_QUEUE = "default"
 
+# Polling and email tasks skip storing a result per invocation; their outcomes are
+# rolled up into TaskOutcomeStat rows every TASK_STATS_WINDOW seconds instead.
+POLLING_TASKS_IGNORE_RESULT = os.getenv(
+    "POLLING_TASKS_IGNORE_RESULT", default="True"
+).lower() in ("yes", "true", "t", "1")
+TASK_STATS_WINDOW = int(os.getenv("TASK_STATS_WINDOW", default="300"))
+TASK_RESULT_RETENTION_DAYS = int(os.getenv("TASK_RESULT_RETENTION_DAYS", default="7"))
+TASK_RESULT_PRUNE_BATCH_SIZE = int(
+    os.getenv("TASK_RESULT_PRUNE_BATCH_SIZE", default="1000")
+)
+# Upper bound of the random delay, in seconds, added to task retries.
+TASK_RETRY_JITTER = int(os.getenv("TASK_RETRY_JITTER", default="30"))
+
+# GitHub client
+# "http1" opens a connection per in-flight request, "http2" multiplexes them.
+GITHUB_HTTP_TRANSPORT = os.getenv("GITHUB_HTTP_TRANSPORT", default="http1")
+# Connections kept open to GitHub per process, match the worker concurrency (-c).
+GITHUB_HTTP_POOL_SIZE = int(os.getenv("GITHUB_HTTP_POOL_SIZE", default="200"))
+# Hourly request budget of a token whose rate limit state is unknown.
+GITHUB_TOKEN_BUDGET = int(os.getenv("GITHUB_TOKEN_BUDGET", default="5000"))
+# Requests left untouched by polling on each token for its owner's own use.
+GITHUB_TOKEN_RESERVE = int(os.getenv("GITHUB_TOKEN_RESERVE", default="100"))
+# Per-token pacing in each process: requests in flight and requests per second.
+GITHUB_TOKEN_CONCURRENCY = int(os.getenv("GITHUB_TOKEN_CONCURRENCY", default="20"))
+GITHUB_TOKEN_RATE = float(os.getenv("GITHUB_TOKEN_RATE", default="10"))
+# Number of pages of a paginated GitHub endpoint fetched at the same time.
+GITHUB_PAGE_FETCH_CONCURRENCY = int(
+    os.getenv("GITHUB_PAGE_FETCH_CONCURRENCY", default="8")
+)
+# Seconds a token is left alone after a secondary rate limit without Retry-After.
+GITHUB_SECONDARY_RATE_LIMIT_BACKOFF = int(
+    os.getenv("GITHUB_SECONDARY_RATE_LIMIT_BACKOFF", default="60")
+)
+
+# Circuit breaker: opens when FAILURE_RATE of at least MIN_REQUESTS requests in a
+# WINDOW (seconds) fail, stays open OPEN_SECONDS, then lets one probe through per
+# PROBE_INTERVAL seconds.
+GITHUB_CIRCUIT_FAILURE_RATE = float(
+    os.getenv("GITHUB_CIRCUIT_FAILURE_RATE", default="0.5")
+)
+GITHUB_CIRCUIT_MIN_REQUESTS = int(
+    os.getenv("GITHUB_CIRCUIT_MIN_REQUESTS", default="20")
+)
+GITHUB_CIRCUIT_WINDOW = int(os.getenv("GITHUB_CIRCUIT_WINDOW", default="30"))
+GITHUB_CIRCUIT_OPEN_SECONDS = int(
+    os.getenv("GITHUB_CIRCUIT_OPEN_SECONDS", default="30")
+)
+GITHUB_CIRCUIT_PROBE_INTERVAL = int(
+    os.getenv("GITHUB_CIRCUIT_PROBE_INTERVAL", default="5")
+)
+# Adaptive concurrency: the per-process limit shrinks when requests take longer
+# than the target (seconds) and never drops below the minimum.
+GITHUB_LATENCY_TARGET = float(os.getenv("GITHUB_LATENCY_TARGET", default="2.0"))
+GITHUB_MIN_CONCURRENCY = int(os.getenv("GITHUB_MIN_CONCURRENCY", default="4"))
+
+# Repository metadata cache, in seconds.
+REPOSITORY_CACHE_TIMEOUT = int(os.getenv("REPOSITORY_CACHE_TIMEOUT", default="21600"))
+REPOSITORY_NOT_FOUND_CACHE_TIMEOUT = int(
+    os.getenv("REPOSITORY_NOT_FOUND_CACHE_TIMEOUT", default="600")
+)
+# Age after which a cached repository is refreshed in the background.
+REPOSITORY_CACHE_REFRESH_AFTER = int(
+    os.getenv("REPOSITORY_CACHE_REFRESH_AFTER", default="3600")
+)
+
+# Subscriber index
+# Subscriptions read per query when the Redis subscriber index is rebuilt.
+SUBSCRIBER_INDEX_BATCH_SIZE = int(
+    os.getenv("SUBSCRIBER_INDEX_BATCH_SIZE", default="1000")
+)
+
+# Issue timelines
+# Seconds a stored timeline is served without asking GitHub for newer events.
+TIMELINE_SYNC_INTERVAL = int(os.getenv("TIMELINE_SYNC_INTERVAL", default="300"))
+# Maximum number of timeline events returned per history page.
+TIMELINE_PAGE_SIZE = int(os.getenv("TIMELINE_PAGE_SIZE", default="100"))
+# Number of stored timeline events fetched again on every sync, so events deleted
+# on GitHub don't make the sync skip the new ones.
+TIMELINE_SYNC_OVERLAP = int(os.getenv("TIMELINE_SYNC_OVERLAP", default="100"))
+
+# Issue analytics
+# Default and maximum number of days summarized by the repository stats endpoint.
+ISSUE_STATS_DAYS = int(os.getenv("ISSUE_STATS_DAYS", default="30"))
+ISSUE_STATS_MAX_DAYS = int(os.getenv("ISSUE_STATS_MAX_DAYS", default="365"))
+# Number of labels listed as the most active.
+ISSUE_STATS_TOP_LABELS = int(os.getenv("ISSUE_STATS_TOP_LABELS", default="10"))
+
+# Issue export
+# Number of rows fetched per round trip by the server-side cursors of exports.
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", default="2000"))
+
+# Issue search
+# Postgres text search configuration used to index and query issues.
+SEARCH_CONFIG = os.getenv("SEARCH_CONFIG", default="english")
+# Maximum number of issues returned per search page.
+SEARCH_PAGE_SIZE = int(os.getenv("SEARCH_PAGE_SIZE", default="20"))
+
+# Bulk subscriptions
+BULK_SUBSCRIBE_MAX_ITEMS = int(os.getenv("BULK_SUBSCRIBE_MAX_ITEMS", default="500"))
+# Number of repositories checked against GitHub at the same time.
+GITHUB_CHECK_CONCURRENCY = int(os.getenv("GITHUB_CHECK_CONCURRENCY", default="20"))
+# Number of imported watched and starred repositories linked per bulk query.
+REPOSITORY_IMPORT_BATCH_SIZE = int(
+    os.getenv("REPOSITORY_IMPORT_BATCH_SIZE", default="500")
+)
+
+# Metrics
+# Port of the Prometheus endpoint started inside Celery workers, 0 disables it.
+METRICS_WORKER_PORT = int(os.getenv("METRICS_WORKER_PORT", default="0"))
+
+# Tracing
+# TRACING_EXPORTER is one of "" (disabled), "file" or "otlp".
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", default="")
+TRACING_SERVICE_NAME = os.getenv("TRACING_SERVICE_NAME", default="issuepilot")
+TRACING_FILE = os.getenv("TRACING_FILE", default=str(BASE_DIR / "traces.jsonl"))
+TRACING_OTLP_ENDPOINT = os.getenv(
+    "TRACING_OTLP_ENDPOINT", default="http://localhost:4318/v1/traces"
+)
+
+
+# LOG_FORMAT is "verbose" (plain text) or "json". LOG_SAMPLING_RATES keeps a share of
+# each logger's records below WARNING, e.g. "pilot.clients=0.01,pilot.tasks=0.1".
+LOG_FORMAT = os.getenv("LOG_FORMAT", default="verbose")
+LOG_SAMPLING_RATES = parse_sampling_rates(os.getenv("LOG_SAMPLING_RATES", default=""))
 
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
+    "filters": {
+        "sampling": {
+            "()": "IssuePilot.log.get_sampling_filter",
+            "rates": LOG_SAMPLING_RATES,
+        },
+    },
     "handlers": {
         "console": {
             "level": "INFO",
             "class": "logging.StreamHandler",
-            "formatter": "verbose",
+            "formatter": LOG_FORMAT,
+            "filters": ["sampling"],
         },
     },
     "formatters": {
         "verbose": {"format": "%(levelname)s %(asctime)s %(module)s %(message)s"},
+        "json": {"()": "IssuePilot.log.JsonFormatter"},
     },
     "root": {
         "handlers": ["console"],
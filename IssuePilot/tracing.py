@@ -0,0 +1,180 @@
+import functools
+
+from celery.signals import (
+    after_task_publish,
+    before_task_publish,
+    task_postrun,
+    task_prerun,
+)
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from opentelemetry import context as otel_context
+from opentelemetry import propagate, trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import (
+    BatchSpanProcessor,
+    ConsoleSpanExporter,
+    SpanExporter,
+)
+from opentelemetry.trace import SpanKind, Status, StatusCode
+
+tracer = trace.get_tracer("issuepilot")
+
+_publish_spans: dict[str, trace.Span] = {}
+_task_spans: dict[str, tuple[trace.Span, object]] = {}
+
+
+class FileSpanExporter(ConsoleSpanExporter):
+    """
+    Span exporter that appends finished spans to a local file, one JSON object per line.
+
+    The file stays open while the exporter is in use and is closed on shutdown.
+    """
+
+    def __init__(self, path: str):
+        super().__init__(
+            out=open(path, "a", encoding="utf-8"),  # noqa: SIM115
+            formatter=lambda span: span.to_json(indent=None) + "\n",
+        )
+
+    def shutdown(self) -> None:
+        self.out.close()
+
+
+def _build_exporter() -> SpanExporter | None:
+    """
+    Builds the span exporter selected by the TRACING_EXPORTER setting.
+
+    Returns:
+        SpanExporter | None: The exporter, or None when tracing is disabled.
+    """
+    if settings.TRACING_EXPORTER == "file":
+        return FileSpanExporter(settings.TRACING_FILE)
+    if settings.TRACING_EXPORTER == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
+            OTLPSpanExporter,
+        )
+
+        return OTLPSpanExporter(endpoint=settings.TRACING_OTLP_ENDPOINT)
+    return None
+
+
+def configure_tracing(exporter: SpanExporter | None = None) -> bool:
+    """
+    Installs the tracer provider and the database and Celery instrumentation.
+
+    Without an exporter the OpenTelemetry no-op tracer stays in place, so the spans
+    created across the code base cost next to nothing.
+
+    Args:
+        exporter (SpanExporter | None): The exporter to use instead of the configured one.
+
+    Returns:
+        bool: True if tracing was enabled, False otherwise.
+    """
+    exporter = exporter or _build_exporter()
+    if exporter is None:
+        return False
+
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": settings.TRACING_SERVICE_NAME})
+    )
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+
+    connection_created.connect(install_query_tracer, dispatch_uid="tracing")
+    before_task_publish.connect(start_publish_span, dispatch_uid="tracing")
+    after_task_publish.connect(end_publish_span, dispatch_uid="tracing")
+    task_prerun.connect(start_task_span, dispatch_uid="tracing")
+    task_postrun.connect(end_task_span, dispatch_uid="tracing")
+    return True
+
+
+def traced(func):
+    """
+    Decorator that runs the wrapped function inside a span named after its qualified name.
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with tracer.start_as_current_span(func.__qualname__):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+def trace_query(execute, sql, params, many, context):
+    with tracer.start_as_current_span(
+        "postgres.query",
+        kind=SpanKind.CLIENT,
+        attributes={"db.system": "postgresql", "db.statement": sql},
+    ):
+        return execute(sql, params, many, context)
+
+
+def install_query_tracer(sender, connection, **kwargs):
+    if trace_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(trace_query)
+
+
+def start_publish_span(sender=None, headers=None, **kwargs):
+    span = tracer.start_span(f"celery.publish {sender}", kind=SpanKind.PRODUCER)
+    propagate.inject(headers, context=trace.set_span_in_context(span))
+    _publish_spans[headers["id"]] = span
+
+
+def end_publish_span(sender=None, headers=None, **kwargs):
+    if span := _publish_spans.pop(headers["id"], None):
+        span.end()
+
+
+def start_task_span(sender=None, task_id=None, task=None, **kwargs):
+    carrier = {
+        key: value
+        for key in propagate.get_global_textmap().fields
+        if (value := task.request.get(key))
+    }
+    span = tracer.start_span(
+        f"celery.run {task.name}",
+        context=propagate.extract(carrier),
+        kind=SpanKind.CONSUMER,
+        attributes={"celery.task_id": task_id},
+    )
+    token = otel_context.attach(trace.set_span_in_context(span))
+    _task_spans[task_id] = (span, token)
+
+
+def end_task_span(sender=None, task_id=None, state=None, **kwargs):
+    if task_id not in _task_spans:
+        return
+
+    span, token = _task_spans.pop(task_id)
+    span.set_attribute("celery.state", str(state))
+    if state == "FAILURE":
+        span.set_status(Status(StatusCode.ERROR))
+    span.end()
+    otel_context.detach(token)
+
+
+class TracingMiddleware:
+    """
+    Middleware that wraps every API request in a server span, continuing any
+    trace context sent by the caller.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with tracer.start_as_current_span(
+            f"HTTP {request.method}",
+            context=propagate.extract(request.headers),
+            kind=SpanKind.SERVER,
+            attributes={"http.method": request.method, "http.target": request.path},
+        ) as span:
+            response = self.get_response(request)
+            if request.resolver_match:
+                span.update_name(f"{request.method} {request.resolver_match.route}")
+            span.set_attribute("http.status_code", response.status_code)
+            return response
@@ -18,9 +18,12 @@ Including another URLconf
 from django.urls import include, path
 from rest_framework.authtoken import views
 
+from pilot.views import metrics
+
 urlpatterns = [
     # path("admin/", admin.site.urls),
     path("api-token-auth/", views.obtain_auth_token),
     path("api/v1/users/", include("users.urls")),
     path("api/v1/repositories/", include("pilot.urls")),
+    path("metrics/", metrics, name="metrics"),
 ]
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class PilotConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "pilot"
+
+    def ready(self) -> None:
+        import pilot.signals  # noqa
+        from IssuePilot.tracing import configure_tracing
+
+        configure_tracing()
@@ -0,0 +1,193 @@
+import pickle
+import threading
+import time
+import zlib
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.cache import cache
+
+from IssuePilot.tracing import tracer
+from pilot.metrics import record_cache_lookup
+
+_PLAIN = b"p"
+_COMPRESSED = b"z"
+
+
+def get_redis_client():
+    """
+    Returns the Redis client behind the default cache, for commands the Django
+    cache API doesn't offer.
+    """
+    return cache._cache.get_client(write=True)
+
+
+def _dumps(value) -> bytes:
+    data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    if len(data) >= settings.PILOT_CACHE_COMPRESS_MIN_SIZE:
+        return _COMPRESSED + zlib.compress(data)
+    return _PLAIN + data
+
+
+def _loads(data: bytes):
+    if data[:1] == _COMPRESSED:
+        return pickle.loads(zlib.decompress(data[1:]))
+    return pickle.loads(data[1:])
+
+
+class CacheNamespace:
+    """
+    A family of cache keys with its own version, metrics and serialization.
+
+    Keys are built from escaped parts, so no two different part lists map to the
+    same key. Every key carries PILOT_CACHE_VERSION and the generation of the
+    namespace; bumping the generation with invalidate drops the whole family at
+    once. The generation is kept by each process for PILOT_CACHE_GENERATION_TTL
+    seconds, so other processes see an invalidation within that time.
+
+    Values are pickled, and compressed with zlib from PILOT_CACHE_COMPRESS_MIN_SIZE
+    bytes on, and written and read straight through the Redis client so batches
+    take one round trip.
+
+    Args:
+        name (str): The name of the namespace, also used as the metric label.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._generation: tuple[float, int] | None = None
+        self._lock = threading.Lock()
+
+    def _get_generation_key(self) -> str:
+        return f"pilot:v{settings.PILOT_CACHE_VERSION}:{self.name}:generation"
+
+    def _get_generation(self) -> int:
+        with self._lock:
+            if self._generation and self._generation[0] > time.monotonic():
+                return self._generation[1]
+        generation = int(get_redis_client().get(self._get_generation_key()) or 0)
+        with self._lock:
+            self._generation = (
+                time.monotonic() + settings.PILOT_CACHE_GENERATION_TTL,
+                generation,
+            )
+        return generation
+
+    def key(self, *parts) -> str:
+        """
+        Builds the key of a value in this namespace.
+
+        Args:
+            parts: The parts identifying the value, e.g. the owner and the name of
+                a repository.
+
+        Returns:
+            str: The key, e.g. "pilot:v1:repository:g0:octocat:hello-world".
+        """
+        escaped = ":".join(quote(str(part), safe="") for part in parts)
+        return (
+            f"pilot:v{settings.PILOT_CACHE_VERSION}:{self.name}:"
+            f"g{self._get_generation()}:{escaped}"
+        )
+
+    def get(self, key: str):
+        """
+        Reads a value, recording the lookup in metrics and traces.
+
+        Args:
+            key (str): A key built by this namespace.
+
+        Returns:
+            The cached value, or None if the key is missing.
+        """
+        with tracer.start_as_current_span(
+            "cache.get", attributes={"cache.family": self.name, "cache.key": key}
+        ):
+            data = get_redis_client().get(key)
+        record_cache_lookup(self.name, data is not None)
+        return None if data is None else _loads(data)
+
+    def get_many(self, keys: list[str]) -> dict:
+        """
+        Reads many values in one round trip.
+
+        Args:
+            keys (list[str]): Keys built by this namespace.
+
+        Returns:
+            dict: The cached values by key; missing keys are left out.
+        """
+        if not keys:
+            return {}
+        with tracer.start_as_current_span(
+            "cache.get_many", attributes={"cache.family": self.name}
+        ):
+            values = get_redis_client().mget(keys)
+        found = {}
+        for key, data in zip(keys, values):
+            record_cache_lookup(self.name, data is not None)
+            if data is not None:
+                found[key] = _loads(data)
+        return found
+
+    def set(self, key: str, value, timeout: int | None) -> None:
+        """
+        Writes a value inside a trace span.
+
+        Args:
+            key (str): A key built by this namespace.
+            value: The value to store.
+            timeout (int | None): The expiry of the value in seconds, or None to
+                keep it until it is evicted.
+        """
+        with tracer.start_as_current_span(
+            "cache.set", attributes={"cache.family": self.name, "cache.key": key}
+        ):
+            get_redis_client().set(key, _dumps(value), ex=timeout)
+
+    def set_many(self, values: dict, timeout: int | None) -> None:
+        """
+        Writes many values in one round trip.
+
+        Args:
+            values (dict): The values to store by key.
+            timeout (int | None): The expiry of the values in seconds.
+        """
+        if not values:
+            return
+        with tracer.start_as_current_span(
+            "cache.set_many", attributes={"cache.family": self.name}
+        ):
+            pipeline = get_redis_client().pipeline(transaction=False)
+            for key, value in values.items():
+                pipeline.set(key, _dumps(value), ex=timeout)
+            pipeline.execute()
+
+    def add(self, key: str, value, timeout: int | None) -> bool:
+        """
+        Writes a value unless the key already exists.
+
+        Returns:
+            bool: Whether the value was written.
+        """
+        return bool(get_redis_client().set(key, _dumps(value), ex=timeout, nx=True))
+
+    def delete(self, key: str) -> None:
+        get_redis_client().delete(key)
+
+    def invalidate(self) -> None:
+        """
+        Drops every value of the namespace by moving it to a new generation. The
+        old values expire on their own.
+        """
+        generation = get_redis_client().incr(self._get_generation_key())
+        with self._lock:
+            self._generation = (
+                time.monotonic() + settings.PILOT_CACHE_GENERATION_TTL,
+                generation,
+            )
+
+
+REPOSITORIES = CacheNamespace("repository")
+REPOSITORY_REFRESHES = CacheNamespace("repository_refresh")
+TIMELINE_SYNCS = CacheNamespace("timeline_sync")
@@ -1,16 +1,35 @@
-import json
+import contextvars
 import logging
+import time
 from abc import ABC, abstractmethod
-from datetime import timedelta
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from types import MappingProxyType
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 
 import requests
-from django.core.cache import cache
+from django.conf import settings
 from django.utils import timezone
-from requests.adapters import HTTPAdapter
+from opentelemetry.trace import SpanKind
 from urllib3.util import Retry
 
+from IssuePilot.celery import app
+from IssuePilot.log import sampled
+from IssuePilot.tracing import tracer
+from pilot.cache import REPOSITORIES, REPOSITORY_REFRESHES
 from pilot.enums import RepositoryTypes
-from pilot.exceptions import TooManyRequestException
+from pilot.exceptions import CircuitOpenException, TooManyRequestException
+from pilot.metrics import (
+    GITHUB_CIRCUIT_REJECTIONS,
+    GITHUB_RATE_LIMIT_REMAINING,
+    GITHUB_REQUEST_LATENCY,
+    GITHUB_SECONDARY_RATE_LIMITS,
+    token_fingerprint,
+)
+from pilot.resilience import AdaptiveLimiter, CircuitBreaker, TokenPacer
+from pilot.tokens import record_rate_limit
+from pilot.transports import get_transport
 
 logger = logging.getLogger(__name__)
 
@@ -33,37 +52,102 @@ class BaseClient(ABC):
         pass
 
     @abstractmethod
-    def check_create_or_update_issues(
-        self, repo_name: str, owner: str, token: str
-    ) -> bool:
-        """Check if there are any updated issues in a repository.
+    def get_issue_timeline(
+        self,
+        repo_name: str,
+        owner: str,
+        issue_id: int | str,
+        token: str,
+        start: int = 0,
+    ) -> list:
+        """Get the timeline of an issue in a repository.
 
         Args:
             repo_name (str): The name of the repository.
             owner (str): The owner of the repository.
+            issue_id (int | str): The ID of the issue.
             token (str): The authentication token.
+            start (int): The number of leading events to skip.
 
         Returns:
-            bool: True if there are updated issues, False otherwise.
+            list: A list of events in the issue timeline.
         """
         pass
 
     @abstractmethod
-    def get_issue_timeline(
-        self, repo_name: str, owner: str, issue_id: int | str, token: str
-    ) -> list:
-        """Get the timeline of an issue in a repository.
+    def get_issue_changes(
+        self, repo_name: str, owner: str, token: str, since: datetime | None = None
+    ) -> list[dict]:
+        """Get the issues of a repository changed since a point in time.
 
         Args:
             repo_name (str): The name of the repository.
             owner (str): The owner of the repository.
-            issue_id (int | str): The ID of the issue.
             token (str): The authentication token.
+            since (datetime | None): The time to collect changes from, or None for
+                the past hour.
 
         Returns:
-            list: A list of events in the issue timeline.
+            list[dict]: The changed issues, open and closed, oldest change first,
+                each with its "number", "title", "body", "state", "labels",
+                "created_at", "updated_at" and "closed_at".
+        """
+
+    @abstractmethod
+    def get_issues(
+        self, repo_name: str, owner: str, token: str
+    ) -> Iterator[list[dict]]:
+        """Get every issue of a repository, page by page.
+
+        Args:
+            repo_name (str): The name of the repository.
+            owner (str): The owner of the repository.
+            token (str): The authentication token.
+
+        Yields:
+            list[dict]: A page of issues, open and closed, oldest change first,
+                with the fields returned by get_issue_changes.
+        """
+
+    @abstractmethod
+    def get_cached_repositories(
+        self, repositories: list[tuple[str, str]], token: str
+    ) -> dict[tuple[str, str], dict]:
+        """Get the cached metadata of many repositories without calling the provider.
+
+        Args:
+            repositories (list[tuple[str, str]]): The (name, owner) pairs to read.
+            token (str): The authentication token the metadata must be visible to.
+
+        Returns:
+            dict[tuple[str, str], dict]: The cached metadata by (name, owner) pair;
+                repositories with nothing cached are left out.
+        """
+
+    @abstractmethod
+    def get_repository(self, repo_name: str, owner: str, token: str) -> dict:
+        """Get the metadata of a repository.
+
+        Args:
+            repo_name (str): The name of the repository.
+            owner (str): The owner of the repository.
+            token (str): The authentication token of the user.
+
+        Returns:
+            dict: The metadata of the repository; "exists" is False if it was not found.
+        """
+
+    @abstractmethod
+    def get_user_repositories(self, token: str) -> Iterator[list[dict]]:
+        """Get the repositories a user watches or has starred.
+
+        Args:
+            token (str): The authentication token of the user.
+
+        Yields:
+            list[dict]: A page of repositories, each with its "name", "owner",
+                "github_id" and "is_private".
         """
-        pass
 
 
 class GitHubClient(BaseClient):
@@ -73,40 +157,100 @@ class GitHubClient(BaseClient):
     Attributes:
         repository_url (str): The URL template for retrieving repository information.
         issues_url (str): The URL template for retrieving issues.
+        all_issues_url (str): The URL template for retrieving every issue.
         timeline_url (str): The URL template for retrieving issue timelines.
-        headers (dict): The headers to be included in the API requests.
+        user_repositories_urls (Mapping): The URL templates for the repositories a
+            user watches and has starred.
+        headers (Mapping): The read-only headers shared by all API requests.
+        logged_headers (tuple): The response headers included in request logs.
 
     Methods:
         __init__(): Initializes the GitHubClient class.
         _get_since(): Returns the timestamp for the past hour.
+        _get_headers(token): Builds the headers of a request.
+        _request(endpoint, url, token): Sends a request to the GitHub API and records metrics.
+        _record_outcome(latency, success): Feeds the circuit breaker and concurrency limiter.
+        _log_response(endpoint, url, response): Logs a response with a subset of its headers.
+        _is_secondary_rate_limit(response): Tells whether a response is a secondary rate limit.
+        _get_secondary_retry_after(response): Reads the wait after a secondary rate limit.
+        _check_response(response): Raises for rate-limited and unsuccessful responses.
+        _get_retry_after(response): Reads the wait before retrying a rate-limited request.
+        _get_links(response): Parses the Link header of a paginated response.
+        _get_pages(endpoint, url, token): Follows the next links of a paginated endpoint.
+        _get_page_url(url, page): Returns a paginated URL pointing at another page.
+        _get_all_pages(endpoint, url, token): Fetches every page of a paginated endpoint concurrently.
+        _get_repository_key(repo_name, owner): Returns the cache key of the GitHub ID of a public repository.
+        _get_token_repository_key(repo_name, owner, token): Returns the cache key of a repository as seen with a token.
+        _get_metadata_key(github_id): Returns the cache key of the metadata of a public repository.
+        _get_cache_entries(repo_name, owner, token, metadata): Builds the cache entries of a repository.
+        _get_repository_metadata(data): Extracts the cached metadata of a repository.
+        get_cached_repository(repo_name, owner, token): Reads the cached metadata of a repository.
+        get_cached_repositories(repositories, token): Reads the cached metadata of many repositories.
+        get_repository(repo_name, owner, token): Retrieves the metadata of a repository.
+        fetch_repository(repo_name, owner, token): Requests and caches the metadata of a repository.
         check_repository(repo_name, owner, token): Checks if a repository exists.
-        check_update_issues(repo_name, owner, token): Checks if there are any updated issues in a repository.
-        get_updated_issues(repo_name, owner, token): Retrieves the updated issues in a repository.
-        get_issue_timeline(repo_name, owner, issue_id, token): Retrieves the timeline of an issue in a repository.
+        _get_issue(data): Extracts the stored fields of an issue.
+        get_issue_changes(repo_name, owner, token, since): Retrieves the issues changed since a point in time.
+        get_issues(repo_name, owner, token): Retrieves every issue of a repository, page by page.
+        get_issue_timeline(repo_name, owner, issue_id, token, start): Retrieves the timeline of an issue in a repository.
+        get_user_repositories(token): Retrieves the repositories a user watches or has starred.
     """
 
     repository_url = "https://api.github.com/repos/{owner}/{repo}"
-    issues_url = "https://api.github.com/repos/{owner}/{repo}/issues?since={since}&per_page={per_page}&state=open"
+    issues_url = "https://api.github.com/repos/{owner}/{repo}/issues?since={since}&per_page={per_page}&state=all&sort=updated&direction=asc"
+    all_issues_url = "https://api.github.com/repos/{owner}/{repo}/issues?per_page={per_page}&state=all&sort=updated&direction=asc"
     timeline_url = "https://api.github.com/repos/{owner}/{repo}/issues/{issue_id}/timeline?per_page={per_page}"
-    headers = {
-        "Accept": "application/vnd.github+json",
-        "Authorization": "Bearer {token}",
-        "X-GitHub-Api-Version": "2022-11-28",
-    }
+    user_repositories_urls = MappingProxyType(
+        {
+            "subscriptions": "https://api.github.com/user/subscriptions?per_page={per_page}",
+            "starred": "https://api.github.com/user/starred?per_page={per_page}",
+        }
+    )
+    headers = MappingProxyType(
+        {
+            "Accept": "application/vnd.github+json",
+            "X-GitHub-Api-Version": "2022-11-28",
+        }
+    )
+    logged_headers = (
+        "X-RateLimit-Limit",
+        "X-RateLimit-Remaining",
+        "X-RateLimit-Reset",
+        "X-RateLimit-Resource",
+        "Retry-After",
+        "X-GitHub-Request-Id",
+    )
 
     def __init__(self):
         """
         Initializes the GitHubClient class.
 
-        It sets up the session and retry strategy for making API requests.
+        It sets up the transport selected by GITHUB_HTTP_TRANSPORT, the retry
+        strategy, the circuit breaker and concurrency limiter, and the per-token
+        pacer for making API requests. Server errors are retried once per request;
+        sustained outages are left to the circuit breaker. Rate-limited responses
+        are neither retried nor waited on by the transport, and the last response
+        is returned instead of raised, so a 429 reaches the pacer, which backs the
+        token off. The instance is shared by every greenlet or thread of a process,
+        so the connection pool is sized to GITHUB_HTTP_POOL_SIZE instead of the
+        default 10 connections, which would be opened and discarded under load.
         """
         retry_strategy = Retry(
-            total=3, status_forcelist=[500, 502, 503, 504], backoff_factor=1
+            total=3,
+            status=1,
+            status_forcelist=[500, 502, 503, 504],
+            backoff_factor=1,
+            respect_retry_after_header=False,
+            raise_on_status=False,
+        )
+        self.breaker = CircuitBreaker("github")
+        self.limiter = AdaptiveLimiter("github", settings.GITHUB_HTTP_POOL_SIZE)
+        self.pacer = TokenPacer("github")
+        self.session = get_transport(
+            settings.GITHUB_HTTP_TRANSPORT,
+            settings.GITHUB_HTTP_POOL_SIZE,
+            retry_strategy,
         )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        self.session = requests.Session()
-        self.session.mount("https://", adapter)
-        self.session.mount("http://", adapter)
 
     def _get_since(self):
         """
@@ -117,143 +261,653 @@ class GitHubClient(BaseClient):
         """
         return (timezone.now() - timedelta(hours=1)).strftime("%Y-%m-%dT%H:%M:%SZ")
 
-    def check_repository(self, repo_name: str, owner: str, token: str) -> bool:
+    def _get_headers(self, token: str | None) -> dict:
         """
-        Checks if a repository exists.
+        Builds the headers of a request, leaving the shared headers untouched.
 
         Args:
-            repo_name (str): The name of the repository.
-            owner (str): The owner of the repository.
-            token (str): The access token for authentication.
+            token (str | None): The access token for authentication, or None for
+                an unauthenticated request.
 
         Returns:
-            bool: True if the repository exists, False otherwise.
+            dict: The headers including the authorization of the token.
         """
-        cache_key = f"{owner}_{repo_name}"
-        cache_value = cache.get(cache_key)
-        if cache_value:
-            return cache_value
+        if token is None:
+            return dict(self.headers)
+        return {**self.headers, "Authorization": f"Bearer {token}"}
 
-        url = self.repository_url.format(owner=owner, repo=repo_name)
-        self.headers["Authorization"] = self.headers["Authorization"].format(
-            token=token
+    def _request(self, endpoint: str, url: str, token: str | None) -> requests.Response:
+        """
+        Sends a GET request to the GitHub API inside a client span and records
+        request metrics and the rate limit state of the token.
+
+        Requests fail fast while the circuit breaker is open or the token is backed
+        off after a secondary rate limit, and wait for the pacer of the token and
+        for a slot while the adaptive concurrency limit is reached.
+
+        Args:
+            endpoint (str): The endpoint family used as a metric label.
+            url (str): The URL to request.
+            token (str | None): The access token for authentication, or None for
+                an unauthenticated request.
+
+        Returns:
+            requests.Response: The response returned by GitHub.
+
+        Raises:
+            CircuitOpenException: If the circuit breaker is open.
+            TooManyRequestException: If the token is backed off.
+        """
+        if not self.breaker.allow():
+            GITHUB_CIRCUIT_REJECTIONS.labels(self.breaker.name).inc()
+            raise CircuitOpenException(RepositoryTypes.GITHUB.name)
+        if (backoff := self.pacer.get_backoff(token)) > 0:
+            raise TooManyRequestException(RepositoryTypes.GITHUB.name, backoff)
+
+        with (
+            self.pacer.pace(token),
+            tracer.start_as_current_span(
+                f"github.{endpoint}",
+                kind=SpanKind.CLIENT,
+                attributes={"http.method": "GET", "http.url": url},
+            ) as span,
+            self.limiter,
+        ):
+            started = time.perf_counter()
+            try:
+                response = self.session.get(url, headers=self._get_headers(token))
+            except requests.RequestException:
+                self._record_outcome(time.perf_counter() - started, False)
+                raise
+            elapsed = time.perf_counter() - started
+            GITHUB_REQUEST_LATENCY.labels(endpoint, response.status_code).observe(
+                elapsed
+            )
+            span.set_attribute("http.status_code", response.status_code)
+        self._record_outcome(elapsed, response.status_code < 500)
+
+        remaining = response.headers.get("X-RateLimit-Remaining")
+        if remaining is not None:
+            GITHUB_RATE_LIMIT_REMAINING.labels(token_fingerprint(token)).set(
+                int(remaining)
+            )
+            record_rate_limit(token, response.headers)
+        if self._is_secondary_rate_limit(response):
+            GITHUB_SECONDARY_RATE_LIMITS.labels(token_fingerprint(token)).inc()
+            self.pacer.back_off(token, self._get_secondary_retry_after(response))
+        self._log_response(endpoint, url, response)
+        return response
+
+    def _record_outcome(self, latency: float, success: bool) -> None:
+        """
+        Feeds the outcome of a request to the circuit breaker and the concurrency limiter.
+
+        Args:
+            latency (float): The duration of the request in seconds.
+            success (bool): Whether GitHub answered without a server or network error.
+        """
+        self.limiter.observe(latency, success)
+        self.breaker.record(success)
+
+    def _log_response(
+        self, endpoint: str, url: str, response: requests.Response
+    ) -> None:
+        """
+        Logs a GitHub response with a whitelisted subset of its headers.
+
+        Successful responses are logged at INFO and sampled before the record is
+        built; any other status is always logged as a warning together with the
+        response body.
+
+        Args:
+            endpoint (str): The endpoint family of the request.
+            url (str): The requested URL.
+            response (requests.Response): The response returned by GitHub.
+        """
+        if response.status_code == 200:
+            if not sampled(logger):
+                return
+            level, extra = logging.INFO, {"sampled": True}
+        else:
+            level, extra = logging.WARNING, {"response_text": response.text}
+
+        headers = {}
+        for header in self.logged_headers:
+            if (value := response.headers.get(header)) is not None:
+                headers[header] = value
+        extra["endpoint"] = endpoint
+        extra["status_code"] = response.status_code
+        extra["headers"] = headers
+        logger.log(
+            level, "GitHub request %s %s", url, response.status_code, extra=extra
+        )
+
+    def _is_secondary_rate_limit(self, response: requests.Response) -> bool:
+        """
+        Tells whether a response is a secondary rate limit.
+
+        GitHub answers requests sent too fast or too concurrently with a 403 or 429
+        while the primary limit still has budget, with a `Retry-After` header or
+        a message naming the secondary rate limit.
+
+        Args:
+            response (requests.Response): The response returned by GitHub.
+
+        Returns:
+            bool: True if the response is a secondary rate limit.
+        """
+        if response.status_code not in (429, 403):
+            return False
+        if response.headers.get("X-RateLimit-Remaining") == "0":
+            return False
+        return (
+            "Retry-After" in response.headers
+            or "secondary rate limit" in response.text.lower()
         )
 
-        response = self.session.get(url, headers=self.headers)
-        extra = {"status_code": response.status_code, "headers": response.headers}
+    def _get_secondary_retry_after(self, response: requests.Response) -> float:
+        """
+        Reads how long to wait after a secondary rate limit.
+
+        Args:
+            response (requests.Response): The response returned by GitHub.
+
+        Returns:
+            float: The seconds from `Retry-After`, or
+                GITHUB_SECONDARY_RATE_LIMIT_BACKOFF if GitHub didn't send it.
+        """
+        if (retry_after := response.headers.get("Retry-After")) is not None:
+            return float(retry_after)
+        return float(settings.GITHUB_SECONDARY_RATE_LIMIT_BACKOFF)
+
+    def _check_response(self, response: requests.Response) -> None:
+        """
+        Raises an exception for rate-limited and unsuccessful responses.
 
-        if response.status_code != 200:
-            extra["response.text"] = response.text
-        logger.info(f"Github Url: {url}", extra=extra)
+        Args:
+            response (requests.Response): The response returned by GitHub.
 
+        Raises:
+            TooManyRequestException: If the primary or a secondary rate limit of the
+                token was hit.
+            requests.HTTPError: If the response has an error status.
+        """
         if (
             response.status_code in (429, 403)
             and response.headers.get("X-RateLimit-Remaining") == "0"
         ):
-            raise TooManyRequestException(RepositoryTypes.GITHUB.name)
+            raise TooManyRequestException(
+                RepositoryTypes.GITHUB.name, self._get_retry_after(response)
+            )
+        if self._is_secondary_rate_limit(response):
+            raise TooManyRequestException(
+                RepositoryTypes.GITHUB.name, self._get_secondary_retry_after(response)
+            )
         response.raise_for_status()
-        cache.set(cache_key, response.status_code == 200, 10)
 
-        return response.status_code == 200
+    def _get_retry_after(self, response: requests.Response) -> float | None:
+        """
+        Reads how long to wait before retrying a rate-limited request.
 
-    def check_create_or_update_issues(
-        self, repo_name: str, owner: str, token: str
-    ) -> bool:
+        Args:
+            response (requests.Response): The response returned by GitHub.
+
+        Returns:
+            float | None: The seconds from `Retry-After`, or until `X-RateLimit-Reset`,
+                or None if GitHub sent neither.
+        """
+        if (retry_after := response.headers.get("Retry-After")) is not None:
+            return float(retry_after)
+        if (reset := response.headers.get("X-RateLimit-Reset")) is not None:
+            return max(0.0, int(reset) - time.time())
+        return None
+
+    def _get_links(self, response: requests.Response) -> dict[str, str]:
+        """
+        Parses the `Link` header of a paginated response.
+
+        Args:
+            response (requests.Response): The response returned by GitHub.
+
+        Returns:
+            dict[str, str]: The page URLs keyed by relation, e.g. "next" or "last".
         """
-        Checks if there are any updated issues in a repository.
+        links = response.headers.get("Link")
+        if not links:
+            return {}
+        return {
+            link["rel"]: link["url"]
+            for link in requests.utils.parse_header_links(links)
+        }
+
+    def _get_pages(self, endpoint: str, url: str, token: str) -> Iterator[list]:
+        """
+        Follows the `next` links of a paginated endpoint, one page at a time.
+
+        Args:
+            endpoint (str): The endpoint family used as a metric label.
+            url (str): The URL of the first page.
+            token (str): The access token for authentication.
+
+        Yields:
+            list: The items of each page.
+        """
+        while url:
+            response = self._request(endpoint, url, token)
+            self._check_response(response)
+            yield response.json()
+            url = self._get_links(response).get("next")
+
+    def _get_page_url(self, url: str, page: int) -> str:
+        """
+        Returns a paginated URL pointing at another page.
+
+        Args:
+            url (str): A URL of the paginated endpoint.
+            page (int): The page number.
+
+        Returns:
+            str: The URL with its `page` parameter set to the page number.
+        """
+        parts = urlsplit(url)
+        query = [(key, value) for key, value in parse_qsl(parts.query) if key != "page"]
+        query.append(("page", str(page)))
+        return urlunsplit(parts._replace(query=urlencode(query, safe=":+")))
+
+    def _get_all_pages(self, endpoint: str, url: str, token: str) -> list[list]:
+        """
+        Fetches every page of a paginated endpoint, in order.
+
+        The `last` link of the first response gives the number of pages, so the
+        remaining ones are requested concurrently, GITHUB_PAGE_FETCH_CONCURRENCY at
+        a time and within the pacer of the token, instead of one round trip after
+        the other. Responses without a `last` link are followed through their
+        `next` links.
+
+        Args:
+            endpoint (str): The endpoint family used as a metric label.
+            url (str): The URL of the first page.
+            token (str): The access token for authentication.
+
+        Returns:
+            list[list]: The items of each page, in page order.
+        """
+        response = self._request(endpoint, url, token)
+        self._check_response(response)
+        links = self._get_links(response)
+        pages = [response.json()]
+        if "last" not in links:
+            if next_url := links.get("next"):
+                pages.extend(self._get_pages(endpoint, next_url, token))
+            return pages
+
+        first = int(dict(parse_qsl(urlsplit(url).query)).get("page", 1))
+        last = int(dict(parse_qsl(urlsplit(links["last"]).query))["page"])
+
+        def fetch(page: int) -> list:
+            response = self._request(endpoint, self._get_page_url(url, page), token)
+            self._check_response(response)
+            return response.json()
+
+        with ThreadPoolExecutor(settings.GITHUB_PAGE_FETCH_CONCURRENCY) as executor:
+            pages.extend(
+                executor.map(
+                    lambda page: contextvars.copy_context().run(fetch, page),
+                    range(first + 1, last + 1),
+                )
+            )
+        return pages
+
+    def _get_repository_key(self, repo_name: str, owner: str) -> str:
+        """
+        Returns the cache key that points the name of a public repository to its
+        GitHub ID.
+
+        GitHub names are case-insensitive, so they are lowercased.
 
         Args:
             repo_name (str): The name of the repository.
             owner (str): The owner of the repository.
-            token (str): The access token for authentication.
 
         Returns:
-            bool: True if there are updated issues, False otherwise.
+            str: The cache key in the REPOSITORIES namespace.
         """
-        cache_key = f"{owner}_{repo_name}_issues"
-        cache_value = cache.get(cache_key)
-        if cache_value:
-            return cache_value
+        return REPOSITORIES.key("name", owner.lower(), repo_name.lower())
 
-        url = self.issues_url.format(
-            owner=owner, repo=repo_name, since=self._get_since(), per_page=1
+    def _get_token_repository_key(self, repo_name: str, owner: str, token: str) -> str:
+        """
+        Returns the cache key of a repository as seen with one token, for results
+        other tokens may not share: missing and private repositories.
+        """
+        return REPOSITORIES.key(
+            "token", token_fingerprint(token), owner.lower(), repo_name.lower()
         )
-        self.headers["Authorization"] = self.headers["Authorization"].format(
-            token=token
+
+    def _get_metadata_key(self, github_id: int) -> str:
+        return REPOSITORIES.key("id", github_id)
+
+    def _get_cache_entries(
+        self, repo_name: str, owner: str, token: str, metadata: dict
+    ) -> dict:
+        """
+        Builds the cache entries of the metadata of a repository fetched with a token.
+
+        Public repositories are visible to every token, so their metadata is shared
+        and keyed by GitHub ID, with the name pointing to it. Anything else is only
+        cached for the token that fetched it.
+
+        Returns:
+            dict: The values to cache by key.
+        """
+        if metadata["exists"] and not metadata["private"]:
+            return {
+                self._get_metadata_key(metadata["github_id"]): metadata,
+                self._get_repository_key(repo_name, owner): metadata["github_id"],
+            }
+        return {self._get_token_repository_key(repo_name, owner, token): metadata}
+
+    def _get_repository_metadata(self, data: dict) -> dict:
+        """
+        Extracts the metadata cached for a repository from its API representation.
+
+        Args:
+            data (dict): The repository as returned by GitHub.
+
+        Returns:
+            dict: The existence, GitHub ID and state flags of the repository.
+        """
+        return {
+            "exists": True,
+            "github_id": data["id"],
+            "archived": data.get("archived", False),
+            "disabled": data.get("disabled", False),
+            "private": data.get("private", False),
+            "fetched_at": time.time(),
+        }
+
+    def get_cached_repository(
+        self, repo_name: str, owner: str, token: str
+    ) -> dict | None:
+        """
+        Reads the cached metadata of a repository without calling GitHub.
+
+        Args:
+            repo_name (str): The name of the repository.
+            owner (str): The owner of the repository.
+            token (str): The access token the metadata must be visible to.
+
+        Returns:
+            dict | None: The cached metadata, or None if nothing is cached.
+        """
+        return self.get_cached_repositories([(repo_name, owner)], token).get(
+            (repo_name, owner)
         )
 
-        response = self.session.get(url, headers=self.headers)
-        extra = {"status_code": response.status_code, "headers": response.headers}
+    def get_cached_repositories(
+        self, repositories: list[tuple[str, str]], token: str
+    ) -> dict[tuple[str, str], dict]:
+        """
+        Reads the cached metadata of many repositories in two round trips: one for
+        the GitHub IDs of public repositories, one for their shared metadata and
+        the entries of the token for the other repositories.
+
+        Args:
+            repositories (list[tuple[str, str]]): The (name, owner) pairs to read.
+            token (str): The access token the metadata must be visible to.
+
+        Returns:
+            dict[tuple[str, str], dict]: The cached metadata by (name, owner) pair;
+                repositories with nothing cached are left out.
+        """
+        name_keys = {
+            (repo_name, owner): self._get_repository_key(repo_name, owner)
+            for repo_name, owner in repositories
+        }
+        github_ids = REPOSITORIES.get_many(list(name_keys.values()))
+        keys = {
+            repository: (
+                self._get_metadata_key(github_ids[key])
+                if key in github_ids
+                else self._get_token_repository_key(*repository, token)
+            )
+            for repository, key in name_keys.items()
+        }
+        found = REPOSITORIES.get_many(list(set(keys.values())))
+        return {
+            repository: found[key] for repository, key in keys.items() if key in found
+        }
+
+    def get_repository(self, repo_name: str, owner: str, token: str) -> dict:
+        """
+        Retrieves the metadata of a repository, preferring the cache.
+
+        Found repositories are cached for REPOSITORY_CACHE_TIMEOUT and missing ones
+        for the shorter REPOSITORY_NOT_FOUND_CACHE_TIMEOUT. Only public repositories
+        are shared between tokens. A public entry older than
+        REPOSITORY_CACHE_REFRESH_AFTER is still returned, and a background task
+        refreshes it with a subscriber's token so callers never wait for GitHub on
+        a warm key; private ones are fetched again when they expire.
 
-        if response.status_code != 200:
-            extra["response.text"] = response.text
-        logger.info(f"Github Url: {url}", extra=extra)
+        Args:
+            repo_name (str): The name of the repository.
+            owner (str): The owner of the repository.
+            token (str): The access token for authentication.
 
+        Returns:
+            dict: The metadata of the repository; "exists" is False if it was not found.
+        """
+        metadata = self.get_cached_repository(repo_name, owner, token)
+        if metadata is None:
+            return self.fetch_repository(repo_name, owner, token)
+
+        age = time.time() - metadata["fetched_at"]
         if (
-            response.status_code in (429, 403)
-            and response.headers.get("X-RateLimit-Remaining") == "0"
+            metadata["exists"]
+            and not metadata["private"]
+            and age > settings.REPOSITORY_CACHE_REFRESH_AFTER
+            and REPOSITORY_REFRESHES.add(
+                REPOSITORY_REFRESHES.key(owner.lower(), repo_name.lower()), 1, 60
+            )
         ):
-            raise TooManyRequestException(RepositoryTypes.GITHUB.name)
-        response.raise_for_status()
+            # Scheduled by name: the tasks module imports the services, which
+            # import this module.
+            app.signature(
+                "pilot.tasks.refresh_repository_metadata", args=(repo_name, owner)
+            ).delay()
+        return metadata
+
+    def fetch_repository(self, repo_name: str, owner: str, token: str | None) -> dict:
+        """
+        Requests the metadata of a repository from GitHub and caches it.
+
+        Args:
+            repo_name (str): The name of the repository.
+            owner (str): The owner of the repository.
+            token (str | None): The access token for authentication, or None to
+                look the repository up as an anonymous visitor would.
+
+        Returns:
+            dict: The metadata of the repository; "exists" is False if it was not found.
+        """
+        url = self.repository_url.format(owner=owner, repo=repo_name)
+        response = self._request("repository", url, token)
+
+        if response.status_code == 404:
+            metadata = {"exists": False, "fetched_at": time.time()}
+            timeout = settings.REPOSITORY_NOT_FOUND_CACHE_TIMEOUT
+        else:
+            self._check_response(response)
+            metadata = self._get_repository_metadata(response.json())
+            timeout = settings.REPOSITORY_CACHE_TIMEOUT
+        if not metadata["exists"] or metadata["private"]:
+            # Every token sees a public repository, so a shared entry is stale.
+            REPOSITORIES.delete(self._get_repository_key(repo_name, owner))
+        REPOSITORIES.set_many(
+            self._get_cache_entries(repo_name, owner, token, metadata), timeout
+        )
+        return metadata
+
+    def check_repository(self, repo_name: str, owner: str, token: str) -> bool:
+        """
+        Checks if a repository exists.
+
+        Args:
+            repo_name (str): The name of the repository.
+            owner (str): The owner of the repository.
+            token (str): The access token for authentication.
+
+        Returns:
+            bool: True if the repository exists, False otherwise.
+        """
+        return self.get_repository(repo_name, owner, token)["exists"]
 
-        response_data = response.json()
-        result = len(response_data) > 0 and response.status_code == 200
-        cache.set(cache_key, result, 60 * 60)
-        return result
+    def _get_issue(self, data: dict) -> dict:
+        """
+        Extracts the stored fields of an issue from its API representation.
+
+        Args:
+            data (dict): The issue as returned by GitHub.
+
+        Returns:
+            dict: The number, text, state, label names and timestamps of the issue.
+        """
+        return {
+            "number": data["number"],
+            "title": data["title"],
+            "body": data.get("body") or "",
+            "state": data["state"],
+            "labels": [label["name"] for label in data.get("labels", [])],
+            "created_at": data["created_at"],
+            "updated_at": data["updated_at"],
+            "closed_at": data.get("closed_at"),
+        }
+
+    def get_issue_changes(
+        self, repo_name: str, owner: str, token: str, since: datetime | None = None
+    ) -> list[dict]:
+        """
+        Retrieves the issues changed since a point in time, in one paginated pass.
+
+        Open and closed issues are listed 100 per page in the order they were last
+        updated. The issues endpoint also lists pull requests, which are skipped.
+
+        Args:
+            repo_name (str): The name of the repository.
+            owner (str): The owner of the repository.
+            token (str): The access token for authentication.
+            since (datetime | None): The time to collect changes from, or None for
+                the past hour.
+
+        Returns:
+            list[dict]: The changed issues, oldest change first, each with its
+                "number", "title", "body", "state", "labels", "created_at",
+                "updated_at" and "closed_at".
+        """
+        since = since.strftime("%Y-%m-%dT%H:%M:%SZ") if since else self._get_since()
+        url = self.issues_url.format(
+            owner=owner, repo=repo_name, since=since, per_page=100
+        )
+        return [
+            self._get_issue(issue)
+            for page in self._get_pages("issues", url, token)
+            for issue in page
+            if "pull_request" not in issue
+        ]
+
+    def get_issues(
+        self, repo_name: str, owner: str, token: str
+    ) -> Iterator[list[dict]]:
+        """
+        Retrieves every issue of a repository, page by page.
+
+        Issues are listed 100 per page in the order they were last updated. Pull
+        requests are skipped.
+
+        Args:
+            repo_name (str): The name of the repository.
+            owner (str): The owner of the repository.
+            token (str): The access token for authentication.
+
+        Yields:
+            list[dict]: A page of issues, open and closed, with the fields returned
+                by get_issue_changes.
+        """
+        url = self.all_issues_url.format(owner=owner, repo=repo_name, per_page=100)
+        for page in self._get_pages("issues", url, token):
+            yield [
+                self._get_issue(issue) for issue in page if "pull_request" not in issue
+            ]
 
     def get_issue_timeline(
-        self, repo_name: str, owner: str, issue_id: int | str, token: str
+        self,
+        repo_name: str,
+        owner: str,
+        issue_id: int | str,
+        token: str,
+        start: int = 0,
     ) -> list:
         """
         Retrieves the timeline of an issue in a repository.
 
+        Leading events are skipped by starting at the page that holds event
+        `start`.
+
         Args:
             repo_name (str): The name of the repository.
             owner (str): The owner of the repository.
             issue_id (int | str): The ID of the issue.
             token (str): The access token for authentication.
+            start (int): The number of leading events to skip.
 
         Returns:
-            list: A list of timeline events for the issue.
+            list: The timeline events of the issue from event `start` on.
         """
-        cache_key = f"{owner}_{repo_name}_{issue_id}_timeline"
-        cache_value = cache.get(cache_key)
-        if cache_value:
-            return json.loads(cache_value)
-
+        per_page = 100
+        page, skip = divmod(start, per_page)
         url = self.timeline_url.format(
-            owner=owner, repo=repo_name, issue_id=issue_id, per_page=100
-        )
-        self.headers["Authorization"] = self.headers["Authorization"].format(
-            token=token
+            owner=owner, repo=repo_name, issue_id=issue_id, per_page=per_page
         )
+        if page:
+            url = f"{url}&page={page + 1}"
 
         timeline = []
-        while url:
-            response = self.session.get(url, headers=self.headers)
-            logger.info(
-                f"Github Url: {url}",
-                extra={
-                    "response.status_code": response.status_code,
-                    "response.headers": response.headers,
-                },
-            )
+        for events in self._get_all_pages("timeline", url, token):
+            timeline.extend(events)
+        return timeline[skip:]
 
-            if (
-                response.status_code in (429, 403)
-                and response.headers.get("X-RateLimit-Remaining") == "0"
-            ):
-                raise TooManyRequestException(RepositoryTypes.GITHUB.name)
-            if response.status_code != 200:
-                response.raise_for_status()
-            timeline.extend(response.json())
-            links = response.headers.get("Link")
+    def get_user_repositories(self, token: str) -> Iterator[list[dict]]:
+        """
+        Retrieves the repositories a user watches or has starred, page by page.
 
-            if not links:
-                break
+        The metadata of every listed repository is cached on the way, so later
+        existence checks for them don't call GitHub.
 
-            links = requests.utils.parse_header_links(links)
-            url = {link["rel"]: link["url"] for link in links}.get("next", None)
+        Args:
+            token (str): The access token of the user.
 
-        cache.set(cache_key, json.dumps(timeline), 60 * 5)
-        return timeline
+        Yields:
+            list[dict]: A page of repositories, each with its "name", "owner",
+                "github_id" and "is_private".
+        """
+        for endpoint, url in self.user_repositories_urls.items():
+            for page in self._get_pages(endpoint, url.format(per_page=100), token):
+                entries = {}
+                for repository in page:
+                    entries.update(
+                        self._get_cache_entries(
+                            repository["name"],
+                            repository["owner"]["login"],
+                            token,
+                            self._get_repository_metadata(repository),
+                        )
+                    )
+                REPOSITORIES.set_many(entries, settings.REPOSITORY_CACHE_TIMEOUT)
+                yield [
+                    {
+                        "name": repository["name"],
+                        "owner": repository["owner"]["login"],
+                        "github_id": repository["id"],
+                        "is_private": repository.get("private", False),
+                    }
+                    for repository in page
+                ]
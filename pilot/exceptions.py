@@ -14,10 +14,44 @@ class RepositoryNotFoundException(APIException):
 class TooManyRequestException(APIException):
     """
     Exception for when too many requests are made.
+
+    Args:
+        repository_type (str): The provider that rejected the request.
+        retry_after (float | None): Seconds until the limit resets, if known.
     """
 
-    def __init__(self, repository_type: str):
-        self.default_detail = f"Too Many Request {repository_type}"
+    def __init__(self, repository_type: str, retry_after: float | None = None):
+        super().__init__(f"Too Many Request {repository_type}")
+        self.retry_after = retry_after
 
     status_code = 429
     default_code = "too_many_requests"
+
+
+class CircuitOpenException(APIException):
+    """
+    Exception for when requests to an upstream are cut off by its circuit breaker.
+    """
+
+    def __init__(self, repository_type: str):
+        super().__init__(f"Service Unavailable {repository_type}")
+
+    status_code = 503
+    default_code = "circuit_open"
+
+
+class RepositoryUnavailableException(APIException):
+    """
+    Exception for when a repository can no longer be checked: it was deleted,
+    made inaccessible, archived or disabled.
+
+    Args:
+        reason (str): One of "not_found", "archived" or "disabled".
+    """
+
+    def __init__(self, reason: str):
+        super().__init__(f"Repository unavailable: {reason}")
+        self.reason = reason
+
+    status_code = 410
+    default_code = "repository_unavailable"
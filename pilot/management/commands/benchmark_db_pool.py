@@ -0,0 +1,84 @@
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs ORM queries from many concurrent workers and reports the database "
+        "connections held and the query latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=200)
+        parser.add_argument("--queries", type=int, default=20)
+
+    def sample(self, stop: threading.Event, peaks: dict) -> None:
+        # Counts the backends of this database on the server, which include
+        # connections held by other processes.
+        pool = connections["default"].pool
+        while not stop.is_set():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT count(*) FROM pg_stat_activity "
+                    "WHERE datname = current_database()"
+                )
+                backends = cursor.fetchone()[0]
+            connection.close()
+            peaks["backends"] = max(peaks["backends"], backends)
+            if pool is not None:
+                stats = pool.get_stats()
+                peaks["pool_size"] = max(peaks["pool_size"], stats["pool_size"])
+                peaks["waiting"] = max(peaks["waiting"], stats["requests_waiting"])
+            time.sleep(0.05)
+
+    def work(self, queries: int) -> list:
+        latencies = []
+        for _ in range(queries):
+            started = time.perf_counter()
+            User.objects.filter(is_active=True).exists()
+            latencies.append(time.perf_counter() - started)
+        # Gives the connection back to the pool, like the end of a task or request.
+        connection.close()
+        return latencies
+
+    def handle(self, *args, **options):
+        concurrency = options["concurrency"]
+        pool = connections["default"].pool
+        peaks = {"backends": 0, "pool_size": 0, "waiting": 0}
+        stop = threading.Event()
+        sampler = threading.Thread(target=self.sample, args=(stop, peaks))
+        sampler.start()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as executor:
+            results = executor.map(self.work, [options["queries"]] * concurrency)
+            latencies = [latency for result in results for latency in result]
+        elapsed = time.perf_counter() - started
+        stop.set()
+        sampler.join()
+
+        percentiles = statistics.quantiles(latencies, n=100)
+        self.stdout.write(
+            f"pool max size: {pool.max_size if pool is not None else 'disabled'}"
+        )
+        self.stdout.write(
+            f"workers: {concurrency}, queries: {len(latencies)}, "
+            f"{len(latencies) / elapsed:.0f} queries/s"
+        )
+        self.stdout.write(
+            f"connections held: {peaks['pool_size']} by the pool, "
+            f"{peaks['backends']} server backends, "
+            f"{peaks['waiting']} workers waiting at peak"
+        )
+        self.stdout.write(
+            f"latency p50 {percentiles[49] * 1000:.1f} ms, "
+            f"p95 {percentiles[94] * 1000:.1f} ms, "
+            f"p99 {percentiles[98] * 1000:.1f} ms"
+        )
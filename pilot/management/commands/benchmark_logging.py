@@ -0,0 +1,100 @@
+import logging
+import os
+import time
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from requests.structures import CaseInsensitiveDict
+
+from IssuePilot.log import JsonFormatter, get_sampling_filter
+from pilot.clients import GitHubClient
+
+GITHUB_RESPONSE_HEADERS = {
+    "Date": "Sat, 19 Oct 2026 08:00:00 GMT",
+    "Content-Type": "application/json; charset=utf-8",
+    "Cache-Control": "private, max-age=60, s-maxage=60",
+    "Vary": "Accept, Authorization, Cookie, X-GitHub-OTP,Accept-Encoding, Accept, X-Requested-With",
+    "ETag": 'W/"8a1c7f9d2e3b4a5c6d7e8f9a0b1c2d3e"',
+    "Last-Modified": "Fri, 18 Oct 2026 21:14:03 GMT",
+    "X-OAuth-Scopes": "repo, read:user",
+    "X-Accepted-OAuth-Scopes": "repo",
+    "github-authentication-token-expiration": "2026-12-31 00:00:00 UTC",
+    "X-GitHub-Media-Type": "github.v3; format=json",
+    "X-GitHub-Api-Version-Selected": "2022-11-28",
+    "X-RateLimit-Limit": "5000",
+    "X-RateLimit-Remaining": "4987",
+    "X-RateLimit-Reset": "1792396800",
+    "X-RateLimit-Used": "13",
+    "X-RateLimit-Resource": "core",
+    "Access-Control-Expose-Headers": "ETag, Link, Location, Retry-After, X-GitHub-OTP, X-RateLimit-Limit, X-RateLimit-Remaining, X-RateLimit-Used, X-RateLimit-Resource, X-RateLimit-Reset, X-OAuth-Scopes, X-Accepted-OAuth-Scopes, X-Poll-Interval, X-GitHub-Media-Type, X-GitHub-SSO, X-GitHub-Request-Id, Deprecation, Sunset",
+    "Access-Control-Allow-Origin": "*",
+    "Strict-Transport-Security": "max-age=31536000; includeSubdomains; preload",
+    "X-Frame-Options": "deny",
+    "X-Content-Type-Options": "nosniff",
+    "X-XSS-Protection": "0",
+    "Referrer-Policy": "origin-when-cross-origin, strict-origin-when-cross-origin",
+    "Content-Security-Policy": "default-src 'none'",
+    "Content-Encoding": "gzip",
+    "Server": "github.com",
+    "X-GitHub-Request-Id": "C0DE:1F2E:3D4C5B:6A7988:6712345A",
+}
+
+
+class Command(BaseCommand):
+    help = "Measures the per-request cost of logging a GitHub response."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=100_000)
+
+    def handle(self, *args, **options):
+        iterations = options["iterations"]
+        client = GitHubClient()
+        url = client.repository_url.format(owner="octocat", repo="hello-world")
+        response = requests.Response()
+        response.status_code = 200
+        response.headers = CaseInsensitiveDict(GITHUB_RESPONSE_HEADERS)
+
+        logger = logging.getLogger("pilot.clients")
+        saved = (logger.handlers[:], logger.level, logger.propagate)
+        sampling = get_sampling_filter(settings.LOG_SAMPLING_RATES)
+
+        def legacy():
+            extra = {"status_code": response.status_code, "headers": response.headers}
+            logger.info(f"Github Url: {url}", extra=extra)
+
+        def current():
+            client._log_response("repository", url, response)
+
+        text = logging.Formatter("%(levelname)s %(asctime)s %(module)s %(message)s")
+        scenarios = [
+            ("legacy, INFO filtered out", legacy, logging.WARNING, text, None),
+            ("current, INFO filtered out", current, logging.WARNING, text, None),
+            ("legacy, text", legacy, logging.INFO, text, None),
+            ("current, text", current, logging.INFO, text, None),
+            ("current, json", current, logging.INFO, JsonFormatter(), None),
+            ("current, json, 1% sampled", current, logging.INFO, JsonFormatter(), 0.01),
+        ]
+
+        self.stdout.write(f"{'scenario':<32}{'per request':>14}")
+        with open(os.devnull, "w") as devnull:
+            try:
+                logger.propagate = False
+                for name, log, level, formatter, rate in scenarios:
+                    handler = logging.StreamHandler(devnull)
+                    handler.setFormatter(formatter)
+                    handler.addFilter(sampling)
+                    sampling.configure({logger.name: rate} if rate is not None else {})
+                    logger.handlers = [handler]
+                    logger.setLevel(level)
+
+                    started = time.perf_counter()
+                    for _ in range(iterations):
+                        log()
+                    elapsed = time.perf_counter() - started
+                    self.stdout.write(
+                        f"{name:<32}{elapsed / iterations * 1e6:>11.2f} us"
+                    )
+            finally:
+                logger.handlers, logger.level, logger.propagate = saved
+                sampling.configure(settings.LOG_SAMPLING_RATES)
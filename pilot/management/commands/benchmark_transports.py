@@ -0,0 +1,216 @@
+import asyncio
+import json
+import logging
+import multiprocessing
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+from urllib3.util import Retry
+
+from pilot.clients import GitHubClient
+from pilot.transports import HTTP2Transport, RequestsTransport
+
+
+def _stub_body(authorization: str) -> bytes:
+    return json.dumps({"id": 1, "authorization": authorization}).encode()
+
+
+class HTTP1Stub:
+    """
+    Local HTTP/1.1 server answering every GET after a fixed delay.
+
+    Args:
+        delay (float): The response delay in seconds.
+    """
+
+    def __init__(self, delay: float = 0.0):
+        stub = self
+        self.connections = 0
+        self._lock = threading.Lock()
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+
+            def do_GET(self):
+                time.sleep(delay)
+                body = _stub_body(self.headers["Authorization"])
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args): ...
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class HTTP2Stub:
+    """
+    Local cleartext HTTP/2 server answering every GET after a fixed delay.
+
+    Clients have to speak HTTP/2 with prior knowledge. Like GitHub, the server
+    allows 100 concurrent streams per connection.
+
+    Args:
+        delay (float): The response delay in seconds.
+    """
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.connections = 0
+        self.loop = asyncio.new_event_loop()
+        self.server = self.loop.run_until_complete(
+            self.loop.create_server(self._protocol, "127.0.0.1", 0)
+        )
+        port = self.server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}"
+
+    def _protocol(self):
+        from h2.config import H2Configuration
+        from h2.connection import H2Connection
+        from h2.events import RequestReceived
+
+        stub = self
+
+        class Protocol(asyncio.Protocol):
+            def connection_made(self, transport):
+                stub.connections += 1
+                self.transport = transport
+                self.conn = H2Connection(
+                    H2Configuration(client_side=False, header_encoding="utf-8")
+                )
+                self.conn.initiate_connection()
+                self.conn.update_settings({0x3: 100})
+                transport.write(self.conn.data_to_send())
+
+            def data_received(self, data):
+                for event in self.conn.receive_data(data):
+                    if isinstance(event, RequestReceived):
+                        stub.loop.call_later(
+                            stub.delay, self.respond, event.stream_id, event.headers
+                        )
+                self.transport.write(self.conn.data_to_send())
+
+            def respond(self, stream_id, headers):
+                if self.transport.is_closing():
+                    return
+                body = _stub_body(dict(headers).get("authorization"))
+                self.conn.send_headers(
+                    stream_id,
+                    [
+                        (":status", "200"),
+                        ("content-type", "application/json"),
+                        ("content-length", str(len(body))),
+                    ],
+                )
+                self.conn.send_data(stream_id, body, end_stream=True)
+                self.transport.write(self.conn.data_to_send())
+
+        return Protocol()
+
+    def __enter__(self):
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        def stop():
+            self.server.close()
+            self.loop.stop()
+
+        self.loop.call_soon_threadsafe(stop)
+
+
+def _serve(stub_class, delay: float, port, connections, stop) -> None:
+    with stub_class(delay) as stub:
+        port.value = int(stub.url.rsplit(":", 1)[1])
+        stop.wait()
+        connections.value = stub.connections
+
+
+class Command(BaseCommand):
+    help = "Compares the HTTP/1.1 and HTTP/2 transports against local GitHub stubs."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=200)
+        parser.add_argument("--requests", type=int, default=4000)
+        parser.add_argument("--delay-ms", type=float, default=20.0)
+
+    def run(self, transport, url: str, concurrency: int, requests: int) -> list:
+        client = GitHubClient()
+        client.session = transport
+
+        def request(index):
+            started = time.perf_counter()
+            client._request("repository", url, f"token{index % 50}")
+            return time.perf_counter() - started
+
+        with ThreadPoolExecutor(concurrency) as executor:
+            latencies = list(executor.map(request, range(requests)))
+        transport.close()
+        return latencies
+
+    def handle(self, *args, **options):
+        concurrency = options["concurrency"]
+        delay = options["delay_ms"] / 1000
+        retry = Retry(total=3, status_forcelist=[500, 502, 503, 504], backoff_factor=1)
+        scenarios = [
+            ("http1", HTTP1Stub, lambda: RequestsTransport(concurrency, retry)),
+            ("http2", HTTP2Stub, lambda: HTTP2Transport(concurrency, retry, False)),
+        ]
+
+        logging.disable(logging.INFO)
+        self.stdout.write(
+            f"{'transport':<12}{'connections':>12}{'p50':>11}{'p99':>11}{'req/s':>10}"
+        )
+        for name, stub_class, build_transport in scenarios:
+            # The stub runs in its own process so it doesn't compete with the
+            # client for the GIL.
+            port, connections = (
+                multiprocessing.Value("i", 0),
+                multiprocessing.Value("i", 0),
+            )
+            stop = multiprocessing.Event()
+            server = multiprocessing.Process(
+                target=_serve, args=(stub_class, delay, port, connections, stop)
+            )
+            server.start()
+            while not port.value:
+                time.sleep(0.01)
+
+            started = time.perf_counter()
+            latencies = self.run(
+                build_transport(),
+                f"http://127.0.0.1:{port.value}/repos/octocat/hello-world",
+                concurrency,
+                options["requests"],
+            )
+            elapsed = time.perf_counter() - started
+            stop.set()
+            server.join()
+
+            percentiles = statistics.quantiles(latencies, n=100)
+            self.stdout.write(
+                f"{name:<12}{connections.value:>12}"
+                f"{percentiles[49] * 1000:>8.1f} ms{percentiles[98] * 1000:>8.1f} ms"
+                f"{len(latencies) / elapsed:>10.0f}"
+            )
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from pilot.services import IssueExportService
+
+
+class Command(BaseCommand):
+    help = "Streams the stored issues and timeline events of a repository."
+
+    def add_arguments(self, parser):
+        parser.add_argument("repository")
+        parser.add_argument(
+            "--output", choices=IssueExportService.formats, default="ndjson"
+        )
+        parser.add_argument("--after", help="Resume after the record with this cursor.")
+
+    def handle(self, *args, **options):
+        lines = IssueExportService().export(
+            options["repository"], options["output"], options["after"]
+        )
+        if lines is None:
+            raise CommandError(f"Repository {options['repository']} is not tracked.")
+        for line in lines:
+            self.stdout.write(line, ending="")
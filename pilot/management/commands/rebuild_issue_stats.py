@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from pilot.models import Repository
+from pilot.services import IssueStatsService
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the daily issue stats of repositories from the stored issues."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repository", help="Only rebuild this repository.")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        repositories = Repository.objects.order_by("id")
+        if options["repository"]:
+            repositories = repositories.filter(name=options["repository"])
+
+        service = IssueStatsService()
+        for repository in repositories.iterator():
+            service.rebuild(repository, options["batch_size"])
+            self.stdout.write(f"rebuilt {repository.owner}/{repository.name}")
@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from pilot.services import SubscriberIndexService
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the Redis index of repository subscribers from Postgres."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=settings.SUBSCRIBER_INDEX_BATCH_SIZE
+        )
+
+    def handle(self, *args, **options):
+        indexed = SubscriberIndexService().rebuild(options["batch_size"])
+        self.stdout.write(f"indexed {indexed} repositories")
@@ -0,0 +1,157 @@
+import hashlib
+import os
+
+from django.db import connections
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+GITHUB_REQUEST_LATENCY = Histogram(
+    "pilot_github_request_duration_seconds",
+    "Latency of GitHub API requests by endpoint and response status.",
+    ["endpoint", "status"],
+)
+GITHUB_RATE_LIMIT_REMAINING = Gauge(
+    "pilot_github_rate_limit_remaining",
+    "Remaining GitHub rate limit reported for a token.",
+    ["token"],
+    multiprocess_mode="livemostrecent",
+)
+GITHUB_CIRCUIT_OPEN = Gauge(
+    "pilot_github_circuit_open",
+    "Whether the circuit breaker of an upstream is open.",
+    ["upstream"],
+    multiprocess_mode="livemostrecent",
+)
+GITHUB_CIRCUIT_REJECTIONS = Counter(
+    "pilot_github_circuit_rejections_total",
+    "Requests failed fast by an open circuit breaker.",
+    ["upstream"],
+)
+GITHUB_CONCURRENCY_LIMIT = Gauge(
+    "pilot_github_concurrency_limit",
+    "Adaptive limit of concurrent requests per process.",
+    ["upstream"],
+    multiprocess_mode="liveall",
+)
+GITHUB_SECONDARY_RATE_LIMITS = Counter(
+    "pilot_github_secondary_rate_limits_total",
+    "Secondary rate limit responses received for a token.",
+    ["token"],
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "pilot_db_pool_connections",
+    "Connections of a database pool, all open ones or only the idle ones.",
+    ["database", "state"],
+    multiprocess_mode="liveall",
+)
+DB_POOL_WAITING = Gauge(
+    "pilot_db_pool_requests_waiting",
+    "Queries waiting for a connection from a database pool.",
+    ["database"],
+    multiprocess_mode="liveall",
+)
+DB_POOL_CHECKOUTS = Counter(
+    "pilot_db_pool_checkouts_total",
+    "Connections handed out by a database pool.",
+    ["database"],
+)
+DB_POOL_WAIT = Counter(
+    "pilot_db_pool_wait_seconds_total",
+    "Time spent waiting for a connection from a database pool.",
+    ["database"],
+)
+DB_POOL_TIMEOUTS = Counter(
+    "pilot_db_pool_timeouts_total",
+    "Checkouts from a database pool that timed out.",
+    ["database"],
+)
+CACHE_REQUESTS = Counter(
+    "pilot_cache_requests_total",
+    "Cache lookups by cache key family and result.",
+    ["family", "result"],
+)
+TASK_DURATION = Histogram(
+    "pilot_task_duration_seconds",
+    "Runtime of pilot tasks by task name and outcome.",
+    ["task", "outcome"],
+)
+FANOUT_SIZE = Histogram(
+    "pilot_fanout_size",
+    "Number of repository checks scheduled per polling cycle.",
+    buckets=(0, 10, 50, 100, 500, 1_000, 5_000, 10_000, 50_000, 100_000),
+)
+
+
+def token_fingerprint(token: str | None) -> str:
+    """
+    Returns a short, non-reversible identifier for a token.
+
+    Used as a metric label so tokens can be told apart without being exposed.
+
+    Args:
+        token (str | None): The authentication token, or None for unauthenticated
+            requests.
+
+    Returns:
+        str: The first 12 hex characters of the token's SHA-256 digest, or
+            "anonymous".
+    """
+    if token is None:
+        return "anonymous"
+    return hashlib.sha256(token.encode()).hexdigest()[:12]
+
+
+def record_cache_lookup(family: str, hit: bool) -> None:
+    """
+    Records a cache hit or miss for a cache key family.
+
+    Args:
+        family (str): The cache key family, e.g. "repository", "issues" or "timeline".
+        hit (bool): Whether the cached value was used.
+    """
+    CACHE_REQUESTS.labels(family, "hit" if hit else "miss").inc()
+
+
+def record_pool_stats() -> None:
+    """
+    Copies the usage of every opened database connection pool into the metrics.
+
+    The pool counters are reset as they are read, so each call adds what happened
+    since the previous one.
+    """
+    for alias in connections:
+        pool = getattr(connections[alias], "pool", None)
+        if pool is None or pool.closed:
+            continue
+        stats = pool.pop_stats()
+        DB_POOL_CONNECTIONS.labels(alias, "open").set(stats["pool_size"])
+        DB_POOL_CONNECTIONS.labels(alias, "idle").set(stats["pool_available"])
+        DB_POOL_WAITING.labels(alias).set(stats["requests_waiting"])
+        DB_POOL_CHECKOUTS.labels(alias).inc(stats.get("requests_num", 0))
+        DB_POOL_WAIT.labels(alias).inc(stats.get("requests_wait_ms", 0) / 1000)
+        DB_POOL_TIMEOUTS.labels(alias).inc(stats.get("requests_errors", 0))
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """
+    Renders the current metrics in the Prometheus text format.
+
+    When PROMETHEUS_MULTIPROC_DIR is set (e.g. under gunicorn with several workers),
+    samples from every process are aggregated.
+
+    Returns:
+        tuple[bytes, str]: The rendered metrics and their content type.
+    """
+    registry = REGISTRY
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,34 @@
+# Generated by Django 5.0.6 on 2026-10-19 08:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("pilot", "0002_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TaskOutcomeStat",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("task_name", models.CharField(max_length=255)),
+                ("window_start", models.DateTimeField()),
+                ("successes", models.PositiveIntegerField(default=0)),
+                ("errors", models.PositiveIntegerField(default=0)),
+                ("rate_limited", models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                "unique_together": {("task_name", "window_start")},
+            },
+        ),
+    ]
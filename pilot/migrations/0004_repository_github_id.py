@@ -0,0 +1,17 @@
+# Generated by Django 5.0.6 on 2026-10-19 08:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("pilot", "0003_taskoutcomestat"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="repository",
+            name="github_id",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.6 on 2026-10-19 08:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("pilot", "0004_repository_github_id"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="repository",
+            name="is_private",
+            field=models.BooleanField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.6 on 2026-10-19 08:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("pilot", "0005_repository_is_private"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="repository",
+            name="is_archived",
+            field=models.BooleanField(default=False),
+        ),
+    ]
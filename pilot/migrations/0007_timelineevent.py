@@ -0,0 +1,53 @@
+# Generated by Django 5.0.6 on 2026-10-19 09:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("pilot", "0006_repository_is_archived"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TimelineEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("issue_number", models.PositiveIntegerField()),
+                ("position", models.PositiveIntegerField()),
+                ("event_id", models.BigIntegerField(blank=True, null=True)),
+                ("event", models.CharField(max_length=64)),
+                ("created_at", models.DateTimeField(blank=True, null=True)),
+                ("payload", models.JSONField()),
+                (
+                    "repository",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="timeline_events",
+                        to="pilot.repository",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["repository", "issue_number", "created_at"],
+                        name="pilot_timel_reposit_a29473_idx",
+                    ),
+                    models.Index(
+                        fields=["event_id"], name="pilot_timel_event_i_617b4e_idx"
+                    ),
+                ],
+                "unique_together": {("repository", "issue_number", "position")},
+            },
+        ),
+    ]
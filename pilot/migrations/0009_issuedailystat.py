@@ -0,0 +1,50 @@
+# Generated by Django 5.0.6 on 2026-10-19 10:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("pilot", "0008_issue"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="issue",
+            index=models.Index(
+                fields=["repository", "state"], name="pilot_issue_reposit_6c5da9_idx"
+            ),
+        ),
+        migrations.CreateModel(
+            name="IssueDailyStat",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("opened", models.PositiveIntegerField(default=0)),
+                ("closed", models.PositiveIntegerField(default=0)),
+                ("open_issues", models.PositiveIntegerField(blank=True, null=True)),
+                ("close_durations", models.JSONField(default=dict)),
+                ("labels", models.JSONField(default=dict)),
+                (
+                    "repository",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_stats",
+                        to="pilot.repository",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("repository", "date")},
+            },
+        ),
+    ]
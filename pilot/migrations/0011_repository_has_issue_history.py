@@ -0,0 +1,17 @@
+# Generated by Django 5.0.6 on 2026-10-19 15:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("pilot", "0010_subscription"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="repository",
+            name="has_issue_history",
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -1,3 +1,5 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 
 from pilot.enums import RepositoryTypes
@@ -15,15 +17,26 @@ class Repository(models.Model):
         name (str): The name of the repository.
         description (str): The description of the repository.
         url (str): The URL of the repository.
+        github_id (int): The numeric ID of the repository on GitHub, once known.
+        is_private (bool): Whether the repository is private, None while unknown.
+        is_archived (bool): Whether the repository is archived or disabled on GitHub.
+        has_issue_history (bool): Whether every issue of the repository was stored,
+            so counts over the stored issues match GitHub.
     """
 
     name = models.CharField(max_length=255)
     owner = models.CharField(max_length=255)
-    users = models.ManyToManyField("users.User", related_name="repositories")
+    github_id = models.BigIntegerField(null=True, blank=True)
+    is_private = models.BooleanField(null=True, blank=True)
+    users = models.ManyToManyField(
+        "users.User", related_name="repositories", through="Subscription"
+    )
     repository_type = models.IntegerField(
         choices=RepositoryTypes.choices(), default=RepositoryTypes.GITHUB
     )
     is_active = models.BooleanField(default=True)
+    is_archived = models.BooleanField(default=False)
+    has_issue_history = models.BooleanField(default=False)
 
     def __str__(self):
         return self.name
@@ -31,3 +44,173 @@ class Repository(models.Model):
     class Meta:
         unique_together = ["name", "repository_type"]
         indexes = [models.Index(fields=["name"])]
+
+
+class Subscription(models.Model):
+    """
+    A class representing the subscription of a user to a repository.
+
+    Attributes:
+        repository (Repository): The subscribed repository.
+        user (User): The subscribed user.
+        has_access (bool): Whether the token of the user could see the repository
+            when it was last checked with it. The poller only uses the tokens of
+            subscribers with access for repositories that aren't known to be public.
+    """
+
+    repository = models.ForeignKey(Repository, on_delete=models.CASCADE)
+    user = models.ForeignKey("users.User", on_delete=models.CASCADE)
+    has_access = models.BooleanField(default=True)
+
+    def __str__(self):
+        return f"{self.user_id} {self.repository_id}"
+
+    class Meta:
+        db_table = "pilot_repository_users"
+        unique_together = ["repository", "user"]
+
+
+class TaskOutcomeStat(models.Model):
+    """
+    A class representing the outcomes of a task over a time window.
+
+    Fire-and-forget tasks don't store a result per invocation; their outcomes are
+    counted in the cache and rolled up into one row per task and window.
+
+    Attributes:
+        task_name (str): The name of the task.
+        window_start (datetime): The start of the time window.
+        successes (int): The number of successful runs in the window.
+        errors (int): The number of failed runs in the window.
+        rate_limited (int): The number of runs stopped by a rate limit in the window.
+    """
+
+    task_name = models.CharField(max_length=255)
+    window_start = models.DateTimeField()
+    successes = models.PositiveIntegerField(default=0)
+    errors = models.PositiveIntegerField(default=0)
+    rate_limited = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.task_name} {self.window_start}"
+
+    class Meta:
+        unique_together = ["task_name", "window_start"]
+
+
+class Issue(models.Model):
+    """
+    A class representing an issue of a tracked repository.
+
+    Issues are upserted by the poller as it sees them change. The search vector
+    is recomputed from the title and body on every upsert.
+
+    Attributes:
+        repository (Repository): The repository of the issue.
+        number (int): The number of the issue.
+        title (str): The title of the issue.
+        body (str): The body of the issue.
+        state (str): "open" or "closed".
+        labels (list): The names of the labels of the issue.
+        created_at (datetime): When the issue was opened.
+        updated_at (datetime): When the issue was last updated.
+        closed_at (datetime): When the issue was closed, None while it is open.
+        search_vector (SearchVector): The full-text search document of the issue.
+    """
+
+    repository = models.ForeignKey(
+        Repository, on_delete=models.CASCADE, related_name="issues"
+    )
+    number = models.PositiveIntegerField()
+    title = models.CharField(max_length=1024)
+    body = models.TextField(blank=True)
+    state = models.CharField(max_length=16)
+    labels = models.JSONField(default=list)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    closed_at = models.DateTimeField(null=True, blank=True)
+    search_vector = SearchVectorField(null=True)
+
+    def __str__(self):
+        return f"{self.repository} #{self.number}"
+
+    class Meta:
+        unique_together = ["repository", "number"]
+        indexes = [
+            GinIndex(fields=["search_vector"]),
+            models.Index(fields=["repository", "state"]),
+        ]
+
+
+class TimelineEvent(models.Model):
+    """
+    A class representing an event in the timeline of an issue.
+
+    Timelines are stored as GitHub returns them, so history reads are served from
+    the database and only events newer than the last stored one are fetched.
+
+    Attributes:
+        repository (Repository): The repository of the issue.
+        issue_number (int): The number of the issue.
+        position (int): The index of the event in the timeline, used as the cursor.
+        event_id (int): The ID of the event on GitHub, None for events without one.
+        event (str): The type of the event, e.g. "commented" or "labeled".
+        created_at (datetime): When the event happened, None if GitHub omits it.
+        payload (dict): The event as returned by GitHub.
+    """
+
+    repository = models.ForeignKey(
+        Repository, on_delete=models.CASCADE, related_name="timeline_events"
+    )
+    issue_number = models.PositiveIntegerField()
+    position = models.PositiveIntegerField()
+    event_id = models.BigIntegerField(null=True, blank=True)
+    event = models.CharField(max_length=64)
+    created_at = models.DateTimeField(null=True, blank=True)
+    payload = models.JSONField()
+
+    def __str__(self):
+        return f"{self.repository} #{self.issue_number} {self.event}"
+
+    class Meta:
+        unique_together = ["repository", "issue_number", "position"]
+        indexes = [
+            models.Index(fields=["repository", "issue_number", "created_at"]),
+            models.Index(fields=["event_id"]),
+        ]
+
+
+class IssueDailyStat(models.Model):
+    """
+    A class representing the issue activity of a repository on one day.
+
+    Rows are updated incrementally as the poller stores issue changes and
+    timeline events, and can be rebuilt from the stored issues with the
+    rebuild_issue_stats command.
+
+    Attributes:
+        repository (Repository): The repository.
+        date (date): The day, in UTC.
+        opened (int): The number of issues opened on the day.
+        closed (int): The number of issues closed on the day.
+        open_issues (int): The number of open issues at the last change of the day.
+        close_durations (dict): A histogram of the time-to-close of the issues
+            closed on the day, keyed by bucket.
+        labels (dict): The number of times each label was added on the day.
+    """
+
+    repository = models.ForeignKey(
+        Repository, on_delete=models.CASCADE, related_name="daily_stats"
+    )
+    date = models.DateField()
+    opened = models.PositiveIntegerField(default=0)
+    closed = models.PositiveIntegerField(default=0)
+    open_issues = models.PositiveIntegerField(null=True, blank=True)
+    close_durations = models.JSONField(default=dict)
+    labels = models.JSONField(default=dict)
+
+    def __str__(self):
+        return f"{self.repository} {self.date}"
+
+    class Meta:
+        unique_together = ["repository", "date"]
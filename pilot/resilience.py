@@ -0,0 +1,244 @@
+import contextvars
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+
+from pilot.metrics import (
+    GITHUB_CIRCUIT_OPEN,
+    GITHUB_CONCURRENCY_LIMIT,
+    token_fingerprint,
+)
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker whose state lives in the cache, so every worker sees it.
+
+    Outcomes are counted per time window. Once a window holds enough requests and
+    its failure rate crosses the threshold, the circuit opens and callers fail
+    fast. After the open period the circuit is half-open: one probe per probe
+    interval is let through across all workers, and only the outcome of that
+    probe closes or re-opens the circuit. Requests still in flight when the
+    circuit opened say nothing about the upstream having recovered, so their
+    outcomes are ignored while it is open.
+
+    Args:
+        name (str): The name of the protected upstream.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.state_key = f"circuit:{name}:opened_at"
+        self.probe_key = f"circuit:{name}:probe"
+        # The probe held by the current thread or greenlet, if any.
+        self._probe = contextvars.ContextVar(f"circuit_probe_{name}", default=None)
+
+    def _get_window_keys(self) -> tuple[str, str]:
+        window = int(time.time()) // settings.GITHUB_CIRCUIT_WINDOW
+        prefix = f"circuit:{self.name}:{window}"
+        return f"{prefix}:requests", f"{prefix}:failures"
+
+    def _incr(self, key: str) -> int:
+        if cache.add(key, 1, settings.GITHUB_CIRCUIT_WINDOW * 2):
+            return 1
+        return cache.incr(key)
+
+    def allow(self) -> bool:
+        """
+        Decides whether a request may be sent.
+
+        Returns:
+            bool: True if the circuit is closed or the request is a half-open probe.
+        """
+        opened_at = cache.get(self.state_key)
+        if opened_at is None:
+            return True
+        if time.time() - opened_at < settings.GITHUB_CIRCUIT_OPEN_SECONDS:
+            return False
+        probe = uuid.uuid4().hex
+        if not cache.add(self.probe_key, probe, settings.GITHUB_CIRCUIT_PROBE_INTERVAL):
+            return False
+        self._probe.set(probe)
+        return True
+
+    def record(self, success: bool) -> None:
+        """
+        Records the outcome of a request and opens or closes the circuit.
+
+        While the circuit is open, only the outcome of the probe held by the
+        caller counts.
+
+        Args:
+            success (bool): Whether the upstream answered without a server error.
+        """
+        if cache.get(self.state_key) is not None:
+            probe = self._probe.get()
+            if probe is None or cache.get(self.probe_key) != probe:
+                return
+            self._probe.set(None)
+            if success:
+                cache.delete_many([self.state_key, self.probe_key])
+                GITHUB_CIRCUIT_OPEN.labels(self.name).set(0)
+            else:
+                self.open()
+            return
+
+        requests_key, failures_key = self._get_window_keys()
+        requests = self._incr(requests_key)
+        if success:
+            return
+        failures = self._incr(failures_key)
+        if (
+            requests >= settings.GITHUB_CIRCUIT_MIN_REQUESTS
+            and failures / requests >= settings.GITHUB_CIRCUIT_FAILURE_RATE
+        ):
+            self.open()
+
+    def open(self) -> None:
+        cache.set(self.state_key, time.time(), None)
+        GITHUB_CIRCUIT_OPEN.labels(self.name).set(1)
+
+
+class AdaptiveLimiter:
+    """
+    Limits the requests in flight in this process, adapting the limit to latency.
+
+    The limit grows by one for every limit's worth of fast, successful requests
+    (additive increase) and is halved when a request is slow or fails
+    (multiplicative decrease). Decreases happen at most once per latency target,
+    so one burst of slow responses counts as a single signal.
+
+    Args:
+        name (str): The name of the protected upstream.
+        max_limit (int): The upper bound of the limit, usually the pool size.
+    """
+
+    def __init__(self, name: str, max_limit: int):
+        self.name = name
+        self.max_limit = max_limit
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self._decreased_at = 0.0
+        self._condition = threading.Condition()
+        GITHUB_CONCURRENCY_LIMIT.labels(name).set(max_limit)
+
+    def __enter__(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify()
+
+    def observe(self, latency: float, success: bool) -> None:
+        """
+        Adjusts the limit to the outcome of a request.
+
+        Args:
+            latency (float): The duration of the request in seconds.
+            success (bool): Whether the upstream answered without a server error.
+        """
+        with self._condition:
+            if success and latency <= settings.GITHUB_LATENCY_TARGET:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            else:
+                now = time.monotonic()
+                if now - self._decreased_at < settings.GITHUB_LATENCY_TARGET:
+                    return
+                self._decreased_at = now
+                self.limit = max(settings.GITHUB_MIN_CONCURRENCY, self.limit / 2)
+            self._condition.notify_all()
+        GITHUB_CONCURRENCY_LIMIT.labels(self.name).set(int(self.limit))
+
+
+class TokenPacer:
+    """
+    Paces the requests sent with each token.
+
+    In this process every token gets at most GITHUB_TOKEN_CONCURRENCY requests in
+    flight and a token bucket refilled with GITHUB_TOKEN_RATE requests per second,
+    which also allows bursts of that size. A token backed off after a secondary
+    rate limit is blocked in the cache, so every worker leaves it alone until
+    the wait GitHub asked for has passed.
+
+    Args:
+        name (str): The name of the upstream the tokens belong to.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._buckets: dict[str, tuple[float, float]] = {}
+        self._slots: dict[str, threading.BoundedSemaphore] = {}
+
+    def _get_backoff_key(self, fingerprint: str) -> str:
+        return f"pacer:{self.name}:{fingerprint}:until"
+
+    def _get_slots(self, fingerprint: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            if (slots := self._slots.get(fingerprint)) is None:
+                slots = threading.BoundedSemaphore(settings.GITHUB_TOKEN_CONCURRENCY)
+                self._slots[fingerprint] = slots
+            return slots
+
+    def _reserve(self, fingerprint: str) -> float:
+        # Takes a request from the bucket, letting it go negative, so the caller
+        # only has to sleep for the returned delay without holding the lock.
+        rate = settings.GITHUB_TOKEN_RATE
+        with self._lock:
+            now = time.monotonic()
+            tokens, updated_at = self._buckets.get(fingerprint, (rate, now))
+            tokens = min(rate, tokens + (now - updated_at) * rate) - 1
+            self._buckets[fingerprint] = (tokens, now)
+        return max(0.0, -tokens / rate)
+
+    def get_backoff(self, token: str) -> float:
+        """
+        Returns how long a token is still backed off.
+
+        Args:
+            token (str): The token to check.
+
+        Returns:
+            float: The seconds left, 0 if the token may be used.
+        """
+        until = cache.get(self._get_backoff_key(token_fingerprint(token)))
+        if until is None:
+            return 0.0
+        return max(0.0, until - time.time())
+
+    def back_off(self, token: str, seconds: float) -> None:
+        """
+        Stops every worker from using a token for a while.
+
+        Args:
+            token (str): The token that hit a secondary rate limit.
+            seconds (float): How long to leave the token alone.
+        """
+        cache.set(
+            self._get_backoff_key(token_fingerprint(token)),
+            time.time() + seconds,
+            max(int(seconds) + 1, 1),
+        )
+
+    @contextmanager
+    def pace(self, token: str):
+        """
+        Waits for a concurrency slot and a request from the bucket of a token.
+
+        Args:
+            token (str): The token the request is sent with.
+        """
+        fingerprint = token_fingerprint(token)
+        with self._get_slots(fingerprint):
+            if (delay := self._reserve(fingerprint)) > 0:
+                time.sleep(delay)
+            yield
@@ -1,6 +1,8 @@
+from django.conf import settings
 from rest_framework import serializers
 
 from pilot.models import Repository
+from pilot.services import IssueExportService
 
 
 class RepositorySerializer(serializers.ModelSerializer):
@@ -18,3 +20,91 @@ class RepositorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Repository
         fields = ["name", "repository_type", "owner"]
+
+
+class BulkRepositoryItemSerializer(RepositorySerializer):
+    """
+    Serializer class for a single repository of a bulk request.
+
+    Unlike RepositorySerializer it does not reject repositories that are already
+    stored, since subscribing to those is the common case.
+    """
+
+    class Meta(RepositorySerializer.Meta):
+        validators = []
+
+
+class BulkRepositorySerializer(serializers.Serializer):
+    """
+    Serializer class for bulk subscribe and unsubscribe requests.
+
+    Attributes:
+        repositories (list): The repositories to subscribe to or unsubscribe from.
+    """
+
+    repositories = BulkRepositoryItemSerializer(
+        many=True, allow_empty=False, max_length=settings.BULK_SUBSCRIBE_MAX_ITEMS
+    )
+
+
+class IssueHistoryQuerySerializer(serializers.Serializer):
+    """
+    Serializer class for the query parameters of issue history requests.
+
+    Attributes:
+        after (int): The cursor of the page to read, from the previous page.
+        limit (int): The number of events to return.
+    """
+
+    after = serializers.IntegerField(required=False, min_value=0)
+    limit = serializers.IntegerField(
+        required=False, min_value=1, max_value=settings.TIMELINE_PAGE_SIZE
+    )
+
+
+class IssueSearchQuerySerializer(serializers.Serializer):
+    """
+    Serializer class for the query parameters of issue search requests.
+
+    Attributes:
+        q (str): The search terms, in web search syntax.
+        page (int): The page of results, starting at 1.
+        page_size (int): The number of issues to return.
+    """
+
+    q = serializers.CharField(max_length=256)
+    page = serializers.IntegerField(required=False, min_value=1, default=1)
+    page_size = serializers.IntegerField(
+        required=False, min_value=1, max_value=settings.SEARCH_PAGE_SIZE
+    )
+
+
+class IssueStatsQuerySerializer(serializers.Serializer):
+    """
+    Serializer class for the query parameters of repository stats requests.
+
+    Attributes:
+        days (int): The number of days to summarize, including today.
+    """
+
+    days = serializers.IntegerField(
+        required=False,
+        min_value=1,
+        max_value=settings.ISSUE_STATS_MAX_DAYS,
+        default=settings.ISSUE_STATS_DAYS,
+    )
+
+
+class IssueExportQuerySerializer(serializers.Serializer):
+    """
+    Serializer class for the query parameters of repository export requests.
+
+    Attributes:
+        output (str): The format of the export, "ndjson" or "csv".
+        after (str): The cursor of the last record already exported.
+    """
+
+    output = serializers.ChoiceField(
+        choices=IssueExportService.formats, required=False, default="ndjson"
+    )
+    after = serializers.RegexField(r"^\d+:-?\d+$", required=False)
@@ -1,6 +1,45 @@
+import contextvars
+import csv
+import heapq
+import json
+import math
+import operator
+import time
+from collections import Counter
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from datetime import UTC, datetime, timedelta
+from functools import reduce
+from types import MappingProxyType
+
+import requests
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import F, Max, Q
+from django.utils.dateparse import parse_datetime
+from django_celery_results.models import TaskResult
+
+from IssuePilot.routers import pin_to_primary, read_from_primary
+from IssuePilot.tracing import traced
+from pilot.cache import TIMELINE_SYNCS, get_redis_client
 from pilot.clients import GitHubClient
 from pilot.enums import RepositoryTypes
-from pilot.models import Repository
+from pilot.exceptions import (
+    CircuitOpenException,
+    RepositoryUnavailableException,
+    TooManyRequestException,
+)
+from pilot.models import (
+    Issue,
+    IssueDailyStat,
+    Repository,
+    Subscription,
+    TaskOutcomeStat,
+    TimelineEvent,
+)
 from users.models import User
 
 
@@ -13,33 +52,119 @@ class RepositoryService:
         RepositoryTypes.GITHUB.value: GitHubClient(),
     }
 
+    @traced
     def get_or_create_repository(
         self, data: dict, repository_type: int = RepositoryTypes.GITHUB.value
     ) -> Repository | None:
         """
         Creates a new repository if it doesn't exist, or returns an existing repository.
 
+        A stored repository that isn't known to be public and active is checked with
+        the token in the data first, so nobody subscribes to a private repository
+        they can't see, and a repository deactivated as missing is reactivated when
+        it turns out to exist again.
+
         Args:
             data (dict): A dictionary containing the repository data.
 
         Returns:
-            Repository: The created or existing repository object.
+            Repository: The created or existing repository object, or None if the
+                token can't see the repository.
         """
-        try:
-            repository = Repository.objects.get(
-                name=data["name"], repository_type=data["repository_type"]
-            )
+        repository = Repository.objects.filter(
+            name=data["name"], repository_type=data["repository_type"]
+        ).first()
+        if (
+            repository is not None
+            and repository.is_active
+            and repository.is_private is False
+        ):
             return repository
-        except Repository.DoesNotExist:
-            is_there = self.clients[repository_type].check_repository(
-                data["name"], data["owner"], data["token"]
-            )
-            if not is_there:
-                return None
-            data.pop("token")
-            repository = Repository.objects.create(**data)
+
+        token = data.pop("token")
+        metadata = self.clients[repository_type].get_repository(
+            data["name"], data["owner"], token
+        )
+        if not metadata["exists"]:
+            return None
+        fields = self._get_repository_fields(metadata)
+        if repository is None:
+            return Repository.objects.create(**data, **fields)
+        for field, value in fields.items():
+            setattr(repository, field, value)
+        repository.save(update_fields=list(fields))
         return repository
 
+    def _get_repository_fields(self, metadata: dict) -> dict:
+        """
+        Returns the stored fields of a repository from the metadata of its provider.
+        """
+        is_archived = metadata["archived"] or metadata["disabled"]
+        return {
+            "github_id": metadata["github_id"],
+            "is_private": metadata["private"],
+            "is_active": not is_archived,
+            "is_archived": is_archived,
+        }
+
+    def _get_metadata_fields(
+        self, user: User, items: list[dict], metadata: dict[tuple, dict]
+    ) -> dict[tuple, dict]:
+        """
+        Resolves the stored fields of new repositories.
+
+        The fields come from the metadata resolved by the caller, or from the
+        "github_id" the item carries; the rest are read from the cache with the
+        token of the user, in two round trips per provider.
+
+        Args:
+            user (User): The user the repositories were checked for.
+            items (list[dict]): Dictionaries with the repository name, owner and type.
+            metadata (dict[tuple, dict]): The provider metadata by
+                (repository_type, name).
+
+        Returns:
+            dict[tuple, dict]: The fields by (repository_type, name); "github_id"
+                and "is_private" are None where unknown.
+        """
+        fields = {}
+        unresolved = []
+        for item in items:
+            key = (item["repository_type"], item["name"])
+            if key in metadata:
+                fields[key] = self._get_repository_fields(metadata[key])
+            elif "github_id" in item:
+                fields[key] = {
+                    "github_id": item["github_id"],
+                    "is_private": item.get("is_private"),
+                }
+            else:
+                unresolved.append(item)
+        if not unresolved:
+            return fields
+
+        token = user.get_github_token()
+        for repository_type, client in self.clients.items():
+            typed = [
+                item
+                for item in unresolved
+                if item["repository_type"] == repository_type
+            ]
+            if not typed:
+                continue
+            cached = client.get_cached_repositories(
+                [(item["name"], item["owner"]) for item in typed], token
+            )
+            for item in typed:
+                found = cached.get((item["name"], item["owner"]))
+                fields[(repository_type, item["name"])] = (
+                    self._get_repository_fields(found)
+                    if found and found["exists"]
+                    else {"github_id": None, "is_private": None}
+                )
+        return fields
+
+    @traced
     def subscribe_repository(self, user: User, data: dict) -> bool:
         """
         Subscribes a user to a repository.
@@ -52,41 +177,285 @@ class RepositoryService:
         repository = self.get_or_create_repository(data)
         if not repository:
             return False
-        repository.users.add(user)
+        # Updating the through row directly doesn't send m2m_changed.
+        Subscription.objects.update_or_create(
+            repository=repository, user=user, defaults={"has_access": True}
+        )
+        transaction.on_commit(
+            lambda: SubscriberIndexService().add([repository.id], [user.id])
+        )
+        pin_to_primary(user.id)
         return True
 
-    def get_issue_timeline(
+    def _get_timeline_sync_key(self, repository: Repository, issue_number: int) -> str:
+        return TIMELINE_SYNCS.key(repository.id, issue_number)
+
+    def _build_timeline_event(
+        self, repository: Repository, issue_number: int, position: int, event: dict
+    ) -> TimelineEvent:
+        """
+        Builds the stored form of a timeline event returned by GitHub.
+
+        Commits carry their date in the author and reviews in "submitted_at", every
+        other event in "created_at".
+        """
+        created_at = (
+            event.get("created_at")
+            or event.get("submitted_at")
+            or (event.get("author") or {}).get("date")
+        )
+        event_id = event.get("id")
+        return TimelineEvent(
+            repository=repository,
+            issue_number=issue_number,
+            position=position,
+            event_id=event_id if isinstance(event_id, int) else None,
+            event=event.get("event") or "",
+            created_at=parse_datetime(created_at) if created_at else None,
+            payload=event,
+        )
+
+    def _get_timeline_event_key(self, event: dict) -> str:
+        """
+        Identifies a timeline event across syncs by its ID, node ID or commit SHA,
+        or by its content for the few events that have none of them.
+        """
+        for field in ("id", "node_id", "sha"):
+            if event.get(field):
+                return f"{field}:{event[field]}"
+        return json.dumps(event, sort_keys=True)
+
+    @traced
+    @read_from_primary()
+    def sync_issue_timeline(
+        self, repository: Repository, issue_number: int, token: str
+    ) -> int:
+        """
+        Stores the timeline events of an issue added since the last sync.
+
+        Events deleted on GitHub shift the later ones back, so the sync doesn't
+        resume right after the last stored position: it fetches the last
+        TIMELINE_SYNC_OVERLAP stored events again and skips the events it
+        already stored. New events are appended after the last stored position.
+
+        Args:
+            repository (Repository): The repository of the issue.
+            issue_number (int): The number of the issue.
+            token (str): The access token for authentication.
+
+        Returns:
+            int: The number of stored events.
+        """
+        stored = TimelineEvent.objects.filter(
+            repository=repository, issue_number=issue_number
+        )
+        last_position = stored.aggregate(last=Max("position"))["last"]
+        if last_position is None:
+            last_position, start = -1, 0
+        else:
+            start = max(0, last_position + 1 - settings.TIMELINE_SYNC_OVERLAP)
+        events = self.clients[repository.repository_type].get_issue_timeline(
+            repository.name, repository.owner, issue_number, token, start
+        )
+        # Deletions only move events back, so every event fetched again is
+        # stored at or after the position it is fetched from.
+        seen = {
+            self._get_timeline_event_key(payload)
+            for payload in stored.filter(position__gte=start).values_list(
+                "payload", flat=True
+            )
+        }
+        events = [
+            event for event in events if self._get_timeline_event_key(event) not in seen
+        ]
+        TimelineEvent.objects.bulk_create(
+            [
+                self._build_timeline_event(repository, issue_number, position, event)
+                for position, event in enumerate(events, start=last_position + 1)
+            ],
+            ignore_conflicts=True,
+        )
+        IssueStatsService().record_timeline_events(repository, events)
+        TIMELINE_SYNCS.set(
+            self._get_timeline_sync_key(repository, issue_number),
+            1,
+            settings.TIMELINE_SYNC_INTERVAL,
+        )
+        return len(events)
+
+    @traced
+    @read_from_primary()
+    def store_issues(self, repository: Repository, issues: list[dict]) -> int:
+        """
+        Upserts issues of a repository and recomputes their search vectors.
+
+        Args:
+            repository (Repository): The repository of the issues.
+            issues (list[dict]): The issues as returned by the client.
+
+        Returns:
+            int: The number of stored issues.
+        """
+        if not issues:
+            return 0
+        previous_states = dict(
+            Issue.objects.filter(
+                repository=repository, number__in=[issue["number"] for issue in issues]
+            ).values_list("number", "state")
+        )
+        fields = [
+            "title",
+            "body",
+            "state",
+            "labels",
+            "created_at",
+            "updated_at",
+            "closed_at",
+        ]
+        Issue.objects.bulk_create(
+            [Issue(repository=repository, **issue) for issue in issues],
+            update_conflicts=True,
+            unique_fields=["repository", "number"],
+            update_fields=fields,
+        )
+        config = settings.SEARCH_CONFIG
+        Issue.objects.filter(
+            repository=repository, number__in=[issue["number"] for issue in issues]
+        ).update(
+            search_vector=SearchVector("title", weight="A", config=config)
+            + SearchVector("body", weight="B", config=config)
+        )
+        IssueStatsService().record_issues(repository, previous_states, issues)
+        return len(issues)
+
+    @traced
+    def sync_issue_timelines(
         self,
         repo_name: str,
-        user: User,
-        issue_id: str,
+        owner: str,
+        token: str,
+        issue_numbers: list[int],
         repository_type: int = RepositoryTypes.GITHUB.value,
-    ) -> list | None:
+    ) -> int:
         """
-        Retrieves the timeline of an issue from a GitHub repository.
+        Stores the new timeline events of changed issues.
 
         Args:
             repo_name (str): The name of the repository.
+            owner (str): The owner of the repository.
+            token (str): The access token for authentication.
+            issue_numbers (list[int]): The numbers of the changed issues.
+            repository_type (int): The provider of the repository.
+
+        Returns:
+            int: The number of stored timeline events.
+        """
+        try:
+            repository = Repository.objects.get(
+                name=repo_name, repository_type=repository_type
+            )
+        except Repository.DoesNotExist:
+            return 0
+        return sum(
+            self.sync_issue_timeline(repository, issue_number, token)
+            for issue_number in issue_numbers
+        )
+
+    @traced
+    def search_issues(
+        self, user: User, query: str, page: int = 1, page_size: int | None = None
+    ) -> list[dict]:
+        """
+        Searches the issues of the repositories a user is subscribed to.
+
+        Every issue of a repository is indexed, including the ones older than the
+        subscription: the first poll of a repository backfills its history.
+
+        Args:
             user (User): The user object.
-            issue_id (str): The ID of the issue.
+            query (str): The search terms, in web search syntax.
+            page (int): The page of results, starting at 1.
+            page_size (int | None): The page size, SEARCH_PAGE_SIZE by default.
 
         Returns:
-            list: A list of timeline events for the issue.
+            list[dict]: The matching issues, best match first, each with its
+                "repository_name", "owner", "number", "title", "state" and "rank".
+        """
+        page_size = page_size or settings.SEARCH_PAGE_SIZE
+        search_query = SearchQuery(
+            query, search_type="websearch", config=settings.SEARCH_CONFIG
+        )
+        issues = (
+            Issue.objects.filter(
+                repository_id__in=user.repositories.values("id"),
+                search_vector=search_query,
+            )
+            .annotate(rank=SearchRank(F("search_vector"), search_query))
+            .order_by("-rank", "id")
+            .values(
+                "number",
+                "title",
+                "state",
+                "rank",
+                repository_name=F("repository__name"),
+                owner=F("repository__owner"),
+            )
+        )
+        offset = (page - 1) * page_size
+        return list(issues[offset : offset + page_size])
 
-        Raises:
-            None
+    @traced
+    def get_issue_timeline(
+        self,
+        repo_name: str,
+        user: User,
+        issue_id: int,
+        repository_type: int = RepositoryTypes.GITHUB.value,
+        after: int | None = None,
+        limit: int | None = None,
+    ) -> tuple[list, int | None] | None:
+        """
+        Retrieves a page of the timeline of an issue from the database.
+
+        The stored timeline is synced with GitHub at most once per
+        TIMELINE_SYNC_INTERVAL; the poller syncs updated issues in between.
 
+        Args:
+            repo_name (str): The name of the repository.
+            user (User): The user object; only their subscriptions are readable.
+            issue_id (int): The number of the issue.
+            repository_type (int): The provider of the repository.
+            after (int | None): The cursor returned with the previous page.
+            limit (int | None): The page size, TIMELINE_PAGE_SIZE by default.
+
+        Returns:
+            tuple[list, int | None] | None: The timeline events and the cursor of the
+                next page, None if there is no next page; None if the user isn't
+                subscribed to the repository.
         """
         try:
-            repository = Repository.objects.get(
+            repository = user.repositories.get(
                 name=repo_name, repository_type=repository_type
             )
         except Repository.DoesNotExist:
             return None
-        return self.clients[repository_type].get_issue_timeline(
-            repository.name, repository.owner, issue_id, user.get_github_token()
+        sync_key = self._get_timeline_sync_key(repository, issue_id)
+        if TIMELINE_SYNCS.get(sync_key) is None:
+            self.sync_issue_timeline(repository, issue_id, user.get_github_token())
+
+        limit = min(limit or settings.TIMELINE_PAGE_SIZE, settings.TIMELINE_PAGE_SIZE)
+        events = TimelineEvent.objects.filter(
+            repository=repository, issue_number=issue_id
+        )
+        if after is not None:
+            events = events.filter(position__gt=after)
+        rows = list(
+            events.order_by("position").values_list("position", "payload")[: limit + 1]
         )
+        next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+        return [payload for _, payload in rows[:limit]], next_cursor
 
+    @traced
     def unsubscribe_repository(
         self, user: User, repo_name, repository_type: int = RepositoryTypes.GITHUB.value
     ) -> bool:
@@ -104,9 +473,266 @@ class RepositoryService:
         except Repository.DoesNotExist:
             return False
         repository.users.remove(user)
+        pin_to_primary(user.id)
         return True
 
-    def check_create_or_update_issues(
+    def _get_repositories(self, items: list[dict]) -> dict[tuple, Repository]:
+        """
+        Loads the stored repositories matching a list of repository data in one query.
+
+        Args:
+            items (list[dict]): Dictionaries with the repository name and type.
+
+        Returns:
+            dict[tuple, Repository]: The repositories keyed by (repository_type, name).
+        """
+        query = reduce(
+            operator.or_,
+            (
+                Q(name=item["name"], repository_type=item["repository_type"])
+                for item in items
+            ),
+        )
+        return {
+            (repository.repository_type, repository.name): repository
+            for repository in Repository.objects.filter(query)
+        }
+
+    def _check_repository_status(
+        self, item: dict, token: str
+    ) -> tuple[str, dict | None]:
+        """
+        Checks a repository against its provider for a bulk request.
+
+        Args:
+            item (dict): A dictionary containing the repository data.
+            token (str): The authentication token.
+
+        Returns:
+            tuple[str, dict | None]: The status, one of "found", "not_found",
+                "rate_limited" or "error", and the metadata of found repositories.
+        """
+        try:
+            metadata = self.clients[item["repository_type"]].get_repository(
+                item["name"], item["owner"], token
+            )
+        except TooManyRequestException:
+            return "rate_limited", None
+        except CircuitOpenException:
+            return "error", None
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                return "not_found", None
+            return "error", None
+        except requests.RequestException:
+            return "error", None
+        if not metadata["exists"]:
+            return "not_found", None
+        return "found", metadata
+
+    @traced
+    def bulk_subscribe_repositories(self, user: User, items: list[dict]) -> list[dict]:
+        """
+        Subscribes a user to many repositories at once.
+
+        Stored repositories are resolved in one query; the ones known to be public
+        and active are linked as they are, the others must be visible to the token
+        of the user like new ones. Those are read from the cache in two round trips
+        and the rest are checked against their provider concurrently, and the ones
+        that exist are linked through link_repositories with their metadata.
+
+        Args:
+            user (User): The user object.
+            items (list[dict]): Dictionaries containing the repository data.
+
+        Returns:
+            list[dict]: The repository data of each item with its "status": one of
+                "subscribed", "not_found", "rate_limited" or "error".
+        """
+        items = list({(i["repository_type"], i["name"]): i for i in items}.values())
+        repositories = self._get_repositories(items)
+        statuses = {
+            key: "subscribed"
+            for key, repository in repositories.items()
+            if repository.is_active and repository.is_private is False
+        }
+        metadata = {}
+
+        unknown = [
+            item
+            for item in items
+            if (item["repository_type"], item["name"]) not in statuses
+        ]
+        token = user.get_github_token() if unknown else None
+        for repository_type, client in self.clients.items():
+            typed = [
+                item for item in unknown if item["repository_type"] == repository_type
+            ]
+            cached = client.get_cached_repositories(
+                [(item["name"], item["owner"]) for item in typed], token
+            )
+            for item in typed:
+                found = cached.get((item["name"], item["owner"]))
+                if found is None:
+                    continue
+                key = (repository_type, item["name"])
+                if found["exists"]:
+                    statuses[key], metadata[key] = "subscribed", found
+                else:
+                    statuses[key] = "not_found"
+        unknown = [
+            item
+            for item in unknown
+            if (item["repository_type"], item["name"]) not in statuses
+        ]
+        if unknown:
+            with ThreadPoolExecutor(settings.GITHUB_CHECK_CONCURRENCY) as executor:
+                futures = [
+                    executor.submit(
+                        contextvars.copy_context().run,
+                        self._check_repository_status,
+                        item,
+                        token,
+                    )
+                    for item in unknown
+                ]
+            for item, future in zip(unknown, futures):
+                key = (item["repository_type"], item["name"])
+                status, found = future.result()
+                if status == "found":
+                    statuses[key], metadata[key] = "subscribed", found
+                else:
+                    statuses[key] = status
+
+        self.link_repositories(
+            user,
+            [
+                item
+                for item in items
+                if statuses[(item["repository_type"], item["name"])] == "subscribed"
+            ],
+            metadata,
+        )
+        return [
+            {**item, "status": statuses[(item["repository_type"], item["name"])]}
+            for item in items
+        ]
+
+    @traced
+    def link_repositories(
+        self, user: User, items: list[dict], metadata: dict[tuple, dict] | None = None
+    ) -> int:
+        """
+        Subscribes a user to repositories known to exist, without checking them.
+
+        Missing repositories and subscriptions are inserted with one bulk query
+        each, and stored subscriptions get their access back. Stored repositories
+        are only updated from the metadata given for them, which reactivates them
+        if they were deactivated.
+
+        Args:
+            user (User): The user object.
+            items (list[dict]): Dictionaries with the repository name, owner and type.
+            metadata (dict[tuple, dict] | None): The provider metadata the caller
+                resolved, by (repository_type, name).
+
+        Returns:
+            int: The number of repositories linked to the user.
+        """
+        if not items:
+            return 0
+
+        metadata = metadata or {}
+        repositories = self._get_repositories(items)
+        stored = [
+            repository for key, repository in repositories.items() if key in metadata
+        ]
+        for repository in stored:
+            key = (repository.repository_type, repository.name)
+            for field, value in self._get_repository_fields(metadata[key]).items():
+                setattr(repository, field, value)
+        if stored:
+            Repository.objects.bulk_update(
+                stored, ["github_id", "is_private", "is_active", "is_archived"]
+            )
+
+        missing = [
+            item
+            for item in items
+            if (item["repository_type"], item["name"]) not in repositories
+        ]
+        if missing:
+            fields = self._get_metadata_fields(user, missing, metadata)
+            Repository.objects.bulk_create(
+                [
+                    Repository(
+                        name=item["name"],
+                        owner=item["owner"],
+                        repository_type=item["repository_type"],
+                        **fields[(item["repository_type"], item["name"])],
+                    )
+                    for item in missing
+                ],
+                ignore_conflicts=True,
+            )
+            repositories.update(self._get_repositories(missing))
+
+        Subscription.objects.bulk_create(
+            [
+                Subscription(repository_id=repository.id, user_id=user.id)
+                for repository in repositories.values()
+            ],
+            update_conflicts=True,
+            unique_fields=["repository", "user"],
+            update_fields=["has_access"],
+        )
+        # Bulk inserts into the through table don't send m2m_changed.
+        repository_ids = [repository.id for repository in repositories.values()]
+        transaction.on_commit(
+            lambda: SubscriberIndexService().add(repository_ids, [user.id])
+        )
+        pin_to_primary(user.id)
+        return len(repositories)
+
+    @traced
+    def import_user_repositories(
+        self,
+        user: User,
+        repository_type: int = RepositoryTypes.GITHUB.value,
+    ) -> int:
+        """
+        Subscribes a user to every repository they watch or have starred.
+
+        The lists are streamed page by page from the provider and linked in
+        batches, so memory use doesn't grow with the number of repositories and
+        no repository needs an existence check of its own.
+
+        Args:
+            user (User): The user object.
+            repository_type (int): The provider to import from.
+
+        Returns:
+            int: The number of repositories linked to the user.
+        """
+        linked = 0
+        batch = {}
+        pages = self.clients[repository_type].get_user_repositories(
+            user.get_github_token()
+        )
+        for page in pages:
+            for repository in page:
+                batch[repository["name"]] = {
+                    **repository,
+                    "repository_type": repository_type,
+                }
+            if len(batch) >= settings.REPOSITORY_IMPORT_BATCH_SIZE:
+                linked += self.link_repositories(user, list(batch.values()))
+                batch = {}
+        linked += self.link_repositories(user, list(batch.values()))
+        return linked
+
+    @traced
+    def refresh_repository(
         self,
         repo_name: str,
         owner: str,
@@ -114,16 +740,962 @@ class RepositoryService:
         repository_type: int = RepositoryTypes.GITHUB.value,
     ) -> bool:
         """
-        Checks if there are any updated issues in a repository.
+        Refreshes the cached metadata of a repository and stores its ID, visibility
+        and state, reactivating it if it was deactivated and exists again.
 
         Args:
             repo_name (str): The name of the repository.
             owner (str): The owner of the repository.
-            token (str): The authentication token.
+            token (str): The access token for authentication.
+            repository_type (int): The provider of the repository.
 
         Returns:
-            bool: True if there are updated issues, False otherwise.
+            bool: True if the repository still exists, False otherwise.
         """
-        return self.clients[repository_type].check_create_or_update_issues(
+        metadata = self.clients[repository_type].fetch_repository(
             repo_name, owner, token
         )
+        if metadata["exists"]:
+            Repository.objects.filter(
+                name=repo_name, repository_type=repository_type
+            ).update(**self._get_repository_fields(metadata))
+        return metadata["exists"]
+
+    @traced
+    def bulk_unsubscribe_repositories(
+        self, user: User, items: list[dict]
+    ) -> list[dict]:
+        """
+        Unsubscribes a user from many repositories at once.
+
+        Args:
+            user (User): The user object.
+            items (list[dict]): Dictionaries containing the repository data.
+
+        Returns:
+            list[dict]: The repository data of each item with its "status": either
+                "unsubscribed" or "not_found".
+        """
+        repositories = self._get_repositories(items)
+        repository_ids = [repository.id for repository in repositories.values()]
+        Subscription.objects.filter(
+            user_id=user.id, repository_id__in=repository_ids
+        ).delete()
+        # Deleting through rows directly doesn't send m2m_changed.
+        transaction.on_commit(
+            lambda: SubscriberIndexService().remove(repository_ids, [user.id])
+        )
+        pin_to_primary(user.id)
+        return [
+            {
+                **item,
+                "status": "unsubscribed"
+                if (item["repository_type"], item["name"]) in repositories
+                else "not_found",
+            }
+            for item in items
+        ]
+
+    @traced
+    def collect_issue_changes(
+        self,
+        repo_name: str,
+        owner: str,
+        token: str,
+        repository_type: int = RepositoryTypes.GITHUB.value,
+    ) -> list[dict]:
+        """
+        Collects the issues of a repository changed since the last poll and stores
+        them.
+
+        The cursor is the latest update time among the stored issues of the
+        repository. GitHub also lists the issues updated at the cursor itself, so
+        issues that didn't change since they were stored are left out. A stored
+        repository whose issue history wasn't stored yet is backfilled with every
+        issue it has, so search, exports and statistics cover its history; only
+        the issues changed since the cursor, or in the past hour without one, are
+        returned, as changes, for notifications.
+
+        Args:
+            repo_name (str): The name of the repository.
+            owner (str): The owner of the repository.
+            token (str): The authentication token.
+            repository_type (int): The provider of the repository.
+
+        Returns:
+            list[dict]: The changed issues as returned by the client, each with an
+                "action": "opened" or "closed" for issues seen for the first time,
+                "closed" or "reopened" when the state changed, or "updated".
+
+        Raises:
+            RepositoryUnavailableException: If the repository was deleted, can't be
+                seen with the token, or is archived or disabled.
+        """
+        client = self.clients[repository_type]
+        metadata = client.get_repository(repo_name, owner, token)
+        if not metadata["exists"]:
+            raise RepositoryUnavailableException("not_found")
+        if metadata["archived"] or metadata["disabled"]:
+            raise RepositoryUnavailableException(
+                "archived" if metadata["archived"] else "disabled"
+            )
+
+        repository = Repository.objects.filter(
+            name=repo_name, repository_type=repository_type
+        ).first()
+        since = None
+        if repository is not None:
+            since = Issue.objects.filter(repository=repository).aggregate(
+                Max("updated_at")
+            )["updated_at__max"]
+
+        try:
+            if repository is not None and not repository.has_issue_history:
+                return self._backfill_issues(repository, token, since)
+            issues = client.get_issue_changes(repo_name, owner, token, since)
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code in (404, 410, 451):
+                raise RepositoryUnavailableException("not_found") from e
+            raise
+        if repository is None or not issues:
+            return [{**issue, "action": "opened"} for issue in issues]
+        return self._store_changes(repository, issues)
+
+    def _store_changes(self, repository: Repository, issues: list[dict]) -> list[dict]:
+        """
+        Stores the issues that changed since they were stored.
+
+        Args:
+            repository (Repository): The repository of the issues.
+            issues (list[dict]): The issues as returned by the client.
+
+        Returns:
+            list[dict]: The changed issues, each with its "action".
+        """
+        stored = {
+            number: (state, updated_at)
+            for number, state, updated_at in Issue.objects.filter(
+                repository=repository, number__in=[issue["number"] for issue in issues]
+            ).values_list("number", "state", "updated_at")
+        }
+        changes = []
+        for issue in issues:
+            previous = stored.get(issue["number"])
+            if previous is None:
+                action = "opened" if issue["state"] == "open" else "closed"
+            elif previous[1] >= parse_datetime(issue["updated_at"]):
+                continue
+            elif previous[0] != issue["state"]:
+                action = "closed" if issue["state"] == "closed" else "reopened"
+            else:
+                action = "updated"
+            changes.append({**issue, "action": action})
+
+        self.store_issues(
+            repository,
+            [
+                {key: value for key, value in change.items() if key != "action"}
+                for change in changes
+            ],
+        )
+        return changes
+
+    def _backfill_issues(
+        self, repository: Repository, token: str, since: datetime | None
+    ) -> list[dict]:
+        """
+        Stores every issue of a repository, one page at a time.
+
+        Issues that were already stored are only updated if they changed, so a
+        backfill cut short is simply started over by the next poll. Once every
+        page is stored the repository has its issue history, and its number of
+        open issues is recorded.
+
+        Args:
+            repository (Repository): The repository.
+            token (str): The authentication token.
+            since (datetime | None): The latest update among the stored issues.
+
+        Returns:
+            list[dict]: The changed issues updated since `since`, or in the past
+                hour without it, each with its "action".
+        """
+        cutoff = since or datetime.now(UTC) - timedelta(hours=1)
+        changes = []
+        pages = self.clients[repository.repository_type].get_issues(
+            repository.name, repository.owner, token
+        )
+        for issues in pages:
+            changes.extend(
+                change
+                for change in self._store_changes(repository, issues)
+                if parse_datetime(change["updated_at"]) >= cutoff
+            )
+        repository.has_issue_history = True
+        repository.save(update_fields=["has_issue_history"])
+        IssueStatsService().record_open_issues(repository)
+        return changes
+
+    @traced
+    def deactivate_repository(
+        self,
+        repo_name: str,
+        reason: str,
+        repository_type: int = RepositoryTypes.GITHUB.value,
+    ) -> None:
+        """
+        Stops polling a repository that can no longer be checked.
+
+        Args:
+            repo_name (str): The name of the repository.
+            reason (str): One of "not_found", "archived" or "disabled".
+            repository_type (int): The provider of the repository.
+        """
+        Repository.objects.filter(
+            name=repo_name, repository_type=repository_type
+        ).update(is_active=False, is_archived=reason != "not_found")
+
+    @traced
+    def handle_missing_repository(
+        self,
+        repo_name: str,
+        owner: str,
+        user_id: int,
+        repository_type: int = RepositoryTypes.GITHUB.value,
+    ) -> bool:
+        """
+        Handles a repository the token of a user no longer sees.
+
+        GitHub answers 404 both for deleted repositories and for repositories the
+        token can't see, so one miss only deactivates a repository when it holds
+        for everyone. A public repository is looked up again without a token. For
+        any other, the subscription of the user loses its access, and the
+        repository is deactivated once no subscriber with access is left.
+
+        Args:
+            repo_name (str): The name of the repository.
+            owner (str): The owner of the repository.
+            user_id (int): The ID of the user whose token missed the repository.
+            repository_type (int): The provider of the repository.
+
+        Returns:
+            bool: True if the repository was deactivated.
+        """
+        repository = Repository.objects.filter(
+            name=repo_name, repository_type=repository_type
+        ).first()
+        if repository is None:
+            return False
+
+        if repository.is_private is False:
+            metadata = self.clients[repository_type].fetch_repository(
+                repo_name, owner, None
+            )
+            if metadata["exists"]:
+                return False
+        else:
+            Subscription.objects.filter(repository=repository, user_id=user_id).update(
+                has_access=False
+            )
+            transaction.on_commit(
+                lambda: SubscriberIndexService().remove([repository.id], [user_id])
+            )
+            if Subscription.objects.filter(
+                repository=repository, has_access=True
+            ).exists():
+                return False
+        self.deactivate_repository(repo_name, "not_found", repository_type)
+        return True
+
+
+class IssueStatsService:
+    """
+    Service class for the daily issue activity of repositories.
+
+    Changes are added to IssueDailyStat rows as the poller stores them, so the
+    statistics of a repository are read from its recent rows without touching
+    the issues. The time-to-close of the issues closed on a day is kept as a
+    histogram with buckets a quarter octave wide, which is enough to estimate
+    the median within about 10%.
+    """
+
+    def _get_close_bucket(self, seconds: float) -> str:
+        return str(math.floor(4 * math.log2(max(seconds, 60) / 60)))
+
+    def _get_bucket_seconds(self, bucket: str) -> float:
+        return 60 * 2 ** ((int(bucket) + 0.5) / 4)
+
+    def _get_day(self, changes: dict, moment: datetime | str) -> dict:
+        if isinstance(moment, str):
+            moment = parse_datetime(moment)
+        return changes.setdefault(
+            moment.astimezone(UTC).date(),
+            {
+                "opened": 0,
+                "closed": 0,
+                "close_durations": Counter(),
+                "labels": Counter(),
+            },
+        )
+
+    def _add_issue(
+        self, changes: dict, previous_state: str | None, issue: dict
+    ) -> None:
+        """
+        Adds the activity implied by the new state of an issue to `changes`.
+
+        An issue seen for the first time counts as opened on its creation day, and
+        an issue that wasn't stored as closed yet counts as closed on its close day.
+        """
+        if previous_state is None:
+            self._get_day(changes, issue["created_at"])["opened"] += 1
+        if issue["state"] != "closed" or previous_state == "closed":
+            return
+        if not issue["closed_at"]:
+            return
+        created_at, closed_at = issue["created_at"], issue["closed_at"]
+        if isinstance(created_at, str):
+            created_at = parse_datetime(created_at)
+            closed_at = parse_datetime(closed_at)
+        day = self._get_day(changes, closed_at)
+        day["closed"] += 1
+        duration = (closed_at - created_at).total_seconds()
+        day["close_durations"][self._get_close_bucket(duration)] += 1
+
+    @read_from_primary()
+    def _apply(
+        self, repository: Repository, changes: dict, open_issues: int | None = None
+    ) -> None:
+        """
+        Adds a batch of daily changes to the stored rows of a repository.
+
+        Args:
+            repository (Repository): The repository.
+            changes (dict): The changes keyed by day.
+            open_issues (int | None): The current number of open issues, stored on
+                today's row if given.
+        """
+        today = datetime.now(UTC).date()
+        if open_issues is not None:
+            self._get_day(changes, datetime.now(UTC))
+        if not changes:
+            return
+
+        with transaction.atomic():
+            IssueDailyStat.objects.bulk_create(
+                [IssueDailyStat(repository=repository, date=day) for day in changes],
+                ignore_conflicts=True,
+            )
+            rows = list(
+                IssueDailyStat.objects.select_for_update()
+                .filter(repository=repository, date__in=list(changes))
+                .order_by("date")
+            )
+            for row in rows:
+                change = changes[row.date]
+                row.opened += change["opened"]
+                row.closed += change["closed"]
+                row.close_durations = dict(
+                    Counter(row.close_durations) + change["close_durations"]
+                )
+                row.labels = dict(Counter(row.labels) + change["labels"])
+                if open_issues is not None and row.date == today:
+                    row.open_issues = open_issues
+            IssueDailyStat.objects.bulk_update(
+                rows, ["opened", "closed", "open_issues", "close_durations", "labels"]
+            )
+
+    def record_issues(
+        self, repository: Repository, previous_states: dict, issues: list[dict]
+    ) -> None:
+        """
+        Records the activity of stored issues.
+
+        The number of open issues is only recorded for repositories with their
+        issue history, since the stored issues of others are a subset.
+
+        Args:
+            repository (Repository): The repository of the issues.
+            previous_states (dict): The stored state of each issue number before the
+                issues were stored, missing for new issues.
+            issues (list[dict]): The issues as returned by the client.
+        """
+        changes = {}
+        for issue in issues:
+            self._add_issue(changes, previous_states.get(issue["number"]), issue)
+        open_issues = None
+        if repository.has_issue_history:
+            open_issues = self._count_open_issues(repository)
+        self._apply(repository, changes, open_issues)
+
+    def record_open_issues(self, repository: Repository) -> None:
+        """
+        Records the current number of open issues of a repository on today's row.
+
+        Args:
+            repository (Repository): The repository, with its issue history.
+        """
+        self._apply(repository, {}, self._count_open_issues(repository))
+
+    def _count_open_issues(self, repository: Repository) -> int:
+        return Issue.objects.filter(repository=repository, state="open").count()
+
+    def record_timeline_events(
+        self, repository: Repository, events: list[dict]
+    ) -> None:
+        """
+        Records the labels added by new timeline events.
+
+        Args:
+            repository (Repository): The repository of the events.
+            events (list[dict]): The timeline events as returned by the client.
+        """
+        changes = {}
+        for event in events:
+            if event.get("event") != "labeled" or not event.get("created_at"):
+                continue
+            label = (event.get("label") or {}).get("name")
+            if label:
+                self._get_day(changes, event["created_at"])["labels"][label] += 1
+        self._apply(repository, changes)
+
+    @traced
+    def get_repository_stats(
+        self,
+        repo_name: str,
+        user: User,
+        days: int,
+        repository_type: int = RepositoryTypes.GITHUB.value,
+    ) -> dict | None:
+        """
+        Summarizes the issue activity of a repository over its last days.
+
+        Args:
+            repo_name (str): The name of the repository.
+            user (User): The user object; only their subscriptions are readable.
+            days (int): The number of days, including today.
+            repository_type (int): The provider of the repository.
+
+        Returns:
+            dict | None: The "open_issues", the "opened" and "closed" counts of each
+                "day", the "median_time_to_close" in seconds and the "top_labels";
+                None if the user isn't subscribed to the repository.
+        """
+        try:
+            repository = user.repositories.get(
+                name=repo_name, repository_type=repository_type
+            )
+        except Repository.DoesNotExist:
+            return None
+        since = datetime.now(UTC).date() - timedelta(days=days - 1)
+        rows = list(
+            IssueDailyStat.objects.filter(
+                repository=repository, date__gte=since
+            ).order_by("date")
+        )
+
+        snapshots = [row.open_issues for row in rows if row.open_issues is not None]
+        if snapshots:
+            open_issues = snapshots[-1]
+        else:
+            open_issues = (
+                IssueDailyStat.objects.filter(
+                    repository=repository, date__lt=since, open_issues__isnull=False
+                )
+                .order_by("-date")
+                .values_list("open_issues", flat=True)
+                .first()
+            )
+
+        close_durations = sum((Counter(row.close_durations) for row in rows), Counter())
+        labels = sum((Counter(row.labels) for row in rows), Counter())
+        return {
+            "open_issues": open_issues,
+            "days": [
+                {"date": row.date, "opened": row.opened, "closed": row.closed}
+                for row in rows
+            ],
+            "median_time_to_close": self._get_median(close_durations),
+            "top_labels": [
+                {"label": label, "count": count}
+                for label, count in labels.most_common(settings.ISSUE_STATS_TOP_LABELS)
+            ],
+        }
+
+    def _get_median(self, histogram: Counter) -> float | None:
+        total = histogram.total()
+        if not total:
+            return None
+        seen = 0
+        for bucket in sorted(histogram, key=int):
+            seen += histogram[bucket]
+            if seen * 2 >= total:
+                return self._get_bucket_seconds(bucket)
+
+    @traced
+    def rebuild(self, repository: Repository, batch_size: int) -> None:
+        """
+        Recomputes the daily rows of a repository from its stored issues and
+        timeline events.
+
+        Issues and events are read with server-side cursors and their changes are
+        written every `batch_size` records, so memory use doesn't grow with the
+        size of the repository. The open issue counts of past days can't be
+        recomputed, so they are kept; the rest is rebuilt in one transaction, so
+        readers never see a partial rebuild.
+
+        Args:
+            repository (Repository): The repository.
+            batch_size (int): The number of records read per batch.
+        """
+        with transaction.atomic():
+            rows = IssueDailyStat.objects.filter(repository=repository)
+            rows.filter(open_issues__isnull=True).delete()
+            rows.update(opened=0, closed=0, close_durations={}, labels={})
+
+            changes = {}
+            issues = Issue.objects.filter(repository=repository).values(
+                "created_at", "closed_at", "state"
+            )
+            for index, issue in enumerate(issues.iterator(chunk_size=batch_size), 1):
+                self._add_issue(changes, None, issue)
+                if index % batch_size == 0:
+                    self._apply(repository, changes)
+                    changes = {}
+
+            events = TimelineEvent.objects.filter(
+                repository=repository, event="labeled", created_at__isnull=False
+            ).values_list("created_at", "payload__label__name")
+            for index, (created_at, label) in enumerate(
+                events.iterator(chunk_size=batch_size), 1
+            ):
+                if label:
+                    self._get_day(changes, created_at)["labels"][label] += 1
+                if index % batch_size == 0:
+                    self._apply(repository, changes)
+                    changes = {}
+
+            open_issues = None
+            if repository.has_issue_history:
+                open_issues = self._count_open_issues(repository)
+            self._apply(repository, changes, open_issues)
+
+
+class _Echo:
+    """
+    A file-like object that returns what is written to it, so csv.writer can
+    format one row at a time.
+    """
+
+    def write(self, value: str) -> str:
+        return value
+
+
+class IssueExportService:
+    """
+    Service class for exporting the stored issues and timeline events of a
+    repository.
+
+    Records are read with server-side cursors and yielded one by one, so memory
+    use stays flat whatever the size of the repository. Every issue is followed
+    by its timeline events, and every record carries a cursor of the form
+    "<issue number>:<event position>", -1 for the issue itself, from which an
+    interrupted export can be resumed.
+    """
+
+    formats = ("ndjson", "csv")
+    csv_fields = (
+        "type",
+        "cursor",
+        "issue_number",
+        "position",
+        "title",
+        "state",
+        "labels",
+        "event",
+        "event_id",
+        "created_at",
+        "updated_at",
+        "closed_at",
+        "payload",
+    )
+
+    def _parse_cursor(self, cursor: str | None) -> tuple[int, int] | None:
+        if not cursor:
+            return None
+        number, position = cursor.split(":")
+        return int(number), int(position)
+
+    def _iter_issues(
+        self, repository: Repository, after: tuple[int, int] | None
+    ) -> Iterator[dict]:
+        issues = Issue.objects.filter(repository=repository)
+        if after is not None:
+            issues = issues.filter(number__gt=after[0])
+        for issue in (
+            issues.order_by("number")
+            .values(
+                "number",
+                "title",
+                "state",
+                "labels",
+                "created_at",
+                "updated_at",
+                "closed_at",
+            )
+            .iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+        ):
+            number = issue.pop("number")
+            yield {
+                "type": "issue",
+                "cursor": f"{number}:-1",
+                "issue_number": number,
+                "position": -1,
+                **issue,
+            }
+
+    def _iter_events(
+        self, repository: Repository, after: tuple[int, int] | None
+    ) -> Iterator[dict]:
+        events = TimelineEvent.objects.filter(repository=repository)
+        if after is not None:
+            number, position = after
+            events = events.filter(
+                Q(issue_number__gt=number)
+                | Q(issue_number=number, position__gt=position)
+            )
+        for event in (
+            events.order_by("issue_number", "position")
+            .values(
+                "issue_number", "position", "event", "event_id", "created_at", "payload"
+            )
+            .iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+        ):
+            yield {
+                "type": "event",
+                "cursor": f"{event['issue_number']}:{event['position']}",
+                **event,
+            }
+
+    def iter_records(
+        self, repository: Repository, after: str | None = None
+    ) -> Iterator[dict]:
+        """
+        Yields the issues and timeline events of a repository in cursor order.
+
+        Args:
+            repository (Repository): The repository.
+            after (str | None): The cursor of the last record already exported.
+
+        Yields:
+            dict: An issue or timeline event record.
+        """
+        cursor = self._parse_cursor(after)
+        records = heapq.merge(
+            self._iter_issues(repository, cursor),
+            self._iter_events(repository, cursor),
+            key=lambda record: (record["issue_number"], record["position"]),
+        )
+        yield from records
+
+    def _format_ndjson(self, records: Iterator[dict]) -> Iterator[str]:
+        for record in records:
+            yield json.dumps(record, cls=DjangoJSONEncoder) + "\n"
+
+    def _format_csv(self, records: Iterator[dict]) -> Iterator[str]:
+        writer = csv.DictWriter(_Echo(), self.csv_fields, extrasaction="ignore")
+        yield writer.writeheader()
+        for record in records:
+            row = {}
+            for field, value in record.items():
+                if field in ("labels", "payload"):
+                    value = json.dumps(value)
+                elif isinstance(value, datetime):
+                    value = value.isoformat()
+                row[field] = value
+            yield writer.writerow(row)
+
+    @traced
+    def export(
+        self,
+        repo_name: str,
+        output: str = "ndjson",
+        after: str | None = None,
+        repository_type: int = RepositoryTypes.GITHUB.value,
+        user: User | None = None,
+    ) -> Iterator[str] | None:
+        """
+        Exports the issues and timeline events of a repository.
+
+        Args:
+            repo_name (str): The name of the repository.
+            output (str): "ndjson" or "csv".
+            after (str | None): The cursor of the last record already exported.
+            repository_type (int): The provider of the repository.
+            user (User | None): The user the export is for, who must be subscribed
+                to the repository; None for any tracked repository.
+
+        Returns:
+            Iterator[str] | None: The lines of the export, None if the repository is
+                not tracked or the user isn't subscribed to it.
+        """
+        repositories = Repository.objects if user is None else user.repositories
+        try:
+            repository = repositories.get(
+                name=repo_name, repository_type=repository_type
+            )
+        except Repository.DoesNotExist:
+            return None
+        records = self.iter_records(repository, after)
+        if output == "csv":
+            return self._format_csv(records)
+        return self._format_ndjson(records)
+
+
+class SubscriberIndexService:
+    """
+    Service class for the Redis index of the subscribers of repositories.
+
+    Each repository has a Redis set of the IDs of its subscribers, so the poller
+    reads the subscribers of a page of repositories with one pipelined SMEMBERS
+    round trip instead of a join. The sets only hold the subscribers with access,
+    whose tokens were shown to see the repository, so the poller may use any of
+    them. Emails and the active flag of users are resolved by the poller, so
+    changing a user never touches the index. The index is rebuilt from Postgres
+    when it is missing.
+    """
+
+    ready_key = "subscriber_index:ready"
+
+    def _get_key(self, repository_id: int) -> str:
+        return cache.make_key(f"subscribers:{repository_id}")
+
+    def is_built(self) -> bool:
+        return bool(cache.get(self.ready_key))
+
+    def add(self, repository_ids: list[int], user_ids: list[int]) -> None:
+        """
+        Adds users to the sets of repositories.
+
+        Args:
+            repository_ids (list[int]): The IDs of the repositories.
+            user_ids (list[int]): The IDs of the subscribed users.
+        """
+        if not repository_ids or not user_ids:
+            return
+
+        pipeline = get_redis_client().pipeline(transaction=False)
+        for repository_id in repository_ids:
+            pipeline.sadd(self._get_key(repository_id), *user_ids)
+        pipeline.execute()
+
+    def remove(self, repository_ids: list[int], user_ids: list[int]) -> None:
+        """
+        Removes users from the sets of repositories.
+
+        Args:
+            repository_ids (list[int]): The IDs of the repositories.
+            user_ids (list[int]): The IDs of the unsubscribed users.
+        """
+        if not repository_ids or not user_ids:
+            return
+
+        pipeline = get_redis_client().pipeline(transaction=False)
+        for repository_id in repository_ids:
+            pipeline.srem(self._get_key(repository_id), *user_ids)
+        pipeline.execute()
+
+    def clear(self, repository_ids: list[int]) -> None:
+        """
+        Empties the sets of repositories.
+
+        Args:
+            repository_ids (list[int]): The IDs of the repositories.
+        """
+        if repository_ids:
+            get_redis_client().delete(*map(self._get_key, repository_ids))
+
+    def get_many(self, repository_ids: list[int]) -> dict[int, list[int]]:
+        """
+        Reads the subscribers of repositories in one round trip.
+
+        Args:
+            repository_ids (list[int]): The IDs of the repositories.
+
+        Returns:
+            dict[int, list[int]]: The IDs of the subscribers of each repository,
+                active or not.
+        """
+        pipeline = get_redis_client().pipeline(transaction=False)
+        for repository_id in repository_ids:
+            pipeline.smembers(self._get_key(repository_id))
+        return {
+            repository_id: sorted(int(member) for member in members)
+            for repository_id, members in zip(repository_ids, pipeline.execute())
+        }
+
+    @read_from_primary()
+    def rebuild(self, batch_size: int) -> int:
+        """
+        Rebuilds the index from the subscriptions in Postgres.
+
+        Subscriptions are read in batches ordered by repository, and the set of
+        each repository is replaced in a MULTI block, so readers never see it
+        half written. Sets of repositories left without subscribers are deleted
+        at the end.
+
+        Args:
+            batch_size (int): The number of subscriptions read per query.
+
+        Returns:
+            int: The number of repositories indexed.
+        """
+        client = get_redis_client()
+        subscriptions = (
+            Subscription.objects.filter(has_access=True)
+            .order_by("repository_id")
+            .values_list("repository_id", "user_id")
+            .iterator(chunk_size=batch_size)
+        )
+
+        def replace(repository_id: int, user_ids: list[int]) -> None:
+            key = self._get_key(repository_id)
+            pipeline.delete(key)
+            pipeline.sadd(key, *user_ids)
+            indexed.add(key)
+
+        indexed = set()
+        pipeline = client.pipeline(transaction=True)
+        current, user_ids = None, []
+        for repository_id, user_id in subscriptions:
+            if repository_id != current:
+                if user_ids:
+                    replace(current, user_ids)
+                if len(pipeline) >= batch_size:
+                    pipeline.execute()
+                current, user_ids = repository_id, []
+            user_ids.append(user_id)
+        if user_ids:
+            replace(current, user_ids)
+        pipeline.execute()
+
+        stale = [
+            key
+            for key in client.scan_iter(match=self._get_key("*"), count=batch_size)
+            if key.decode() not in indexed
+        ]
+        for start in range(0, len(stale), batch_size):
+            client.delete(*stale[start : start + batch_size])
+
+        cache.set(self.ready_key, 1, None)
+        return len(indexed)
+
+
+class TaskOutcomeService:
+    """
+    Service class for rolling task outcomes up into windowed counters.
+
+    Outcomes are counted in the cache under one key per task, outcome and window,
+    and periodically copied into TaskOutcomeStat rows. Copying overwrites the row
+    with the current counts, so flushing the same window again is harmless.
+    """
+
+    outcome_fields = MappingProxyType(
+        {
+            "success": "successes",
+            "error": "errors",
+            "failure": "errors",
+            "rate_limited": "rate_limited",
+        }
+    )
+
+    def _window_start(self, timestamp: float) -> int:
+        window = settings.TASK_STATS_WINDOW
+        return int(timestamp // window * window)
+
+    def _key(self, task_name: str, field: str, window_start: int) -> str:
+        return f"task_stats:{task_name}:{field}:{window_start}"
+
+    def record_outcome(self, task_name: str, outcome: str) -> None:
+        """
+        Counts one task outcome in the current window.
+
+        Args:
+            task_name (str): The name of the task.
+            outcome (str): The outcome of the task, e.g. "success" or "error".
+        """
+        field = self.outcome_fields.get(outcome)
+        if field is None:
+            return
+
+        key = self._key(task_name, field, self._window_start(time.time()))
+        cache.add(key, 0, settings.TASK_STATS_WINDOW * 4)
+        cache.incr(key)
+
+    def flush_outcomes(self, task_names: list[str], windows: int = 3) -> int:
+        """
+        Copies the counters of the latest windows into TaskOutcomeStat rows.
+
+        Args:
+            task_names (list[str]): The names of the tasks to flush.
+            windows (int): The number of windows to flush, including the current one.
+
+        Returns:
+            int: The number of rows written.
+        """
+        current = self._window_start(time.time())
+        window_starts = [
+            current - settings.TASK_STATS_WINDOW * index for index in range(windows)
+        ]
+        fields = sorted(set(self.outcome_fields.values()))
+        keys = {
+            self._key(task_name, field, window_start): (task_name, window_start, field)
+            for task_name in task_names
+            for window_start in window_starts
+            for field in fields
+        }
+
+        rows = {}
+        for key, count in cache.get_many(keys).items():
+            task_name, window_start, field = keys[key]
+            row = rows.setdefault(
+                (task_name, window_start),
+                TaskOutcomeStat(
+                    task_name=task_name,
+                    window_start=datetime.fromtimestamp(window_start, tz=UTC),
+                ),
+            )
+            setattr(row, field, count)
+
+        TaskOutcomeStat.objects.bulk_create(
+            rows.values(),
+            update_conflicts=True,
+            unique_fields=["task_name", "window_start"],
+            update_fields=fields,
+        )
+        return len(rows)
+
+    def prune_task_results(self, before: datetime, batch_size: int) -> int:
+        """
+        Deletes task results finished before a point in time, one batch at a time.
+
+        Each batch is deleted by primary key in its own short statement, so the
+        table is never locked for the whole cleanup.
+
+        Args:
+            before (datetime): Results finished before this time are deleted.
+            batch_size (int): The number of rows deleted per statement.
+
+        Returns:
+            int: The number of deleted rows.
+        """
+        deleted = 0
+        while True:
+            ids = list(
+                TaskResult.objects.filter(date_done__lt=before)
+                .order_by("date_done")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not ids:
+                return deleted
+            deleted += TaskResult.objects.filter(id__in=ids).delete()[0]
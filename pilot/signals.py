@@ -0,0 +1,73 @@
+import time
+
+from celery import states
+from celery.signals import task_postrun, task_prerun, worker_init
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import transaction
+from django.db.models.signals import m2m_changed
+from django.dispatch import receiver
+from prometheus_client import start_http_server
+
+from pilot.metrics import TASK_DURATION, record_pool_stats
+from pilot.models import Repository
+from pilot.services import SubscriberIndexService, TaskOutcomeService
+
+TASK_OUTCOMES = ("success", "error", "rate_limited")
+
+_task_started_at: dict[str, float] = {}
+
+
+@worker_init.connect
+def start_worker_metrics_server(sender=None, **kwargs):
+    if settings.METRICS_WORKER_PORT:
+        start_http_server(settings.METRICS_WORKER_PORT)
+
+
+@task_prerun.connect
+def start_task_timer(sender=None, task_id=None, **kwargs):
+    if sender.name.startswith("pilot."):
+        _task_started_at[task_id] = time.perf_counter()
+
+
+@task_postrun.connect
+def observe_task_outcome(sender=None, task_id=None, retval=None, state=None, **kwargs):
+    started = _task_started_at.pop(task_id, None)
+    if started is None:
+        return
+
+    if state != states.SUCCESS:
+        outcome = str(state).lower()
+    elif retval in TASK_OUTCOMES:
+        outcome = retval
+    else:
+        outcome = "success" if retval else "error"
+    TASK_DURATION.labels(sender.name, outcome).observe(time.perf_counter() - started)
+    TaskOutcomeService().record_outcome(sender.name, outcome)
+    record_pool_stats()
+
+
+@request_finished.connect
+def observe_request_pool_stats(sender=None, **kwargs):
+    record_pool_stats()
+
+
+@receiver(m2m_changed, sender=Repository.users.through)
+def update_subscriber_index(
+    sender=None, instance=None, action=None, reverse=False, pk_set=None, **kwargs
+):
+    index = SubscriberIndexService()
+    if action in ("post_add", "post_remove"):
+        if reverse:
+            repository_ids, user_ids = list(pk_set), [instance.pk]
+        else:
+            repository_ids, user_ids = [instance.pk], list(pk_set)
+        update = index.add if action == "post_add" else index.remove
+        transaction.on_commit(lambda: update(repository_ids, user_ids))
+    elif action == "pre_clear":
+        # The cleared rows are only known before they are deleted.
+        if reverse:
+            repository_ids = list(instance.repositories.values_list("id", flat=True))
+            transaction.on_commit(lambda: index.remove(repository_ids, [instance.pk]))
+        else:
+            transaction.on_commit(lambda: index.clear([instance.pk]))
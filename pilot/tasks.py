@@ -1,12 +1,32 @@
 import logging
+import random
+from datetime import timedelta
 
+import requests
 from django.core.mail import send_mail
 from django.core.paginator import Paginator
+from django.utils import timezone
 
 from IssuePilot.celery import app
-from IssuePilot.settings import DEFAULT_FROM_EMAIL
+from IssuePilot.routers import read_from_replica
+from IssuePilot.settings import (
+    DEFAULT_FROM_EMAIL,
+    POLLING_TASKS_IGNORE_RESULT,
+    SUBSCRIBER_INDEX_BATCH_SIZE,
+    TASK_RESULT_PRUNE_BATCH_SIZE,
+    TASK_RESULT_RETENTION_DAYS,
+    TASK_RETRY_JITTER,
+)
 from pilot.enums import RepositoryTypes
-from pilot.services import RepositoryService
+from pilot.exceptions import (
+    CircuitOpenException,
+    RepositoryUnavailableException,
+    TooManyRequestException,
+)
+from pilot.metrics import FANOUT_SIZE
+from pilot.models import Repository
+from pilot.services import RepositoryService, SubscriberIndexService, TaskOutcomeService
+from pilot.tokens import TokenPool
 from users.models import User
 
 logger = logging.getLogger(__name__)
@@ -16,7 +36,45 @@ repository_services = {
 }
 
 
-@app.task(bind=True, max_retries=3, default_retry_delay=60 * 2, queue="send_email")
+def _jitter(countdown: float) -> float:
+    """
+    Adds random jitter to a retry delay so retries scheduled together don't all
+    run at the same moment.
+    """
+    return countdown + random.uniform(0, TASK_RETRY_JITTER)
+
+
+def _get_github_token(user_id: int) -> str:
+    """
+    Reads and decrypts the GitHub token of an active user. Tasks are given user
+    IDs and resolve tokens here, so tokens never pass through the broker.
+    """
+    return (
+        User.objects.only("github_token")
+        .get(id=user_id, is_active=True)
+        .get_github_token()
+    )
+
+
+def _is_transient(exc: Exception) -> bool:
+    """
+    Tells whether a failed check may succeed when retried: network errors, server
+    errors and an open circuit are transient, client errors are not.
+    """
+    if isinstance(exc, CircuitOpenException):
+        return True
+    if isinstance(exc, requests.HTTPError):
+        return exc.response is None or exc.response.status_code >= 500
+    return isinstance(exc, requests.RequestException)
+
+
+@app.task(
+    bind=True,
+    max_retries=3,
+    default_retry_delay=60 * 2,
+    queue="send_email",
+    ignore_result=POLLING_TASKS_IGNORE_RESULT,
+)
 def send_email_for_updated_repository(
     self, repository_name: str, owner: str, email: str
 ) -> int:
@@ -31,7 +89,10 @@ def send_email_for_updated_repository(
         str: The result of the task execution. Possible values are "success" or "error".
     """
     logger.info(
-        f"Task started: send_email_for_updated_repository {self.request.id}, repository_name: {repository_name}, email: {email}"
+        "Task started: send_email_for_updated_repository %s, repository: %s/%s",
+        self.request.id,
+        owner,
+        repository_name,
     )
     try:
         send = send_mail(
@@ -46,41 +107,121 @@ def send_email_for_updated_repository(
         )
     except Exception as e:
         logger.error(
-            f"Error in send_email_for_updated_repository {self.request.id}: {str(e)}"
+            "Error in send_email_for_updated_repository %s: %s", self.request.id, e
         )
         return 0
 
     logger.info(
-        f"Task finished: send_email_for_updated_repository {self.request.id}, repository_name: {repository_name}, email: {email}"
+        "Task finished: send_email_for_updated_repository %s, repository: %s/%s",
+        self.request.id,
+        owner,
+        repository_name,
     )
     return send
 
 
-@app.task(bind=True, max_retries=3, default_retry_delay=60 * 2, queue="default")
+@app.task(
+    bind=True,
+    max_retries=3,
+    default_retry_delay=60 * 2,
+    queue="default",
+    ignore_result=POLLING_TASKS_IGNORE_RESULT,
+)
 def check_repositories_update(
     self,
-    email: str,
-    token: str,
+    emails: list[str],
+    user_id: int,
     repository_name: str,
     owner: str,
     repository_type: int = RepositoryTypes.GITHUB.value,
 ) -> str:
+    """
+    Check a repository for issue changes and notify its subscribers.
+
+    Args:
+        emails (list[str]): The email addresses of the subscribers.
+        user_id (int): The ID of the user whose token is used for the requests.
+        repository_name (str): The name of the repository.
+        owner (str): The owner of the repository.
+        repository_type (int): The provider of the repository.
+
+    Returns:
+        str: The result of the task execution. Possible values are "success",
+            "error" or "rate_limited".
+    """
     logger.info(
-        f"Task started: check_repositories_update {self.request.id}, email: {email}, repository_name: {repository_name}, owner: {owner}, repository_type: {repository_type}"
+        "Task started: check_repositories_update %s, repository: %s/%s, repository_type: %s",
+        self.request.id,
+        owner,
+        repository_name,
+        repository_type,
     )
+    service = repository_services[repository_type]()
     try:
-        service = repository_services[repository_type]()
-        is_changed = service.check_create_or_update_issues(
-            repository_name, owner, token
+        token = _get_github_token(user_id)
+        changes = service.collect_issue_changes(
+            repository_name, owner, token, repository_type
         )
-        if is_changed:
-            send_email_for_updated_repository.delay(repository_name, owner, email)
-    except Exception as e:
-        logger.error(f"Error in check_repositories_update {self.request.id}: {str(e)}")
+        if changes:
+            for email in emails:
+                send_email_for_updated_repository.delay(repository_name, owner, email)
+            sync_issue_timelines.delay(
+                repository_name,
+                owner,
+                user_id,
+                [change["number"] for change in changes],
+                repository_type,
+            )
+    except RepositoryUnavailableException as e:
+        logger.warning(
+            "Repository unavailable in check_repositories_update %s: %s/%s %s",
+            self.request.id,
+            owner,
+            repository_name,
+            e.reason,
+        )
+        if e.reason != "not_found":
+            service.deactivate_repository(repository_name, e.reason, repository_type)
+            return "error"
+        try:
+            service.handle_missing_repository(
+                repository_name, owner, user_id, repository_type
+            )
+        except (
+            TooManyRequestException,
+            CircuitOpenException,
+            requests.RequestException,
+        ) as lookup_error:
+            # The repository stays active and is checked again next cycle.
+            logger.warning(
+                "Missing repository left active in check_repositories_update %s: %s",
+                self.request.id,
+                lookup_error,
+            )
         return "error"
+    except TooManyRequestException as e:
+        logger.warning(
+            "Rate limited in check_repositories_update %s: %s", self.request.id, e
+        )
+        if self.request.retries >= self.max_retries:
+            return "rate_limited"
+        retry_after = e.retry_after
+        if retry_after is None:
+            retry_after = self.default_retry_delay
+        raise self.retry(exc=e, countdown=_jitter(retry_after))
+    except Exception as e:
+        logger.error("Error in check_repositories_update %s: %s", self.request.id, e)
+        if not _is_transient(e) or self.request.retries >= self.max_retries:
+            return "error"
+        backoff = self.default_retry_delay * 2**self.request.retries
+        raise self.retry(exc=e, countdown=_jitter(backoff))
 
     logger.info(
-        f"Task finished: check_repositories_update {self.request.id}, email: {email}, repository_name: {repository_name}, owner: {owner}, repository_type: {repository_type}"
+        "Task finished: check_repositories_update %s, repository: %s/%s, repository_type: %s",
+        self.request.id,
+        owner,
+        repository_name,
+        repository_type,
     )
     return "success"
 
@@ -88,40 +229,285 @@ def check_repositories_update(
 @app.task(bind=True, max_retries=3, default_retry_delay=60 * 2, queue="default")
 def check_users_repositories_update(self) -> str:
     """
-    Check for updates in users' repositories and schedule tasks to process them.
+    Check for updates in the subscribed repositories and schedule tasks to process them.
 
-    This function retrieves all active users along with their repositories and schedules tasks
-    to check for updates in each repository. It uses pagination to process users in batches
-    of 100 to avoid performance issues.
+    Each repository is checked once per cycle, whatever its number of subscribers,
+    with the token of the pool that has the most rate limit budget left. Public
+    repositories may use any user's token; private or not yet checked ones only
+    the tokens of their subscribers with access, the only ones in the index. Repositories are processed in batches of 100 to
+    avoid performance issues, and those no token has budget for wait for the
+    next cycle. Subscribers are read from the Redis subscriber index, which is
+    rebuilt first if it is missing. Checks are scheduled with the ID of the
+    owner of the chosen token, never the token itself.
 
     Returns:
         str: The result of the task execution. Possible values are "success" or "error".
     """
-    logger.info(f"Task started: check_users_repositories_update {self.request.id}")
+    logger.info("Task started: check_users_repositories_update %s", self.request.id)
+    scheduled = 0
+    skipped = 0
     try:
-        users = (
-            User.objects.filter(is_active=True)
-            .prefetch_related("repositories")
-            .order_by("id")
-        )
-        paginator = Paginator(users, 100)
-        for page in paginator.page_range:
-            users_page = paginator.get_page(page)
-            for user in users_page.object_list:
-                for repository in user.repositories.all():
+        index = SubscriberIndexService()
+        if not index.is_built():
+            index.rebuild(SUBSCRIBER_INDEX_BATCH_SIZE)
+        with read_from_replica():
+            users = User.objects.filter(is_active=True).only(
+                "id", "email", "github_token"
+            )
+            tokens = {user.id: user.get_github_token() for user in users}
+            token_users = {token: user_id for user_id, token in tokens.items()}
+            emails = {user.id: user.email for user in users}
+            pool = TokenPool(tokens.values())
+            repositories = Repository.objects.filter(is_active=True).order_by("id")
+            paginator = Paginator(repositories, 100)
+            for page in paginator.page_range:
+                repositories_page = paginator.get_page(page)
+                subscriber_ids = index.get_many(
+                    [repository.id for repository in repositories_page.object_list]
+                )
+                for repository in repositories_page.object_list:
+                    # Inactive users aren't loaded, so they are left out here.
+                    subscribers = [
+                        user_id
+                        for user_id in subscriber_ids[repository.id]
+                        if user_id in tokens
+                    ]
+                    if not subscribers:
+                        continue
+                    eligible = None
+                    if repository.is_private is not False:
+                        eligible = [tokens[user_id] for user_id in subscribers]
+                    token = pool.acquire(eligible)
+                    if token is None:
+                        skipped += 1
+                        continue
                     check_repositories_update.delay(
-                        user.email,
-                        user.get_github_token(),
+                        [emails[user_id] for user_id in subscribers],
+                        token_users[token],
                         repository.name,
                         repository.owner,
                         repository.repository_type,
                     )
-            if not users_page.has_next():
-                break
+                    scheduled += 1
+                if not repositories_page.has_next():
+                    break
+        FANOUT_SIZE.observe(scheduled)
     except Exception as e:
         logger.error(
-            f"Error in check_users_repositories_update {self.request.id}: {str(e)}"
+            "Error in check_users_repositories_update %s: %s", self.request.id, e
+        )
+        return "error"
+    logger.info(
+        "Task finished: check_users_repositories_update %s, scheduled: %s, skipped: %s",
+        self.request.id,
+        scheduled,
+        skipped,
+    )
+    return "success"
+
+
+@app.task(bind=True, queue="default")
+def flush_task_outcomes(self) -> str:
+    """
+    Roll the task outcome counters of the latest windows up into TaskOutcomeStat rows.
+
+    Returns:
+        str: The result of the task execution. Possible values are "success" or "error".
+    """
+    task_names = [name for name in app.tasks if name.startswith("pilot.")]
+    try:
+        rows = TaskOutcomeService().flush_outcomes(task_names)
+    except Exception:
+        logger.exception("Error in flush_task_outcomes %s", self.request.id)
+        return "error"
+    logger.info(
+        "Task finished: flush_task_outcomes %s, rows: %s", self.request.id, rows
+    )
+    return "success"
+
+
+@app.task(bind=True, queue="default")
+def prune_task_results(self) -> str:
+    """
+    Delete stored task results older than the retention period in small batches.
+
+    Returns:
+        str: The result of the task execution. Possible values are "success" or "error".
+    """
+    before = timezone.now() - timedelta(days=TASK_RESULT_RETENTION_DAYS)
+    try:
+        deleted = TaskOutcomeService().prune_task_results(
+            before, TASK_RESULT_PRUNE_BATCH_SIZE
+        )
+    except Exception:
+        logger.exception("Error in prune_task_results %s", self.request.id)
+        return "error"
+    logger.info(
+        "Task finished: prune_task_results %s, deleted: %s", self.request.id, deleted
+    )
+    return "success"
+
+
+@app.task(bind=True, max_retries=3, default_retry_delay=60 * 2, queue="default")
+def import_user_repositories(
+    self, user_id: int, repository_type: int = RepositoryTypes.GITHUB.value
+) -> str:
+    """
+    Subscribe a user to the repositories they watch or have starred.
+
+    Rate-limited imports are retried when the limit resets and transient errors
+    with exponential backoff, like repository checks. Linking is idempotent, so a
+    retry starts over without duplicating subscriptions.
+
+    Args:
+        user_id (int): The ID of the user.
+        repository_type (int): The provider to import from.
+
+    Returns:
+        str: The result of the task execution. Possible values are "success", "error"
+            or "rate_limited".
+    """
+    logger.info(
+        "Task started: import_user_repositories %s, user: %s",
+        self.request.id,
+        user_id,
+    )
+    try:
+        user = User.objects.get(id=user_id, is_active=True)
+        service = repository_services[repository_type]()
+        linked = service.import_user_repositories(user, repository_type)
+    except TooManyRequestException as e:
+        logger.warning(
+            "Rate limited in import_user_repositories %s: %s", self.request.id, e
         )
+        if self.request.retries >= self.max_retries:
+            return "rate_limited"
+        retry_after = e.retry_after
+        if retry_after is None:
+            retry_after = self.default_retry_delay
+        raise self.retry(exc=e, countdown=_jitter(retry_after))
+    except Exception as e:
+        logger.exception("Error in import_user_repositories %s", self.request.id)
+        if not _is_transient(e) or self.request.retries >= self.max_retries:
+            return "error"
+        backoff = self.default_retry_delay * 2**self.request.retries
+        raise self.retry(exc=e, countdown=_jitter(backoff))
+
+    logger.info(
+        "Task finished: import_user_repositories %s, user: %s, linked: %s",
+        self.request.id,
+        user_id,
+        linked,
+    )
+    return "success"
+
+
+@app.task(
+    bind=True,
+    max_retries=3,
+    default_retry_delay=60 * 2,
+    queue="default",
+    ignore_result=POLLING_TASKS_IGNORE_RESULT,
+)
+def refresh_repository_metadata(
+    self,
+    repository_name: str,
+    owner: str,
+    repository_type: int = RepositoryTypes.GITHUB.value,
+) -> str:
+    """
+    Refresh the cached metadata of a repository before it expires.
+
+    The request is made with the token of the subscriber that has the most rate
+    limit budget left, read and decrypted here so no token passes through the
+    broker. Repositories without active subscribers are left to expire.
+
+    Args:
+        repository_name (str): The name of the repository.
+        owner (str): The owner of the repository.
+        repository_type (int): The provider of the repository.
+
+    Returns:
+        str: The result of the task execution. Possible values are "success", "error"
+            or "rate_limited".
+    """
+    try:
+        subscribers = User.objects.filter(
+            is_active=True,
+            repositories__name=repository_name,
+            repositories__repository_type=repository_type,
+        ).only("github_token")
+        token = TokenPool(user.get_github_token() for user in subscribers).acquire()
+        if token is None:
+            logger.info(
+                "No subscriber token in refresh_repository_metadata %s: %s/%s",
+                self.request.id,
+                owner,
+                repository_name,
+            )
+            return "success"
+        service = repository_services[repository_type]()
+        service.refresh_repository(repository_name, owner, token, repository_type)
+    except TooManyRequestException as e:
+        logger.warning(
+            "Rate limited in refresh_repository_metadata %s: %s", self.request.id, e
+        )
+        return "rate_limited"
+    except Exception:
+        logger.exception("Error in refresh_repository_metadata %s", self.request.id)
         return "error"
-    logger.info(f"Task finished: check_users_repositories_update {self.request.id}")
+    return "success"
+
+
+@app.task(
+    bind=True,
+    max_retries=3,
+    default_retry_delay=60 * 2,
+    queue="default",
+    ignore_result=POLLING_TASKS_IGNORE_RESULT,
+)
+def sync_issue_timelines(
+    self,
+    repository_name: str,
+    owner: str,
+    user_id: int,
+    issue_numbers: list[int],
+    repository_type: int = RepositoryTypes.GITHUB.value,
+) -> str:
+    """
+    Store the new timeline events of the changed issues of a repository.
+
+    Args:
+        repository_name (str): The name of the repository.
+        owner (str): The owner of the repository.
+        user_id (int): The ID of the user whose token is used for the requests.
+        issue_numbers (list[int]): The numbers of the changed issues.
+        repository_type (int): The provider of the repository.
+
+    Returns:
+        str: The result of the task execution. Possible values are "success", "error"
+            or "rate_limited".
+    """
+    try:
+        token = _get_github_token(user_id)
+        service = repository_services[repository_type]()
+        stored = service.sync_issue_timelines(
+            repository_name, owner, token, issue_numbers, repository_type
+        )
+    except TooManyRequestException as e:
+        logger.warning(
+            "Rate limited in sync_issue_timelines %s: %s", self.request.id, e
+        )
+        return "rate_limited"
+    except Exception:
+        logger.exception("Error in sync_issue_timelines %s", self.request.id)
+        return "error"
+
+    logger.info(
+        "Task finished: sync_issue_timelines %s, repository: %s/%s, stored: %s",
+        self.request.id,
+        owner,
+        repository_name,
+        stored,
+    )
     return "success"
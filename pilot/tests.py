@@ -1,14 +1,76 @@
+import contextvars
+import json
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
 import pytest
 import requests
-
+from celery.app.task import Context
+from django.conf import settings
+from django.core import mail
+from django.core.cache import cache
+from django.db import connections
+from django.utils import timezone
+from django_celery_results.models import TaskResult
+from opentelemetry import trace
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from prometheus_client import REGISTRY
+from urllib3.util import Retry
+
+from IssuePilot import routers
+from IssuePilot.log import JsonFormatter, SamplingFilter
+from IssuePilot.tracing import (
+    FileSpanExporter,
+    configure_tracing,
+    end_task_span,
+    start_publish_span,
+    start_task_span,
+)
+from pilot.cache import REPOSITORIES, REPOSITORY_REFRESHES, CacheNamespace
 from pilot.clients import GitHubClient
 from pilot.enums import RepositoryTypes
-from pilot.exceptions import TooManyRequestException
+from pilot.exceptions import (
+    CircuitOpenException,
+    RepositoryUnavailableException,
+    TooManyRequestException,
+)
+from pilot.management.commands.benchmark_transports import HTTP2Stub
+from pilot.metrics import record_pool_stats
+from pilot.models import (
+    Issue,
+    IssueDailyStat,
+    Repository,
+    Subscription,
+    TaskOutcomeStat,
+    TimelineEvent,
+)
+from pilot.resilience import AdaptiveLimiter, CircuitBreaker, TokenPacer
 from pilot.serializers import RepositorySerializer
-from pilot.services import RepositoryService
-from pilot.tasks import (check_repositories_update,
-                         check_users_repositories_update,
-                         send_email_for_updated_repository)
+from pilot.services import (
+    IssueExportService,
+    IssueStatsService,
+    RepositoryService,
+    SubscriberIndexService,
+    TaskOutcomeService,
+)
+from pilot.tasks import (
+    check_repositories_update,
+    check_users_repositories_update,
+    import_user_repositories,
+    send_email_for_updated_repository,
+    sync_issue_timelines,
+)
+from pilot.tokens import TokenPool, record_rate_limit
+from pilot.transports import HTTP2Transport
+from users.models import User
 from users.services import UserService
 
 
@@ -27,6 +89,25 @@ def user_service() -> UserService:
     return UserService()
 
 
+@pytest.fixture(scope="session")
+def _session_span_exporter() -> InMemorySpanExporter:
+    exporter = InMemorySpanExporter()
+    configure_tracing(exporter)
+    return exporter
+
+
+@pytest.fixture
+def span_exporter(_session_span_exporter) -> InMemorySpanExporter:
+    _session_span_exporter.clear()
+    yield _session_span_exporter
+    _session_span_exporter.clear()
+
+
+def finished_spans(exporter: InMemorySpanExporter) -> dict:
+    trace.get_tracer_provider().force_flush()
+    return {span.name: span for span in exporter.get_finished_spans()}
+
+
 user_data = {
     "username": "test_user",
     "email": "test@gmail.com",
@@ -47,6 +128,26 @@ class CheckSuccessResponse:
     def raise_for_status(self): ...
 
 
+class RepositoryResponse(CheckSuccessResponse):
+    def __init__(self):
+        super().__init__()
+        self.json_body = {"id": 1, "name": "test", "archived": False}
+
+
+class IssueChangesResponse(CheckSuccessResponse):
+    def __init__(self):
+        super().__init__()
+        issue = {
+            "number": 1,
+            "title": "test",
+            "state": "closed",
+            "created_at": "2024-05-17T08:00:00Z",
+            "updated_at": "2024-05-17T09:00:00Z",
+            "closed_at": "2024-05-17T09:00:00Z",
+        }
+        self.json_body = [issue, {**issue, "number": 2, "pull_request": {}}]
+
+
 class CheckFail429Response:
     def __init__(self):
         self.json_body = [{}]
@@ -76,13 +177,21 @@ class CheckFailResponse:
         raise requests.exceptions.HTTPError
 
 
+class CheckNotFoundResponse(CheckFailResponse):
+    def __init__(self):
+        super().__init__()
+        self.status_code = 404
+        self.text = "Not Found"
+
+
 url_mapping = {
-    "https://api.github.com/repos/test/test": CheckSuccessResponse,
+    "https://api.github.com/repos/test/test": RepositoryResponse,
     "https://api.github.com/repos/test/test1": CheckFail429Response,
     "https://api.github.com/repos/test/test2": CheckFailResponse,
-    "https://api.github.com/repos/test/test/issues?since=2024-05-17T08:48:50.932322+00:00&per_page=1&state=open": CheckSuccessResponse,
-    "https://api.github.com/repos/test/test1/issues?since=2024-05-17T08:48:50.932322+00:00&per_page=1&state=open": CheckFail429Response,
-    "https://api.github.com/repos/test/test2/issues?since=2024-05-17T08:48:50.932322+00:00&per_page=1&state=open": CheckFailResponse,
+    "https://api.github.com/repos/test/test4": CheckNotFoundResponse,
+    "https://api.github.com/repos/test/test/issues?since=2024-05-17T08:48:50.932322+00:00&per_page=100&state=all&sort=updated&direction=asc": IssueChangesResponse,
+    "https://api.github.com/repos/test/test1/issues?since=2024-05-17T08:48:50.932322+00:00&per_page=100&state=all&sort=updated&direction=asc": CheckFail429Response,
+    "https://api.github.com/repos/test/test2/issues?since=2024-05-17T08:48:50.932322+00:00&per_page=100&state=all&sort=updated&direction=asc": CheckFailResponse,
     "https://api.github.com/repos/test/test/issues/1/timeline?per_page=100": CheckSuccessResponse,
     "https://api.github.com/repos/test/test1/issues/1/timeline?per_page=100": CheckFail429Response,
     "https://api.github.com/repos/test/test2/issues/1/timeline?per_page=100": CheckFailResponse,
@@ -121,32 +230,150 @@ def test_check_repository_failure(github_client, monkeypatch):
         github_client.check_repository("test2", "test", "test")
 
 
-def test_check_create_or_update_issues_success(github_client, monkeypatch):
+def test_check_repository_caches_not_found(github_client, monkeypatch):
+    calls = []
+
+    def mock_get(*args, **kwargs):
+        calls.append(args[0])
+        return check_repository_success_mock_get(*args, **kwargs)
+
+    monkeypatch.setattr(github_client.session, "get", mock_get)
+    for token in ("test", "other"):
+        REPOSITORIES.delete(
+            github_client._get_token_repository_key("test4", "test", token)
+        )
+
+    assert not github_client.check_repository("test4", "test", "test")
+    assert not github_client.check_repository("test4", "test", "test")
+    assert len(calls) == 1
+    assert not github_client.check_repository("test4", "test", "other")
+    assert len(calls) == 2
+
+
+def test_get_repository_metadata(github_client, monkeypatch):
+    monkeypatch.setattr(github_client.session, "get", check_repository_success_mock_get)
+    REPOSITORIES.delete(github_client._get_repository_key("test", "test"))
+
+    metadata = github_client.get_repository("test", "test", "test")
+
+    assert metadata["exists"] and metadata["github_id"] == 1
+    assert github_client.get_cached_repository("TEST", "test", "other") == metadata
+    assert REPOSITORIES.get(github_client._get_metadata_key(1)) == metadata
+    assert github_client._get_repository_key(
+        "b_c", "a"
+    ) != github_client._get_repository_key("c", "a_b")
+
+
+def test_cache_namespace(settings):
+    settings.PILOT_CACHE_COMPRESS_MIN_SIZE = 64
+    namespace = CacheNamespace(f"test_{uuid.uuid4().hex}")
+    assert namespace.key("a_b", "c") != namespace.key("a", "b_c")
+    assert namespace.key("a:b", "c") != namespace.key("a", "b:c")
+
+    large = {"body": "x" * 1000}
+    namespace.set_many({namespace.key("small"): 1, namespace.key("large"): large}, 60)
+    keys = [namespace.key("small"), namespace.key("large"), namespace.key("missing")]
+    assert namespace.get_many(keys) == {keys[0]: 1, keys[1]: large}
+    assert namespace.add(keys[2], False, 60)
+    assert not namespace.add(keys[2], True, 60)
+    assert namespace.get(keys[2]) is False
+
+    namespace.invalidate()
+    assert namespace.get(namespace.key("small")) is None
+
+
+class PrivateRepositoryResponse(CheckSuccessResponse):
+    def __init__(self):
+        super().__init__()
+        self.json_body = {"id": 7, "name": "private", "private": True}
+
+
+def test_private_repository_is_cached_per_token(github_client, monkeypatch):
+    responses = [PrivateRepositoryResponse(), CheckNotFoundResponse()]
+    monkeypatch.setattr(
+        github_client.session, "get", lambda *args, **kwargs: responses.pop(0)
+    )
+    public = {"exists": True, "github_id": 7, "private": False, "fetched_at": 0}
+    REPOSITORIES.set_many(
+        github_client._get_cache_entries("private", "test", "owner", public), 60
+    )
+    for token in ("owner", "other"):
+        REPOSITORIES.delete(
+            github_client._get_token_repository_key("private", "test", token)
+        )
+
+    metadata = github_client.fetch_repository("private", "test", "owner")
+    assert metadata["private"]
+    assert github_client.get_cached_repository("private", "test", "owner") == metadata
+    assert github_client.get_cached_repository("private", "test", "other") is None
+
+    assert not github_client.check_repository("private", "test", "other")
+    assert github_client.get_cached_repository("private", "test", "owner") == metadata
+    assert responses == []
+
+
+@pytest.mark.django_db
+def test_get_repository_refreshes_stale_entry(
+    github_client, monkeypatch, settings, user_service
+):
+    tokens = []
+
+    def request(self, endpoint, url, token):
+        tokens.append(token)
+        return RepositoryResponse()
+
+    monkeypatch.setattr(GitHubClient, "_request", request)
+    repository = Repository.objects.create(name="test", owner="test")
+    repository.users.add(user_service.create_user(**user_data))
+    stale = {
+        "exists": True,
+        "github_id": 1,
+        "private": False,
+        "fetched_at": time.time() - 7200,
+    }
+    REPOSITORIES.set_many(
+        github_client._get_cache_entries("test", "test", "test", stale), None
+    )
+    REPOSITORY_REFRESHES.delete(REPOSITORY_REFRESHES.key("test", "test"))
+    settings.REPOSITORY_CACHE_REFRESH_AFTER = 3600
+
+    assert github_client.get_repository("test", "test", "request_token") == stale
+
+    refreshed = github_client.get_cached_repository("test", "test", "test")
+    assert refreshed["fetched_at"] > stale["fetched_at"]
+    assert Repository.objects.get(name="test").github_id == 1
+    assert tokens == ["test_token"]
+
+
+def test_get_issue_changes_success(github_client, monkeypatch):
     monkeypatch.setattr(github_client, "_get_since", get_since_mock)
     monkeypatch.setattr(
         github_client.session, "get", check_repository_success_mock_get, raising=True
     )
-    assert github_client.check_create_or_update_issues("test", "test", "test")
+    changes = github_client.get_issue_changes("test", "test", "test")
+    assert [(change["number"], change["state"]) for change in changes] == [
+        (1, "closed")
+    ]
 
 
-def test_check_create_or_update_issues_failure_429(github_client, monkeypatch):
+def test_get_issue_changes_failure_429(github_client, monkeypatch):
     monkeypatch.setattr(github_client, "_get_since", get_since_mock)
     monkeypatch.setattr(
         github_client.session, "get", check_repository_success_mock_get, raising=True
     )
 
     with pytest.raises(TooManyRequestException):
-        github_client.check_create_or_update_issues("test1", "test", "test")
+        github_client.get_issue_changes("test1", "test", "test")
 
 
-def test_check_create_or_update_issues_failure(github_client, monkeypatch):
+def test_get_issue_changes_failure(github_client, monkeypatch):
     monkeypatch.setattr(github_client, "_get_since", get_since_mock)
     monkeypatch.setattr(
         github_client.session, "get", check_repository_success_mock_get, raising=True
     )
 
     with pytest.raises(requests.exceptions.HTTPError):
-        github_client.check_create_or_update_issues("test2", "test", "test")
+        github_client.get_issue_changes("test2", "test", "test")
 
 
 def test_get_issue_timeline_success(github_client, monkeypatch):
@@ -174,6 +401,748 @@ def test_get_issue_timeline_failure(github_client, monkeypatch):
         github_client.get_issue_timeline("test2", "test", "1", "test")
 
 
+def test_get_issue_timeline_fetches_pages_concurrently(github_client, monkeypatch):
+    url = "https://api.github.com/repos/test/test/issues/1/timeline?per_page=100"
+    urls = []
+
+    def mock_get(*args, **kwargs):
+        urls.append(args[0])
+        page = int(dict(parse_qsl(urlsplit(args[0]).query)).get("page", 1))
+        time.sleep(0.05 * (5 - page))
+        response = CheckSuccessResponse()
+        response.json_body = [{"id": page}]
+        if page == 1:
+            response.headers = {
+                "Link": f'<{url}&page=2>; rel="next", <{url}&page=4>; rel="last"'
+            }
+        return response
+
+    monkeypatch.setattr(github_client.session, "get", mock_get)
+
+    timeline = github_client.get_issue_timeline("test", "test", 1, "test")
+    assert [event["id"] for event in timeline] == [1, 2, 3, 4]
+    assert urls[0] == url and sorted(urls[1:]) == [
+        f"{url}&page={page}" for page in (2, 3, 4)
+    ]
+
+
+def test_get_issue_timeline_skips_stored_pages(github_client, monkeypatch):
+    urls = []
+
+    def mock_get(*args, **kwargs):
+        urls.append(args[0])
+        response = CheckSuccessResponse()
+        response.json_body = [{"id": index} for index in range(50)]
+        return response
+
+    monkeypatch.setattr(github_client.session, "get", mock_get)
+
+    timeline = github_client.get_issue_timeline("test", "test", 1, "test", 230)
+    assert urls == [
+        "https://api.github.com/repos/test/test/issues/1/timeline?per_page=100&page=3"
+    ]
+    assert [event["id"] for event in timeline] == list(range(30, 50))
+
+
+@pytest.mark.django_db
+def test_issue_timeline_is_stored_incrementally(
+    repository_service, monkeypatch, settings
+):
+    settings.TIMELINE_SYNC_OVERLAP = 1
+    repository = Repository.objects.create(name="timeline", owner="test")
+    client = repository_service.clients[RepositoryTypes.GITHUB.value]
+    timeline = [
+        {"id": 1, "event": "labeled", "created_at": "2024-05-17T08:00:00Z"},
+        {
+            "event": "committed",
+            "sha": "abc",
+            "author": {"date": "2024-05-17T09:00:00Z"},
+        },
+        {"id": 3, "event": "commented", "created_at": "2024-05-17T10:00:00Z"},
+    ]
+    starts = []
+
+    def get_issue_timeline(repo_name, owner, issue_id, token, start=0):
+        starts.append(start)
+        return timeline[start:]
+
+    monkeypatch.setattr(client, "get_issue_timeline", get_issue_timeline)
+
+    del timeline[2:]
+    assert repository_service.sync_issue_timeline(repository, 7, "test") == 2
+    timeline.append(
+        {"id": 3, "event": "commented", "created_at": "2024-05-17T10:00:00Z"}
+    )
+    assert repository_service.sync_issue_timeline(repository, 7, "test") == 1
+    assert starts == [0, 1]
+
+    commit = TimelineEvent.objects.get(repository=repository, position=1)
+    assert commit.event_id is None and commit.created_at.hour == 9
+
+    user = UserService().create_user(**user_data)
+    assert repository_service.get_issue_timeline("timeline", user, 7) is None
+    repository.users.add(user)
+    events, cursor = repository_service.get_issue_timeline("timeline", user, 7, limit=2)
+    assert [event["event"] for event in events] == ["labeled", "committed"]
+    events, cursor = repository_service.get_issue_timeline(
+        "timeline", user, 7, after=cursor, limit=2
+    )
+    assert events == [timeline[2]] and cursor is None
+    assert starts == [0, 1]
+
+    # A deleted event moves the later ones back past the stored positions.
+    del timeline[0]
+    timeline.append({"id": 4, "event": "closed", "created_at": "2024-05-17T11:00:00Z"})
+    assert repository_service.sync_issue_timeline(repository, 7, "test") == 1
+    assert starts[-1] == 2
+    assert list(
+        TimelineEvent.objects.filter(repository=repository)
+        .order_by("position")
+        .values_list("position", "event_id")
+    ) == [(0, 1), (1, None), (2, 3), (3, 4)]
+
+
+def make_issue(number: int, title: str, body: str = "") -> dict:
+    return {
+        "number": number,
+        "title": title,
+        "body": body,
+        "state": "open",
+        "labels": [],
+        "created_at": "2024-05-17T08:00:00Z",
+        "updated_at": "2024-05-17T08:00:00Z",
+        "closed_at": None,
+    }
+
+
+@pytest.mark.django_db
+def test_search_issues(repository_service):
+    user = UserService().create_user(**user_data)
+    subscribed = Repository.objects.create(name="subscribed", owner="test")
+    subscribed.users.add(user)
+    other = Repository.objects.create(name="other", owner="test")
+    repository_service.store_issues(
+        subscribed,
+        [
+            make_issue(1, "Crash on startup", "The worker crashes when polling."),
+            make_issue(2, "Docs typo", "Polling is misspelled."),
+            make_issue(3, "Unrelated"),
+        ],
+    )
+    repository_service.store_issues(other, [make_issue(1, "Polling crash")])
+
+    results = repository_service.search_issues(user, "polling")
+    assert [issue["number"] for issue in results] == [1, 2]
+    assert results[0]["repository_name"] == "subscribed"
+
+    repository_service.store_issues(subscribed, [make_issue(2, "Polling docs typo")])
+    results = repository_service.search_issues(user, "polling", page_size=1)
+    assert [issue["number"] for issue in results] == [2]
+    assert repository_service.search_issues(user, "polling", page=3) == []
+
+
+@pytest.mark.django_db
+def test_first_poll_backfills_issues(repository_service, monkeypatch):
+    client = repository_service.clients[RepositoryTypes.GITHUB.value]
+    user = UserService().create_user(**user_data)
+    repository = Repository.objects.create(name="backfill", owner="test")
+    repository.users.add(user)
+    now = timezone.now().strftime("%Y-%m-%dT%H:%M:%SZ")
+    older = {
+        **make_issue(3, "Older polling crash"),
+        "updated_at": "2024-05-16T08:00:00Z",
+    }
+    pages = [
+        [older, make_issue(1, "Old polling crash")],
+        [{**make_issue(2, "New polling crash"), "updated_at": now}],
+    ]
+    repository_service.store_issues(repository, [make_issue(1, "Old polling crash")])
+    stats = IssueStatsService()
+    assert stats.get_repository_stats("backfill", user, 7)["open_issues"] is None
+    cursors = []
+
+    def get_issue_changes(repo_name, owner, token, since=None):
+        cursors.append(since)
+        return []
+
+    monkeypatch.setattr(
+        client, "get_repository", lambda *args: get_repository_mock("test")
+    )
+    monkeypatch.setattr(client, "get_issues", lambda *args: iter(pages))
+    monkeypatch.setattr(client, "get_issue_changes", get_issue_changes)
+
+    changes = repository_service.collect_issue_changes("backfill", "test", "token")
+    assert [(change["number"], change["action"]) for change in changes] == [
+        (2, "opened")
+    ]
+    results = repository_service.search_issues(user, "polling")
+    assert sorted(issue["number"] for issue in results) == [1, 2, 3]
+    assert stats.get_repository_stats("backfill", user, 7)["open_issues"] == 3
+
+    assert repository_service.collect_issue_changes("backfill", "test", "t") == []
+    assert len(cursors) == 1
+
+
+def test_get_issues(github_client, monkeypatch):
+    urls = []
+
+    def mock_get(*args, **kwargs):
+        urls.append(args[0])
+        return IssueChangesResponse()
+
+    monkeypatch.setattr(github_client.session, "get", mock_get)
+
+    pages = list(github_client.get_issues("test", "test", "test"))
+    assert [[issue["number"] for issue in page] for page in pages] == [[1]]
+    assert "since" not in urls[0] and "state=all" in urls[0]
+
+
+@pytest.mark.django_db
+def test_issue_stats_are_updated_incrementally(repository_service):
+    user = UserService().create_user(**user_data)
+    repository = Repository.objects.create(
+        name="stats", owner="test", has_issue_history=True
+    )
+    repository.users.add(user)
+    Repository.objects.create(name="unsubscribed", owner="test")
+    today = timezone.now().replace(microsecond=0)
+    opened_at = (today - timedelta(days=1)).isoformat()
+    first, second = make_issue(1, "First"), make_issue(2, "Second")
+    first["created_at"] = second["created_at"] = opened_at
+    repository_service.store_issues(repository, [first, second])
+
+    first.update(state="closed", closed_at=today.isoformat())
+    repository_service.store_issues(repository, [first])
+    repository_service.store_issues(repository, [first])
+    IssueStatsService().record_timeline_events(
+        repository,
+        [
+            {"event": "labeled", "label": {"name": "bug"}, "created_at": opened_at},
+            {"event": "labeled", "label": {"name": "bug"}, "created_at": opened_at},
+            {"event": "labeled", "label": {"name": "docs"}, "created_at": opened_at},
+            {"event": "labeled", "created_at": opened_at},
+            {"event": "labeled", "label": {}, "created_at": opened_at},
+        ],
+    )
+
+    stats = IssueStatsService().get_repository_stats("stats", user, 7)
+    assert stats["open_issues"] == 1
+    assert [(day["opened"], day["closed"]) for day in stats["days"]] == [
+        (2, 0),
+        (0, 1),
+    ]
+    assert 0.9 * 86400 < stats["median_time_to_close"] < 1.1 * 86400
+    assert stats["top_labels"] == [
+        {"label": "bug", "count": 2},
+        {"label": "docs", "count": 1},
+    ]
+    assert IssueStatsService().get_repository_stats("missing", user, 7) is None
+    assert IssueStatsService().get_repository_stats("unsubscribed", user, 7) is None
+
+
+@pytest.mark.django_db
+def test_rebuild_issue_stats(repository_service):
+    repository = Repository.objects.create(name="rebuild", owner="test")
+    issues = [make_issue(number, f"Issue {number}") for number in range(1, 6)]
+    issues[0].update(state="closed", closed_at="2024-05-18T08:00:00Z")
+    repository_service.store_issues(repository, issues)
+    IssueDailyStat.objects.filter(repository=repository).update(opened=100)
+    IssueDailyStat.objects.create(
+        repository=repository, date="2024-05-01", opened=3, open_issues=7
+    )
+    IssueDailyStat.objects.create(repository=repository, date="2024-05-02", closed=2)
+
+    IssueStatsService().rebuild(repository, batch_size=2)
+
+    stats = {row.date.isoformat(): row for row in repository.daily_stats.all()}
+    assert stats["2024-05-17"].opened == 5
+    assert stats["2024-05-18"].closed == 1
+    assert stats["2024-05-01"].open_issues == 7
+    assert stats["2024-05-01"].opened == 0
+    assert "2024-05-02" not in stats
+
+
+@pytest.mark.django_db
+def test_export_issues(repository_service):
+    repository = Repository.objects.create(name="export", owner="test")
+    repository_service.store_issues(
+        repository, [make_issue(2, "Second"), make_issue(1, "First")]
+    )
+    TimelineEvent.objects.bulk_create(
+        [
+            repository_service._build_timeline_event(repository, number, position, {})
+            for number, position in ((1, 0), (1, 1), (2, 0))
+        ]
+    )
+    service = IssueExportService()
+
+    records = [json.loads(line) for line in service.export("export")]
+    assert [record["cursor"] for record in records] == [
+        "1:-1",
+        "1:0",
+        "1:1",
+        "2:-1",
+        "2:0",
+    ]
+    assert records[0]["title"] == "First"
+
+    resumed = [json.loads(line) for line in service.export("export", after="1:0")]
+    assert [record["cursor"] for record in resumed] == ["1:1", "2:-1", "2:0"]
+
+    lines = list(service.export("export", "csv", after="2:-1"))
+    assert lines[0].startswith("type,cursor,issue_number")
+    assert lines[1].startswith("event,2:0,2,0")
+    assert service.export("missing") is None
+
+    user = UserService().create_user(**user_data)
+    assert service.export("export", user=user) is None
+    repository.users.add(user)
+    assert len(list(service.export("export", user=user))) == 5
+
+
+class UserRepositoriesResponse(CheckSuccessResponse):
+    def __init__(self, names, next_url=None):
+        super().__init__()
+        self.json_body = [
+            {"id": index, "name": name, "owner": {"login": "test"}}
+            for index, name in enumerate(names, start=100)
+        ]
+        if next_url:
+            self.headers = {"Link": f'<{next_url}>; rel="next"'}
+
+
+user_repositories_mapping = {
+    "https://api.github.com/user/subscriptions?per_page=100": UserRepositoriesResponse(
+        ["watched1", "watched2"], "https://api.github.com/user/subscriptions?page=2"
+    ),
+    "https://api.github.com/user/subscriptions?page=2": UserRepositoriesResponse(
+        ["watched3"]
+    ),
+    "https://api.github.com/user/starred?per_page=100": UserRepositoriesResponse(
+        ["watched1", "starred1"]
+    ),
+}
+
+
+def user_repositories_mock_get(*args, **kwargs):
+    return user_repositories_mapping[args[0]]
+
+
+def test_get_user_repositories(github_client, monkeypatch):
+    monkeypatch.setattr(github_client.session, "get", user_repositories_mock_get)
+
+    pages = list(github_client.get_user_repositories("test"))
+
+    assert [[repository["name"] for repository in page] for page in pages] == [
+        ["watched1", "watched2"],
+        ["watched3"],
+        ["watched1", "starred1"],
+    ]
+    assert pages[0][0] == {
+        "name": "watched1",
+        "owner": "test",
+        "github_id": 100,
+        "is_private": False,
+    }
+    cached = github_client.get_cached_repository("starred1", "test", "test")
+    assert cached["github_id"] == 101
+
+
+class GitHubStubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = json.dumps(
+            {
+                "authorization": self.headers["Authorization"],
+                "connection": self.client_address[1],
+            }
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args): ...
+
+
+@pytest.fixture
+def github_stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), GitHubStubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_client_concurrent_requests(github_stub, settings):
+    settings.GITHUB_HTTP_POOL_SIZE = 20
+    client = GitHubClient()
+    url = f"{github_stub}/repos/test/test"
+
+    def request(index):
+        token = f"token{index % 50}"
+        return token, client._request("repository", url, token).json()
+
+    with ThreadPoolExecutor(20) as executor:
+        results = list(executor.map(request, range(500)))
+
+    assert all(body["authorization"] == f"Bearer {token}" for token, body in results)
+    assert len({body["connection"] for _, body in results}) <= 20
+    assert "Authorization" not in GitHubClient.headers
+
+
+def test_http2_transport():
+    retry = Retry(total=3, status_forcelist=[500, 502, 503, 504], backoff_factor=1)
+    client = GitHubClient()
+    client.session = HTTP2Transport(100, retry, http1=False)
+
+    with HTTP2Stub() as stub:
+        url = f"{stub.url}/repos/test/test"
+
+        def request(index):
+            token = f"token{index % 10}"
+            return token, client._request("repository", url, token)
+
+        with ThreadPoolExecutor(50) as executor:
+            results = list(executor.map(request, range(200)))
+        client.session.close()
+
+    assert all(
+        response.json()["authorization"] == f"Bearer {token}"
+        for token, response in results
+    )
+    assert isinstance(results[0][1], requests.Response)
+    assert stub.connections == len(client.session.clients) == 4
+
+
+def test_circuit_breaker(settings):
+    settings.GITHUB_CIRCUIT_MIN_REQUESTS = 4
+    settings.GITHUB_CIRCUIT_FAILURE_RATE = 0.5
+    breaker = CircuitBreaker(f"test_{uuid.uuid4().hex}")
+
+    for success in (True, True, False):
+        breaker.record(success)
+    assert breaker.allow()
+    breaker.record(False)
+    assert not breaker.allow()
+
+    cache.set(breaker.state_key, time.time() - settings.GITHUB_CIRCUIT_OPEN_SECONDS)
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record(True)
+    assert breaker.allow()
+
+
+def test_circuit_breaker_ignores_late_outcomes(settings):
+    breaker = CircuitBreaker(f"test_{uuid.uuid4().hex}")
+
+    # A request sent before the circuit opened succeeds after it did.
+    assert breaker.allow()
+    breaker.open()
+    breaker.record(True)
+    assert not breaker.allow()
+
+    cache.set(breaker.state_key, time.time() - settings.GITHUB_CIRCUIT_OPEN_SECONDS)
+    assert breaker.allow()
+    contextvars.Context().run(breaker.record, True)
+    assert cache.get(breaker.state_key) is not None
+    breaker.record(False)
+    assert not breaker.allow()
+
+    cache.set(breaker.state_key, time.time() - settings.GITHUB_CIRCUIT_OPEN_SECONDS)
+    cache.delete(breaker.probe_key)
+    assert breaker.allow()
+    breaker.record(True)
+    assert cache.get(breaker.state_key) is None
+
+
+def test_adaptive_limiter(settings):
+    settings.GITHUB_LATENCY_TARGET = 0.5
+    settings.GITHUB_MIN_CONCURRENCY = 1
+    limiter = AdaptiveLimiter("test", 8)
+
+    limiter.observe(1.0, True)
+    limiter.observe(0.1, False)
+    assert limiter.limit == 4
+    for _ in range(4):
+        limiter.observe(0.1, True)
+    assert 4.9 < limiter.limit < 5
+
+    limiter.limit = 1
+    entered = threading.Event()
+
+    def enter():
+        with limiter:
+            entered.set()
+
+    with limiter:
+        thread = threading.Thread(target=enter)
+        thread.start()
+        assert not entered.wait(0.1)
+    assert entered.wait(1)
+    thread.join()
+
+
+def test_client_fails_fast_when_circuit_opens(github_client, monkeypatch, settings):
+    settings.GITHUB_CIRCUIT_MIN_REQUESTS = 2
+    github_client.breaker = CircuitBreaker(f"test_{uuid.uuid4().hex}")
+    calls = []
+
+    def mock_get(*args, **kwargs):
+        calls.append(args[0])
+        return CheckFailResponse()
+
+    monkeypatch.setattr(github_client.session, "get", mock_get)
+
+    for _ in range(2):
+        with pytest.raises(requests.exceptions.HTTPError):
+            github_client.check_repository("test2", "test", "test")
+    with pytest.raises(CircuitOpenException):
+        github_client.check_repository("test2", "test", "test")
+    assert len(calls) == 2
+
+
+class SecondaryRateLimitResponse(CheckFailResponse):
+    def __init__(self):
+        super().__init__()
+        self.status_code = 403
+        self.text = "You have exceeded a secondary rate limit."
+        self.headers = {"X-RateLimit-Remaining": "4000", "Retry-After": "120"}
+
+
+def test_token_pacer(settings):
+    settings.GITHUB_TOKEN_RATE = 2
+    settings.GITHUB_TOKEN_CONCURRENCY = 1
+    pacer = TokenPacer(f"test_{uuid.uuid4().hex}")
+
+    assert pacer.get_backoff("pacer_a") == 0
+    pacer.back_off("pacer_a", 60)
+    assert 59 < pacer.get_backoff("pacer_a") <= 60
+    assert pacer.get_backoff("pacer_b") == 0
+
+    started = time.monotonic()
+    for _ in range(3):
+        with pacer.pace("pacer_b"):
+            pass
+    assert time.monotonic() - started >= 0.4
+
+    entered = threading.Event()
+
+    def enter():
+        with pacer.pace("pacer_b"):
+            entered.set()
+
+    with pacer.pace("pacer_b"):
+        thread = threading.Thread(target=enter)
+        thread.start()
+        assert not entered.wait(0.1)
+    assert entered.wait(2)
+    thread.join()
+
+
+def test_client_backs_off_token_on_secondary_rate_limit(github_client, monkeypatch):
+    github_client.pacer = TokenPacer(f"test_{uuid.uuid4().hex}")
+    REPOSITORIES.delete(github_client._get_repository_key("secondary", "test"))
+    calls = []
+
+    def mock_get(*args, **kwargs):
+        calls.append(args[0])
+        return SecondaryRateLimitResponse()
+
+    monkeypatch.setattr(github_client.session, "get", mock_get)
+
+    with pytest.raises(TooManyRequestException) as e:
+        github_client.check_repository("secondary", "test", "secondary_token")
+    assert e.value.retry_after == 120
+    with pytest.raises(TooManyRequestException) as e:
+        github_client.check_repository("secondary", "test", "secondary_token")
+    assert 119 < e.value.retry_after <= 120
+    assert len(calls) == 1
+
+
+class SecondaryRateLimitStubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    requests = 0
+
+    def do_GET(self):
+        type(self).requests += 1
+        body = b'{"message": "You have exceeded a secondary rate limit."}'
+        self.send_response(429)
+        self.send_header("Retry-After", "30")
+        self.send_header("X-RateLimit-Remaining", "4000")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args): ...
+
+
+def test_client_backs_off_token_on_secondary_rate_limit_from_server(settings):
+    settings.GITHUB_CIRCUIT_MIN_REQUESTS = 1
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SecondaryRateLimitStubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = GitHubClient()
+    client.breaker = CircuitBreaker(f"test_{uuid.uuid4().hex}")
+    client.pacer = TokenPacer(f"test_{uuid.uuid4().hex}")
+    url = f"http://127.0.0.1:{server.server_port}/repos/test/test"
+
+    try:
+        started = time.monotonic()
+        response = client._request("repository", url, "stub_token")
+        with pytest.raises(TooManyRequestException) as e:
+            client._check_response(response)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert time.monotonic() - started < 5
+    assert SecondaryRateLimitStubHandler.requests == 1
+    assert e.value.retry_after == 30
+    assert 29 < client.pacer.get_backoff("stub_token") <= 30
+    assert client.breaker.allow()
+    assert cache.get(client.breaker._get_window_keys()[1]) is None
+
+
+def test_check_repository_records_metrics(github_client, monkeypatch):
+    monkeypatch.setattr(github_client.session, "get", check_repository_success_mock_get)
+    REPOSITORIES.delete(github_client._get_repository_key("test", "test"))
+    latency_labels = {"endpoint": "repository", "status": "200"}
+    miss_labels = {"family": "repository", "result": "miss"}
+    hit_labels = {"family": "repository", "result": "hit"}
+
+    def sample(name, labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    requests_before = sample(
+        "pilot_github_request_duration_seconds_count", latency_labels
+    )
+    misses_before = sample("pilot_cache_requests_total", miss_labels)
+    hits_before = sample("pilot_cache_requests_total", hit_labels)
+
+    github_client.check_repository("test", "test", "test")
+    github_client.check_repository("test", "test", "test")
+
+    assert (
+        sample("pilot_github_request_duration_seconds_count", latency_labels)
+        == requests_before + 1
+    )
+    # A miss on the name and the token entry, then a hit on the name and the ID.
+    assert sample("pilot_cache_requests_total", miss_labels) == misses_before + 2
+    assert sample("pilot_cache_requests_total", hit_labels) == hits_before + 2
+
+
+@pytest.mark.django_db
+def test_github_call_is_traced_under_service_span(
+    repository_service, span_exporter, monkeypatch
+):
+    client = repository_service.clients[RepositoryTypes.GITHUB.value]
+    monkeypatch.setattr(client, "_get_since", get_since_mock)
+    monkeypatch.setattr(client.session, "get", check_repository_success_mock_get)
+    REPOSITORIES.delete(client._get_repository_key("test", "test"))
+
+    repository_service.collect_issue_changes("test", "test", "test")
+
+    spans = finished_spans(span_exporter)
+    service_span = spans["RepositoryService.collect_issue_changes"]
+    github_span = spans["github.issues"]
+    assert github_span.parent.span_id == service_span.context.span_id
+    assert github_span.attributes["http.status_code"] == 200
+    assert spans["cache.get_many"].attributes["cache.family"] == "repository"
+    assert spans["cache.set_many"].parent.span_id == service_span.context.span_id
+
+
+def test_trace_context_propagates_through_task_headers(span_exporter):
+    headers = {"id": "task-id"}
+    start_publish_span(sender="pilot.tasks.check_repositories_update", headers=headers)
+    assert "traceparent" in headers
+
+    task = type("Task", (), {"name": "pilot.tasks.check_repositories_update"})()
+    task.request = Context(headers)
+    start_task_span(task_id="task-id", task=task)
+
+    run_span = trace.get_current_span()
+    assert f"{run_span.get_span_context().trace_id:032x}" in headers["traceparent"]
+    end_task_span(task_id="task-id", state="SUCCESS")
+
+
+def test_file_span_exporter(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    provider = TracerProvider()
+    exporter = FileSpanExporter(str(path))
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+
+    with provider.get_tracer(__name__).start_as_current_span("test-span"):
+        pass
+    provider.shutdown()
+
+    lines = path.read_text().splitlines()
+    assert json.loads(lines[0])["name"] == "test-span"
+    assert exporter.out.closed
+
+
+def test_log_response_keeps_whitelisted_headers(github_client, caplog):
+    response = CheckSuccessResponse()
+    response.headers = {
+        "X-RateLimit-Remaining": "4999",
+        "X-GitHub-Request-Id": "C0DE:1F2E",
+        "Set-Cookie": "secret",
+    }
+    caplog.set_level(logging.INFO, logger="pilot.clients")
+
+    github_client._log_response("repository", "https://api.github.com", response)
+
+    record = caplog.records[-1]
+    assert record.levelno == logging.INFO
+    assert record.headers == {
+        "X-RateLimit-Remaining": "4999",
+        "X-GitHub-Request-Id": "C0DE:1F2E",
+    }
+
+
+def test_log_response_logs_errors_as_warnings(github_client, caplog):
+    caplog.set_level(logging.WARNING, logger="pilot.clients")
+    github_client._log_response(
+        "repository", "https://api.github.com", CheckFail429Response()
+    )
+
+    record = caplog.records[-1]
+    assert record.levelno == logging.WARNING
+    assert record.response_text == "Rate limit exceeded"
+
+
+def test_sampling_filter():
+    sampling = SamplingFilter({"pilot": 0.0, "pilot.clients": 1.0})
+
+    def record(name, level):
+        return logging.LogRecord(name, level, "", 0, "message", (), None)
+
+    assert not sampling.filter(record("pilot.tasks", logging.INFO))
+    assert sampling.filter(record("pilot.tasks", logging.ERROR))
+    assert sampling.filter(record("pilot.clients", logging.INFO))
+    assert sampling.filter(record("celery", logging.INFO))
+
+
+def test_json_formatter():
+    record = logging.LogRecord(
+        "pilot.clients", logging.INFO, "", 0, "GitHub request %s", ("url",), None
+    )
+    record.status_code = 200
+    record.sampled = True
+
+    payload = json.loads(JsonFormatter().format(record))
+    assert payload["message"] == "GitHub request url"
+    assert payload["status_code"] == 200
+    assert "sampled" not in payload
+
+
+def test_metrics_view(api_client):
+    response = api_client.get("/metrics/")
+    assert response.status_code == 200
+    assert b"pilot_github_request_duration_seconds" in response.content
+
+
 check_repository_map = {
     "test": True,
     "test1": False,
@@ -181,7 +1150,16 @@ check_repository_map = {
 
 
 def get_repository_mock(*args, **kwargs):
-    return check_repository_map.get(args[0])
+    if not check_repository_map.get(args[0]):
+        return {"exists": False, "fetched_at": time.time()}
+    return {
+        "exists": True,
+        "github_id": sum(map(ord, args[0])),
+        "archived": False,
+        "disabled": False,
+        "private": False,
+        "fetched_at": time.time(),
+    }
 
 
 @pytest.mark.django_db
@@ -194,7 +1172,7 @@ def test_get_or_create_repository_success(repository_service, monkeypatch):
     }
     monkeypatch.setattr(
         repository_service.clients[RepositoryTypes.GITHUB.value],
-        "check_repository",
+        "get_repository",
         get_repository_mock,
     )
 
@@ -212,7 +1190,7 @@ def test_get_or_create_repository_failure(repository_service, monkeypatch):
     }
     monkeypatch.setattr(
         repository_service.clients[RepositoryTypes.GITHUB.value],
-        "check_repository",
+        "get_repository",
         get_repository_mock,
     )
     repository = repository_service.get_or_create_repository(data)
@@ -228,7 +1206,7 @@ def test_subscribe_repository_success(repository_service, user_service, monkeypa
     }
     monkeypatch.setattr(
         repository_service.clients[RepositoryTypes.GITHUB.value],
-        "check_repository",
+        "get_repository",
         get_repository_mock,
     )
 
@@ -250,7 +1228,7 @@ def test_subscribe_repository_failure(repository_service, user_service, monkeypa
     }
     monkeypatch.setattr(
         repository_service.clients[RepositoryTypes.GITHUB.value],
-        "check_repository",
+        "get_repository",
         get_repository_mock,
     )
 
@@ -268,7 +1246,7 @@ def test_subscribe_repository_failure(repository_service, user_service, monkeypa
 def test_unsubscribe_repository_success(repository_service, user_service, monkeypatch):
     monkeypatch.setattr(
         repository_service.clients[RepositoryTypes.GITHUB.value],
-        "check_repository",
+        "get_repository",
         get_repository_mock,
     )
     user = user_service.create_user(**user_data)
@@ -287,7 +1265,7 @@ def test_unsubscribe_repository_success(repository_service, user_service, monkey
 def test_unsubscribe_repository_failure(repository_service, user_service, monkeypatch):
     monkeypatch.setattr(
         repository_service.clients[RepositoryTypes.GITHUB.value],
-        "check_repository",
+        "get_repository",
         get_repository_mock,
     )
     user = user_service.create_user(**user_data)
@@ -302,36 +1280,47 @@ def test_unsubscribe_repository_failure(repository_service, user_service, monkey
     assert not repository_service.unsubscribe_repository(user, "test1")
 
 
-def test_check_or_update_repository_success(repository_service, monkeypatch):
-    data = {
-        "repo_name": "test",
-        "repository_type": RepositoryTypes.GITHUB.value,
-        "owner": "test",
-        "token": "test",
-    }
-    monkeypatch.setattr(
-        repository_service.clients[RepositoryTypes.GITHUB.value],
-        "check_create_or_update_issues",
-        lambda *args, **kwargs: True,
+@pytest.mark.django_db
+def test_collect_issue_changes(repository_service, monkeypatch):
+    client = repository_service.clients[RepositoryTypes.GITHUB.value]
+    repository = Repository.objects.create(
+        name="changes", owner="test", has_issue_history=True
     )
+    repository_service.store_issues(
+        repository,
+        [make_issue(1, "unchanged"), make_issue(2, "closing"), make_issue(3, "edit")],
+    )
+    later = {"updated_at": "2024-05-17T09:00:00Z"}
+    changes = [
+        make_issue(1, "unchanged"),
+        {**make_issue(2, "closing"), **later, "state": "closed"},
+        {**make_issue(3, "edited"), **later},
+        {**make_issue(4, "new"), **later},
+    ]
+    cursors = []
+
+    def get_issue_changes(repo_name, owner, token, since=None):
+        cursors.append(since)
+        return changes
 
-    assert repository_service.check_create_or_update_issues(**data)
-
-
-def test_check_or_update_repository_failure(repository_service, monkeypatch):
-    data = {
-        "repo_name": "test1",
-        "repository_type": RepositoryTypes.GITHUB.value,
-        "owner": "test",
-        "token": "test",
-    }
     monkeypatch.setattr(
-        repository_service.clients[RepositoryTypes.GITHUB.value],
-        "check_create_or_update_issues",
-        lambda *args, **kwargs: False,
+        client,
+        "get_repository",
+        lambda *args: {"exists": True, "archived": False, "disabled": False},
     )
+    monkeypatch.setattr(client, "get_issue_changes", get_issue_changes)
+
+    collected = repository_service.collect_issue_changes("changes", "test", "test")
+    assert [(change["number"], change["action"]) for change in collected] == [
+        (2, "closed"),
+        (3, "updated"),
+        (4, "opened"),
+    ]
+    assert cursors[0].hour == 8
+    assert Issue.objects.get(repository=repository, number=3).title == "edited"
 
-    assert not repository_service.check_create_or_update_issues(**data)
+    assert repository_service.collect_issue_changes("changes", "test", "test") == []
+    assert cursors[1].hour == 9
 
 
 @pytest.mark.django_db
@@ -340,7 +1329,7 @@ def test_repository_view_post_success(
 ):
     monkeypatch.setattr(
         repository_service.clients[RepositoryTypes.GITHUB.value],
-        "check_repository",
+        "get_repository",
         get_repository_mock,
     )
 
@@ -361,7 +1350,7 @@ def test_repository_view_post_failure(
 ):
     monkeypatch.setattr(
         repository_service.clients[RepositoryTypes.GITHUB.value],
-        "check_repository",
+        "get_repository",
         get_repository_mock,
     )
 
@@ -382,7 +1371,7 @@ def test_repository_view_delete_success(
 ):
     monkeypatch.setattr(
         repository_service.clients[RepositoryTypes.GITHUB.value],
-        "check_repository",
+        "get_repository",
         get_repository_mock,
     )
 
@@ -408,6 +1397,255 @@ def test_repository_view_delete_failure(api_client, user_service):
     assert response.status_code == 404
 
 
+@pytest.mark.django_db
+def test_bulk_subscribe_repositories(repository_service, user_service, monkeypatch):
+    monkeypatch.setattr(
+        repository_service.clients[RepositoryTypes.GITHUB.value],
+        "get_repository",
+        get_repository_mock,
+    )
+    Repository.objects.create(name="stored", owner="test", is_private=False)
+    Repository.objects.create(name="hidden", owner="test", is_private=True)
+    user = user_service.create_user(**user_data)
+    items = [
+        {"name": name, "owner": "test", "repository_type": RepositoryTypes.GITHUB}
+        for name in ("stored", "hidden", "test", "test1", "test")
+    ]
+
+    results = repository_service.bulk_subscribe_repositories(user, items)
+
+    assert [(result["name"], result["status"]) for result in results] == [
+        ("stored", "subscribed"),
+        ("hidden", "not_found"),
+        ("test", "subscribed"),
+        ("test1", "not_found"),
+    ]
+    assert set(user.repositories.values_list("name", flat=True)) == {"stored", "test"}
+
+
+@pytest.mark.django_db
+def test_bulk_subscribe_links_with_resolved_metadata(
+    repository_service, user_service, monkeypatch
+):
+    client = repository_service.clients[RepositoryTypes.GITHUB.value]
+    cache_reads = []
+
+    def get_cached_repositories(repositories, token):
+        cache_reads.append(repositories)
+        return {}
+
+    monkeypatch.setattr(client, "get_repository", get_repository_mock)
+    monkeypatch.setattr(client, "get_cached_repositories", get_cached_repositories)
+    monkeypatch.setitem(check_repository_map, "fresh", True)
+    Repository.objects.create(
+        name="test", owner="test", is_private=False, is_active=False
+    )
+    user = user_service.create_user(**user_data)
+    items = [
+        {"name": name, "owner": "test", "repository_type": RepositoryTypes.GITHUB}
+        for name in ("test", "fresh")
+    ]
+
+    results = repository_service.bulk_subscribe_repositories(user, items)
+
+    assert [result["status"] for result in results] == ["subscribed", "subscribed"]
+    assert cache_reads == [[("test", "test"), ("fresh", "test")]]
+    assert Repository.objects.get(name="test").is_active
+    fresh = Repository.objects.get(name="fresh")
+    assert fresh.github_id == get_repository_mock("fresh")["github_id"]
+    assert fresh.is_private is False
+
+
+@pytest.mark.django_db
+def test_subscribe_private_repository_requires_access(
+    repository_service, user_service, monkeypatch, django_capture_on_commit_callbacks
+):
+    client = repository_service.clients[RepositoryTypes.GITHUB.value]
+    monkeypatch.setattr(client, "get_repository", get_repository_mock)
+    repository = Repository.objects.create(name="test1", owner="test", is_private=True)
+    user = user_service.create_user(**user_data)
+    data = {"name": "test1", "owner": "test", "repository_type": 1}
+
+    assert not repository_service.subscribe_repository(user, dict(data))
+    assert not user.repositories.exists()
+
+    Subscription.objects.create(repository=repository, user=user, has_access=False)
+    SubscriberIndexService().rebuild(100)
+    assert SubscriberIndexService().get_many([repository.id]) == {repository.id: []}
+
+    monkeypatch.setitem(check_repository_map, "test1", True)
+    with django_capture_on_commit_callbacks(execute=True):
+        assert repository_service.subscribe_repository(user, dict(data))
+    assert Subscription.objects.get(repository=repository, user=user).has_access
+    assert SubscriberIndexService().get_many([repository.id]) == {
+        repository.id: [user.id]
+    }
+
+
+@pytest.mark.django_db
+def test_bulk_repository_view(
+    api_client, user_service, monkeypatch, repository_service
+):
+    monkeypatch.setattr(
+        repository_service.clients[RepositoryTypes.GITHUB.value],
+        "get_repository",
+        get_repository_mock,
+    )
+    user = user_service.create_user(**user_data)
+    api_client.force_authenticate(user=user)
+    data = {
+        "repositories": [
+            {"name": "test", "owner": "test", "repository_type": 1},
+            {"name": "test1", "owner": "test", "repository_type": 1},
+        ]
+    }
+
+    response = api_client.post("/api/v1/repositories/bulk/", data, format="json")
+    assert response.status_code == 200
+    assert [result["status"] for result in response.json()["results"]] == [
+        "subscribed",
+        "not_found",
+    ]
+
+    response = api_client.delete("/api/v1/repositories/bulk/", data, format="json")
+    assert response.status_code == 200
+    assert [result["status"] for result in response.json()["results"]] == [
+        "unsubscribed",
+        "not_found",
+    ]
+    assert not user.repositories.exists()
+
+    for method in (api_client.get, api_client.put, api_client.patch):
+        response = method("/api/v1/repositories/bulk/", data, format="json")
+        assert response.status_code == 405
+    assert not user.repositories.exists()
+
+
+@pytest.mark.django_db
+def test_import_user_repositories(
+    repository_service, user_service, monkeypatch, settings
+):
+    settings.REPOSITORY_IMPORT_BATCH_SIZE = 2
+    monkeypatch.setattr(
+        repository_service.clients[RepositoryTypes.GITHUB.value].session,
+        "get",
+        user_repositories_mock_get,
+    )
+    stored = Repository.objects.create(name="watched2", owner="test")
+    user = user_service.create_user(**user_data)
+
+    assert repository_service.import_user_repositories(user) == 5
+    assert set(user.repositories.values_list("name", flat=True)) == {
+        "watched1",
+        "watched2",
+        "watched3",
+        "starred1",
+    }
+    assert Repository.objects.filter(name="watched2").get() == stored
+    assert Repository.objects.get(name="starred1").github_id == 101
+
+
+@pytest.mark.django_db
+def test_import_repositories_view(
+    api_client, user_service, monkeypatch, repository_service
+):
+    monkeypatch.setattr(
+        repository_service.clients[RepositoryTypes.GITHUB.value].session,
+        "get",
+        user_repositories_mock_get,
+    )
+    user = user_service.create_user(**user_data)
+    api_client.force_authenticate(user=user)
+
+    response = api_client.post("/api/v1/repositories/import/")
+
+    assert response.status_code == 202
+    assert response.json()["task_id"]
+    assert user.repositories.count() == 4
+
+
+@pytest.mark.django_db
+def test_issue_stats_view_is_scoped_to_subscriptions(api_client, user_service):
+    user = user_service.create_user(**user_data)
+    api_client.force_authenticate(user=user)
+    repository = Repository.objects.create(name="stats", owner="test")
+
+    response = api_client.get("/api/v1/repositories/stats/stats/")
+    assert response.status_code == 404
+
+    repository.users.add(user)
+    response = api_client.get("/api/v1/repositories/stats/stats/")
+    assert response.status_code == 200
+    assert response.json()["days"] == []
+
+
+@pytest.mark.django_db
+def test_issue_export_view_is_scoped_to_subscriptions(api_client, user_service):
+    user = user_service.create_user(**user_data)
+    api_client.force_authenticate(user=user)
+    repository = Repository.objects.create(name="export", owner="test")
+
+    response = api_client.get("/api/v1/repositories/export/export/")
+    assert response.status_code == 404
+
+    repository.users.add(user)
+    response = api_client.get("/api/v1/repositories/export/export/")
+    assert response.status_code == 200
+    assert list(response.streaming_content) == []
+
+
+@pytest.mark.django_db
+def test_issue_history_view_is_scoped_to_subscriptions(
+    api_client, user_service, monkeypatch
+):
+    monkeypatch.setattr(RepositoryService, "sync_issue_timeline", lambda self, *args: 0)
+    user = user_service.create_user(**user_data)
+    api_client.force_authenticate(user=user)
+    repository = Repository.objects.create(name="history", owner="test")
+
+    response = api_client.get("/api/v1/repositories/history/issues/1/")
+    assert response.status_code == 404
+
+    repository.users.add(user)
+    response = api_client.get("/api/v1/repositories/history/issues/1/")
+    assert response.status_code == 200
+    assert response.json() == []
+
+
+@pytest.mark.django_db
+def test_import_user_repositories_task_failure():
+    assert import_user_repositories(0) == "error"
+
+
+def test_import_user_repositories_task_retries(token_user, monkeypatch):
+    retries = []
+
+    def retry(exc=None, countdown=None):
+        retries.append(countdown)
+        return RetryCalled()
+
+    errors = [
+        TooManyRequestException("GITHUB", retry_after=600),
+        requests.ConnectionError(),
+    ]
+
+    def import_repositories(self, user, repository_type):
+        raise errors.pop(0)
+
+    monkeypatch.setattr(import_user_repositories, "retry", retry)
+    monkeypatch.setattr(
+        RepositoryService, "import_user_repositories", import_repositories
+    )
+
+    for _ in range(2):
+        with pytest.raises(RetryCalled):
+            import_user_repositories(token_user.id)
+
+    assert 600 <= retries[0] <= 600 + settings.TASK_RETRY_JITTER
+    delay = import_user_repositories.default_retry_delay
+    assert delay <= retries[1] <= delay + settings.TASK_RETRY_JITTER
+
+
 def test_send_email_for_updated_repository():
     assert send_email_for_updated_repository("test", "test_user", "tets@gmail.com") == 1
 
@@ -416,17 +1654,445 @@ def test_send_email_for_updated_repository_failure():
     assert send_email_for_updated_repository("test1", "test_user", "") == 0
 
 
-def test_check_repositories_update():
+@pytest.fixture
+def stub_github(monkeypatch):
+    client = RepositoryService.clients[RepositoryTypes.GITHUB.value]
+    monkeypatch.setattr(client.session, "get", check_repository_success_mock_get)
+    monkeypatch.setattr(client, "_get_since", get_since_mock)
+
+
+@pytest.mark.django_db
+def test_check_repositories_update(user_service, stub_github):
+    user = user_service.create_user(**user_data)
     assert (
-        check_repositories_update("tets@gmail.com", "test", "test", "test") == "success"
+        check_repositories_update(["tets@gmail.com"], user.id, "test", "test")
+        == "success"
     )
+    assert mail.outbox[-1].to == ["tets@gmail.com"]
 
 
-def test_check_repositories_update_failure():
-    assert check_repositories_update("test", "test", "test3", "test") == "error"
+@pytest.mark.django_db
+def test_check_repositories_update_failure(user_service, stub_github):
+    user = user_service.create_user(**user_data)
+    assert check_repositories_update(["test"], user.id, "test4", "test") == "error"
+
+
+@pytest.mark.django_db
+def test_check_repositories_update_without_active_user(
+    check_task, user_service, monkeypatch
+):
+    calls = []
+    monkeypatch.setattr(
+        RepositoryService, "collect_issue_changes", lambda *args: calls.append(args)
+    )
+    user = user_service.create_user(**user_data)
+    user.is_active = False
+    user.save()
+
+    assert check_repositories_update(["test"], user.id, "test", "test") == "error"
+    assert calls == []
+    assert check_repositories_update.retry_countdowns == []
 
 
 @pytest.mark.django_db
 def test_check_users_repositories_update(user_service):
     user_service.create_user(**user_data)
     assert check_users_repositories_update() == "success"
+
+
+@pytest.mark.django_db
+def test_check_users_repositories_update_spreads_tokens(user_service, monkeypatch):
+    users = [
+        user_service.create_user(
+            username=f"pool_user{index}",
+            email=f"pool{index}@gmail.com",
+            password="test_password",
+            github_token=f"pool_token{index}",
+        )
+        for index in range(2)
+    ]
+    for index in range(4):
+        repository = Repository.objects.create(
+            name=f"pool{index}", owner="test", is_private=index == 3
+        )
+        repository.users.add(users[0])
+    SubscriberIndexService().rebuild(100)
+    record_rate_limit(
+        "pool_token0",
+        {"X-RateLimit-Remaining": "4000", "X-RateLimit-Reset": time.time() + 600},
+    )
+    scheduled = []
+    monkeypatch.setattr(
+        check_repositories_update, "delay", lambda *args: scheduled.append(args)
+    )
+
+    assert check_users_repositories_update() == "success"
+
+    token_users = {args[2]: args[1] for args in scheduled}
+    assert token_users == {
+        "pool0": users[1].id,
+        "pool1": users[1].id,
+        "pool2": users[1].id,
+        "pool3": users[0].id,
+    }
+    assert scheduled[0][0] == ["pool0@gmail.com"]
+
+
+@pytest.mark.django_db
+def test_subscriber_index(
+    user_service, django_capture_on_commit_callbacks, monkeypatch
+):
+    index = SubscriberIndexService()
+    user = user_service.create_user(
+        username="index_user",
+        email="index@gmail.com",
+        password="test_password",
+        github_token="index_token",
+    )
+    repository = Repository.objects.create(name="indexed", owner="test")
+    other = Repository.objects.create(name="indexed2", owner="test")
+
+    with django_capture_on_commit_callbacks(execute=True):
+        repository.users.add(user)
+        user.repositories.add(other)
+    assert index.get_many([repository.id, other.id]) == {
+        repository.id: [user.id],
+        other.id: [user.id],
+    }
+
+    with django_capture_on_commit_callbacks(execute=True):
+        user_service.update_user(username="index_user", email="new@gmail.com")
+        repository.users.remove(user)
+    assert index.get_many([repository.id, other.id]) == {
+        repository.id: [],
+        other.id: [user.id],
+    }
+
+    index.clear([other.id])
+    assert index.rebuild(100) >= 1
+    assert index.get_many([other.id]) == {other.id: [user.id]}
+
+    scheduled = []
+    monkeypatch.setattr(
+        check_repositories_update, "delay", lambda *args: scheduled.append(args)
+    )
+    assert check_users_repositories_update() == "success"
+    assert [args[0] for args in scheduled] == [["new@gmail.com"]]
+
+    user.is_active = False
+    user.save()
+    scheduled.clear()
+    assert check_users_repositories_update() == "success"
+    assert scheduled == []
+
+
+def test_replica_router(monkeypatch):
+    router = routers.ReplicaRouter()
+    with routers.read_from_replica():
+        assert router.db_for_read(Repository) is None
+
+    monkeypatch.setattr(routers, "_has_replica", lambda: True)
+    user_id = uuid.uuid4().int
+    assert router.db_for_read(Repository) is None
+    with routers.read_from_replica(user_id):
+        assert router.db_for_read(Repository) == "replica"
+        assert router.db_for_write(Repository) == "default"
+        with routers.read_from_primary():
+            assert router.db_for_read(Repository) is None
+        assert router.db_for_read(Repository) == "replica"
+
+    routers.pin_to_primary(user_id)
+    with routers.read_from_replica(user_id):
+        assert router.db_for_read(Repository) is None
+    with routers.read_from_replica():
+        assert router.db_for_read(Repository) == "replica"
+
+
+@pytest.mark.django_db(transaction=True)
+def test_record_pool_stats():
+    if connections["default"].pool is None:
+        pytest.skip("connection pooling is disabled")
+    labels = {"database": "default"}
+    record_pool_stats()
+    before = REGISTRY.get_sample_value("pilot_db_pool_checkouts_total", labels) or 0
+
+    connections["default"].close()
+    User.objects.exists()
+    record_pool_stats()
+
+    assert REGISTRY.get_sample_value("pilot_db_pool_checkouts_total", labels) > before
+    assert REGISTRY.get_sample_value(
+        "pilot_db_pool_connections", {**labels, "state": "open"}
+    )
+
+
+def test_token_pool():
+    record_rate_limit(
+        "pool_a",
+        {"X-RateLimit-Remaining": "102", "X-RateLimit-Reset": time.time() + 60},
+    )
+    record_rate_limit(
+        "pool_b",
+        {"X-RateLimit-Remaining": "103", "X-RateLimit-Reset": time.time() + 60},
+    )
+    record_rate_limit(
+        "pool_c", {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": time.time() - 60}
+    )
+    pool = TokenPool(["pool_a", "pool_b"])
+
+    acquired = [pool.acquire() for _ in range(6)]
+    assert acquired[0] == "pool_b" and acquired[-1] is None
+    assert sorted(acquired[:-1]) == ["pool_a", "pool_a", "pool_b", "pool_b", "pool_b"]
+    assert pool.acquire(["pool_a", "unknown"]) is None
+    assert TokenPool(["pool_c"]).acquire(["pool_c"]) == "pool_c"
+
+
+class RetryCalled(Exception):
+    pass
+
+
+@pytest.fixture
+def token_user(db, user_service) -> User:
+    return user_service.create_user(**user_data)
+
+
+@pytest.fixture
+def check_task(monkeypatch, repository_service):
+    retries = []
+
+    def retry(exc=None, countdown=None):
+        retries.append(countdown)
+        return RetryCalled()
+
+    monkeypatch.setattr(check_repositories_update, "retry", retry)
+    monkeypatch.setattr(check_repositories_update, "retry_countdowns", retries, False)
+
+    def raise_on_check(exc):
+        def check(*args, **kwargs):
+            raise exc
+
+        monkeypatch.setattr(RepositoryService, "collect_issue_changes", check)
+
+    return raise_on_check
+
+
+def test_check_repositories_update_rate_limited_retries_at_reset(
+    check_task, token_user
+):
+    check_task(TooManyRequestException("GITHUB", retry_after=600))
+
+    with pytest.raises(RetryCalled):
+        check_repositories_update(["test@gmail.com"], token_user.id, "test", "test")
+
+    countdown = check_repositories_update.retry_countdowns[0]
+    assert 600 <= countdown <= 600 + settings.TASK_RETRY_JITTER
+
+
+def test_check_repositories_update_transient_error_backs_off(check_task, token_user):
+    check_task(requests.ConnectionError())
+
+    with pytest.raises(RetryCalled):
+        check_repositories_update(["test@gmail.com"], token_user.id, "test", "test")
+
+    countdown = check_repositories_update.retry_countdowns[0]
+    delay = check_repositories_update.default_retry_delay
+    assert delay <= countdown <= delay + settings.TASK_RETRY_JITTER
+
+
+def test_check_repositories_update_client_error_is_not_retried(check_task, token_user):
+    response = requests.Response()
+    response.status_code = 401
+    check_task(requests.HTTPError(response=response))
+
+    assert (
+        check_repositories_update(["test@gmail.com"], token_user.id, "t", "t")
+        == "error"
+    )
+    assert check_repositories_update.retry_countdowns == []
+
+
+@pytest.mark.django_db
+def test_check_repositories_update_deactivates_archived(check_task, token_user):
+    Repository.objects.create(name="archived", owner="test")
+    check_task(RepositoryUnavailableException("archived"))
+
+    assert (
+        check_repositories_update(["a@gmail.com"], token_user.id, "archived", "test")
+        == "error"
+    )
+
+    repository = Repository.objects.get(name="archived")
+    assert not repository.is_active and repository.is_archived
+
+
+@pytest.mark.django_db
+def test_check_repositories_update_confirms_public_repository_is_missing(
+    check_task, token_user, monkeypatch
+):
+    Repository.objects.create(name="gone", owner="test", is_private=False)
+    check_task(RepositoryUnavailableException("not_found"))
+    lookups = []
+    visible = [True]
+
+    def fetch_repository(repo_name, owner, token):
+        lookups.append(token)
+        if not visible[0]:
+            return {"exists": False, "fetched_at": time.time()}
+        return get_repository_mock("test")
+
+    monkeypatch.setattr(
+        RepositoryService.clients[RepositoryTypes.GITHUB.value],
+        "fetch_repository",
+        fetch_repository,
+    )
+
+    assert check_repositories_update([], token_user.id, "gone", "test") == "error"
+    assert Repository.objects.get(name="gone").is_active
+
+    visible[0] = False
+    assert check_repositories_update([], token_user.id, "gone", "test") == "error"
+    repository = Repository.objects.get(name="gone")
+    assert not repository.is_active and not repository.is_archived
+    assert lookups == [None, None]
+
+
+@pytest.mark.django_db
+def test_check_repositories_update_revokes_access_to_private_repository(
+    check_task, token_user, user_service
+):
+    other = user_service.create_user(
+        username="other_user",
+        email="other@gmail.com",
+        password="test_password",
+        github_token="other_token",
+    )
+    repository = Repository.objects.create(name="secret", owner="test", is_private=True)
+    repository.users.add(token_user, other)
+    check_task(RepositoryUnavailableException("not_found"))
+
+    assert check_repositories_update([], token_user.id, "secret", "test") == "error"
+    repository.refresh_from_db()
+    assert repository.is_active
+    assert list(
+        Subscription.objects.filter(repository=repository, has_access=True).values_list(
+            "user_id", flat=True
+        )
+    ) == [other.id]
+
+    assert check_repositories_update([], other.id, "secret", "test") == "error"
+    repository.refresh_from_db()
+    assert not repository.is_active and not repository.is_archived
+
+
+@pytest.mark.django_db
+def test_missing_repository_is_reactivated(
+    repository_service, user_service, monkeypatch
+):
+    client = repository_service.clients[RepositoryTypes.GITHUB.value]
+    monkeypatch.setattr(client, "get_repository", get_repository_mock)
+    monkeypatch.setattr(client, "fetch_repository", get_repository_mock)
+    Repository.objects.create(
+        name="test", owner="test", is_private=False, is_active=False
+    )
+    user = user_service.create_user(**user_data)
+
+    assert repository_service.subscribe_repository(
+        user, {"name": "test", "owner": "test", "repository_type": 1}
+    )
+    assert Repository.objects.get(name="test").is_active
+
+    Repository.objects.filter(name="test").update(is_active=False)
+    assert repository_service.refresh_repository("test", "test", "test_token")
+    assert Repository.objects.get(name="test").is_active
+
+
+def test_sync_issue_timelines_resolves_the_token(token_user, monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        RepositoryService,
+        "sync_issue_timelines",
+        lambda self, *args: calls.append(args) or len(args[3]),
+    )
+
+    assert sync_issue_timelines("test", "test", token_user.id, [1, 2]) == "success"
+    assert calls == [("test", "test", "test_token", [1, 2], 1)]
+
+    token_user.is_active = False
+    token_user.save()
+    assert sync_issue_timelines("test", "test", token_user.id, [1]) == "error"
+    assert len(calls) == 1
+
+
+def test_exceptions_carry_their_detail():
+    assert str(TooManyRequestException("GITHUB")) == "Too Many Request GITHUB"
+    assert str(CircuitOpenException("GITHUB")) == "Service Unavailable GITHUB"
+    exception = RepositoryUnavailableException("archived")
+    assert str(exception) == "Repository unavailable: archived"
+    assert exception.get_codes() == "repository_unavailable"
+
+
+def test_collect_issue_changes_archived(repository_service, monkeypatch):
+    client = repository_service.clients[RepositoryTypes.GITHUB.value]
+    monkeypatch.setattr(
+        client,
+        "get_repository",
+        lambda *args: {"exists": True, "archived": True, "disabled": False},
+    )
+
+    with pytest.raises(RepositoryUnavailableException) as e:
+        repository_service.collect_issue_changes("test", "test", "test")
+    assert e.value.reason == "archived"
+
+
+def test_get_retry_after(github_client):
+    response = requests.Response()
+    response.headers["X-RateLimit-Reset"] = str(int(time.time()) + 100)
+    assert 98 <= github_client._get_retry_after(response) <= 100
+    response.headers["Retry-After"] = "60"
+    assert github_client._get_retry_after(response) == 60
+
+
+def test_task_duration_metrics():
+    labels = {
+        "task": "pilot.tasks.send_email_for_updated_repository",
+        "outcome": "success",
+    }
+    before = REGISTRY.get_sample_value("pilot_task_duration_seconds_count", labels) or 0
+    send_email_for_updated_repository.delay("test", "test_user", "tets@gmail.com")
+    after = REGISTRY.get_sample_value("pilot_task_duration_seconds_count", labels)
+    assert after == before + 1
+
+
+def test_polling_tasks_ignore_result():
+    assert check_repositories_update.ignore_result
+    assert send_email_for_updated_repository.ignore_result
+
+
+@pytest.mark.django_db
+def test_flush_task_outcomes():
+    service = TaskOutcomeService()
+    task_name = f"pilot.tasks.test_{uuid.uuid4().hex}"
+    service.record_outcome(task_name, "success")
+    service.record_outcome(task_name, "success")
+    service.record_outcome(task_name, "rate_limited")
+
+    assert service.flush_outcomes([task_name]) == 1
+    assert service.flush_outcomes([task_name]) == 1
+
+    stat = TaskOutcomeStat.objects.get(task_name=task_name)
+    assert (stat.successes, stat.errors, stat.rate_limited) == (2, 0, 1)
+
+
+@pytest.mark.django_db
+def test_prune_task_results():
+    for index in range(5):
+        TaskResult.objects.create(task_id=f"task-{index}")
+    old = TaskResult.objects.filter(task_id__in=["task-0", "task-1", "task-2"])
+    old.update(date_done=timezone.now() - timedelta(days=30))
+
+    deleted = TaskOutcomeService().prune_task_results(
+        timezone.now() - timedelta(days=7), batch_size=2
+    )
+
+    assert deleted == 3
+    assert TaskResult.objects.count() == 2
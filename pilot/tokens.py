@@ -0,0 +1,109 @@
+import heapq
+import time
+from collections.abc import Iterable, Mapping
+
+from django.conf import settings
+from django.core.cache import cache
+
+from pilot.metrics import token_fingerprint
+
+
+def _get_state_key(fingerprint: str) -> str:
+    return f"token_state:{fingerprint}"
+
+
+def record_rate_limit(token: str, headers: Mapping) -> None:
+    """
+    Stores the rate limit state GitHub reported for a token.
+
+    The state expires when the limit resets, after which the token counts as
+    having its full budget again.
+
+    Args:
+        token (str): The token used for the request.
+        headers (Mapping): The response headers.
+    """
+    remaining = headers.get("X-RateLimit-Remaining")
+    reset = headers.get("X-RateLimit-Reset")
+    if remaining is None or reset is None:
+        return
+    cache.set(
+        _get_state_key(token_fingerprint(token)),
+        {"remaining": int(remaining), "reset": int(reset)},
+        max(int(reset) - int(time.time()), 1),
+    )
+
+
+class TokenPool:
+    """
+    Hands out tokens by their remaining rate limit budget.
+
+    The pool loads the last state GitHub reported for every token once, then
+    keeps its own count as tokens are acquired, so the checks scheduled in one
+    polling cycle spread over the tokens instead of piling on the first one.
+    Tokens at or below GITHUB_TOKEN_RESERVE are left alone so their owners keep
+    some budget for their own use.
+
+    Args:
+        tokens (Iterable[str]): The tokens in the pool.
+    """
+
+    def __init__(self, tokens: Iterable[str]):
+        self.tokens = {token_fingerprint(token): token for token in tokens}
+        states = cache.get_many([_get_state_key(fp) for fp in self.tokens])
+        now = time.time()
+        self.remaining = {}
+        for fingerprint in self.tokens:
+            state = states.get(_get_state_key(fingerprint))
+            if state is None or state["reset"] <= now:
+                self.remaining[fingerprint] = settings.GITHUB_TOKEN_BUDGET
+            else:
+                self.remaining[fingerprint] = state["remaining"]
+        self._heap = [(-remaining, fp) for fp, remaining in self.remaining.items()]
+        heapq.heapify(self._heap)
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    def _take(self, fingerprint: str) -> str | None:
+        remaining = self.remaining[fingerprint]
+        if remaining <= settings.GITHUB_TOKEN_RESERVE:
+            return None
+        self.remaining[fingerprint] = remaining - 1
+        heapq.heappush(self._heap, (1 - remaining, fingerprint))
+        return self.tokens[fingerprint]
+
+    def _healthiest(self) -> str | None:
+        # Entries whose count changed since they were pushed are stale; the
+        # current one was pushed again by _take.
+        while self._heap:
+            remaining, fingerprint = self._heap[0]
+            if -remaining == self.remaining[fingerprint]:
+                return fingerprint
+            heapq.heappop(self._heap)
+        return None
+
+    def acquire(self, eligible: Iterable[str] | None = None) -> str | None:
+        """
+        Takes one request's worth of budget from the healthiest eligible token.
+
+        Args:
+            eligible (Iterable[str] | None): The tokens allowed for the request,
+                or None if any token in the pool will do.
+
+        Returns:
+            str | None: The token, or None if no eligible token has budget left.
+        """
+        if eligible is None:
+            fingerprint = self._healthiest()
+        else:
+            fingerprint = max(
+                (fp for fp in map(token_fingerprint, eligible) if fp in self.tokens),
+                key=self.remaining.__getitem__,
+                default=None,
+            )
+        if fingerprint is None:
+            return None
+        if eligible is None:
+            heapq.heappop(self._heap)
+        return self._take(fingerprint)
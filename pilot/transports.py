@@ -0,0 +1,155 @@
+import itertools
+import time
+from abc import ABC, abstractmethod
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.util import Retry
+from urllib3.util.retry import RequestHistory
+
+
+class Transport(ABC):
+    """
+    Abstract base class for the HTTP transports used by the clients.
+
+    Transports return `requests.Response` objects and raise `requests` exceptions,
+    so the response handling, caching and rate limit logic of the clients works
+    the same whichever protocol is used.
+
+    Args:
+        pool_size (int): The maximum number of connections kept per host.
+        retry (Retry): The retry policy for failed requests.
+    """
+
+    def __init__(self, pool_size: int, retry: Retry):
+        self.pool_size = pool_size
+        self.retry = retry
+
+    @abstractmethod
+    def get(self, url: str, headers: dict) -> requests.Response:
+        """Send a GET request.
+
+        Args:
+            url (str): The URL to request.
+            headers (dict): The request headers.
+
+        Returns:
+            requests.Response: The response.
+        """
+
+    @abstractmethod
+    def close(self) -> None:
+        """Close the open connections."""
+
+
+class RequestsTransport(Transport):
+    """
+    HTTP/1.1 transport backed by a `requests` session, one connection per
+    in-flight request.
+    """
+
+    def __init__(self, pool_size: int, retry: Retry):
+        super().__init__(pool_size, retry)
+        adapter = HTTPAdapter(max_retries=retry, pool_maxsize=pool_size)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def get(self, url: str, headers: dict) -> requests.Response:
+        return self.session.get(url, headers=headers)
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class HTTP2Transport(Transport):
+    """
+    HTTP/2 transport backed by `httpx`, multiplexing concurrent requests to a host
+    over a few connections.
+
+    Plain `http://` URLs are spoken HTTP/2 with prior knowledge, which is only
+    useful against local stubs. Status retries follow the same `Retry` policy as
+    RequestsTransport.
+    """
+
+    def __init__(
+        self,
+        pool_size: int,
+        retry: Retry,
+        http1: bool = True,
+        streams_per_connection: int = 25,
+    ):
+        import httpx
+
+        super().__init__(pool_size, retry)
+        # httpx keeps a single HTTP/2 connection per host whose frames are read by
+        # one caller at a time, so requests are spread over a few clients to keep
+        # that contention bounded.
+        self.clients = [
+            httpx.Client(
+                transport=httpx.HTTPTransport(
+                    http1=http1, http2=True, retries=retry.total
+                ),
+                timeout=None,
+            )
+            for _ in range(max(1, -(-pool_size // streams_per_connection)))
+        ]
+        self._next_client = itertools.cycle(self.clients)
+        self._transport_error = httpx.TransportError
+
+    def _to_response(self, url: str, response) -> requests.Response:
+        converted = requests.Response()
+        converted.status_code = response.status_code
+        converted.headers = CaseInsensitiveDict(response.headers)
+        converted._content = response.content
+        converted.encoding = response.encoding
+        converted.reason = response.reason_phrase
+        converted.url = url
+        return converted
+
+    def get(self, url: str, headers: dict) -> requests.Response:
+        retry = self.retry
+        while True:
+            try:
+                response = next(self._next_client).get(url, headers=headers)
+            except self._transport_error as e:
+                raise requests.ConnectionError(e) from e
+
+            has_retry_after = "Retry-After" in response.headers
+            if not retry.is_retry("GET", response.status_code, has_retry_after):
+                break
+            retry = retry.new(
+                total=retry.total - 1,
+                history=retry.history
+                + (RequestHistory("GET", url, None, response.status_code, None),),
+            )
+            if retry.is_exhausted():
+                break
+            time.sleep(retry.get_backoff_time())
+        return self._to_response(url, response)
+
+    def close(self) -> None:
+        for client in self.clients:
+            client.close()
+
+
+transports = {
+    "http1": RequestsTransport,
+    "http2": HTTP2Transport,
+}
+
+
+def get_transport(name: str, pool_size: int, retry: Retry) -> Transport:
+    """
+    Builds the transport registered under a name.
+
+    Args:
+        name (str): The transport name, "http1" or "http2".
+        pool_size (int): The maximum number of connections kept per host.
+        retry (Retry): The retry policy for failed requests.
+
+    Returns:
+        Transport: The transport.
+    """
+    return transports[name](pool_size, retry)
@@ -9,8 +9,21 @@ urlpatterns = [
         views.RepositoryViewSet.as_view(),
         name="unsubscribe",
     ),
+    path("bulk/", views.BulkRepositoryViewSet.as_view(), name="bulk"),
+    path("import/", views.ImportRepositoriesView.as_view(), name="import"),
+    path("search/", views.IssueSearchView.as_view(), name="search"),
     path(
-        "<str:repo_name>/issues/<str:issue_id>/",
+        "<str:repo_name>/export/",
+        views.IssueExportView.as_view(),
+        name="export",
+    ),
+    path(
+        "<str:repo_name>/stats/",
+        views.IssueStatsView.as_view(),
+        name="stats",
+    ),
+    path(
+        "<str:repo_name>/issues/<int:issue_id>/",
         views.IssueHistoryView.as_view(),
         name="history",
     ),
@@ -1,18 +1,32 @@
+from django.http import HttpResponse, StreamingHttpResponse
 from rest_framework import status
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from IssuePilot.routers import iter_from_replica, read_from_replica
 from pilot.exceptions import RepositoryNotFoundException
-from pilot.serializers import RepositorySerializer
-from pilot.services import RepositoryService
+from pilot.metrics import render_metrics
+from pilot.serializers import (
+    BulkRepositorySerializer,
+    IssueExportQuerySerializer,
+    IssueHistoryQuerySerializer,
+    IssueSearchQuerySerializer,
+    IssueStatsQuerySerializer,
+    RepositorySerializer,
+)
+from pilot.services import IssueExportService, IssueStatsService, RepositoryService
+from pilot.tasks import import_user_repositories
+from users.authentication import CachedTokenAuthentication
+from users.throttling import ScopedSlidingWindowThrottle
 
 
 class RepositoryViewSet(APIView):
     serializer_class = RepositorySerializer
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
+    throttle_classes = [ScopedSlidingWindowThrottle]
+    throttle_scope = "subscribe"
     service = RepositoryService()
 
     def post(self, request, *args, **kwargs):
@@ -38,16 +52,150 @@ class RepositoryViewSet(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+class BulkRepositoryViewSet(APIView):
+    serializer_class = BulkRepositorySerializer
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [CachedTokenAuthentication]
+    throttle_classes = [ScopedSlidingWindowThrottle]
+    throttle_scope = "subscribe"
+    service = RepositoryService()
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = self.service.bulk_subscribe_repositories(
+            request.user, serializer.validated_data["repositories"]
+        )
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
+    def delete(self, request, *args, **kwargs):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = self.service.bulk_unsubscribe_repositories(
+            request.user, serializer.validated_data["repositories"]
+        )
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
+
+class ImportRepositoriesView(APIView):
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [CachedTokenAuthentication]
+    throttle_classes = [ScopedSlidingWindowThrottle]
+    throttle_scope = "subscribe"
+
+    def post(self, request, *args, **kwargs):
+        result = import_user_repositories.delay(request.user.id)
+        return Response({"task_id": result.id}, status=status.HTTP_202_ACCEPTED)
+
+
 class IssueHistoryView(APIView):
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
+    throttle_classes = [ScopedSlidingWindowThrottle]
+    throttle_scope = "history"
     service = RepositoryService()
 
     def get(self, request, repo_name, issue_id):
-        history = self.service.get_issue_timeline(repo_name, request.user, issue_id)
+        query = IssueHistoryQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        with read_from_replica(request.user.id):
+            history = self.service.get_issue_timeline(
+                repo_name, request.user, issue_id, **query.validated_data
+            )
         if history is None:
             return Response(
                 {"error": str(RepositoryNotFoundException())},
                 status=status.HTTP_404_NOT_FOUND,
             )
-        return Response(history, status=status.HTTP_200_OK)
+        events, next_cursor = history
+        response = Response(events, status=status.HTTP_200_OK)
+        if next_cursor is not None:
+            params = request.query_params.copy()
+            params["after"] = next_cursor
+            url = request.build_absolute_uri(f"{request.path}?{params.urlencode()}")
+            response["Link"] = f'<{url}>; rel="next"'
+        return response
+
+
+class IssueSearchView(APIView):
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [CachedTokenAuthentication]
+    throttle_classes = [ScopedSlidingWindowThrottle]
+    throttle_scope = "read"
+    service = RepositoryService()
+
+    def get(self, request):
+        query = IssueSearchQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        with read_from_replica(request.user.id):
+            results = self.service.search_issues(
+                request.user,
+                query.validated_data["q"],
+                query.validated_data["page"],
+                query.validated_data.get("page_size"),
+            )
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
+
+class IssueStatsView(APIView):
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [CachedTokenAuthentication]
+    throttle_classes = [ScopedSlidingWindowThrottle]
+    throttle_scope = "read"
+    service = IssueStatsService()
+
+    def get(self, request, repo_name):
+        query = IssueStatsQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        with read_from_replica(request.user.id):
+            stats = self.service.get_repository_stats(
+                repo_name, request.user, query.validated_data["days"]
+            )
+        if stats is None:
+            return Response(
+                {"error": str(RepositoryNotFoundException())},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        return Response(stats, status=status.HTTP_200_OK)
+
+
+class IssueExportView(APIView):
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [CachedTokenAuthentication]
+    throttle_classes = [ScopedSlidingWindowThrottle]
+    throttle_scope = "read"
+    service = IssueExportService()
+    content_types = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+    def get(self, request, repo_name):
+        query = IssueExportQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        output = query.validated_data["output"]
+        with read_from_replica(request.user.id):
+            lines = self.service.export(
+                repo_name,
+                output,
+                query.validated_data.get("after"),
+                user=request.user,
+            )
+        if lines is None:
+            return Response(
+                {"error": str(RepositoryNotFoundException())},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        response = StreamingHttpResponse(
+            iter_from_replica(lines, request.user.id),
+            content_type=self.content_types[output],
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="{repo_name}-issues.{output}"'
+        )
+        return response
+
+
+def metrics(request):
+    """
+    Exposes the application metrics in the Prometheus text format.
+    """
+    body, content_type = render_metrics()
+    return HttpResponse(body, content_type=content_type)
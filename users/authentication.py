@@ -0,0 +1,100 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+
+
+class _LocalCache:
+    """
+    A small thread-safe LRU cache whose entries expire after a fixed time.
+
+    Args:
+        max_size (int): The number of entries kept.
+        ttl (float): The lifetime of an entry in seconds.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, object]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_local_cache = _LocalCache(
+    settings.AUTH_LOCAL_CACHE_SIZE, settings.AUTH_LOCAL_CACHE_TTL
+)
+
+
+def _get_cache_key(key: str) -> str:
+    # Tokens are credentials, so only their digest is used as a cache key.
+    return f"auth_token:{hashlib.sha256(key.encode()).hexdigest()}"
+
+
+def invalidate_token(key: str) -> None:
+    """
+    Drops the cached user of a token from Redis and from this process.
+
+    Other processes keep their local entry for at most AUTH_LOCAL_CACHE_TTL.
+
+    Args:
+        key (str): The token key.
+    """
+    cache_key = _get_cache_key(key)
+    cache.delete(cache_key)
+    _local_cache.delete(cache_key)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication that caches each token together with its user.
+
+    Tokens are looked up in a per-process LRU first, then in Redis, and only then
+    in the database. Only active users are cached, and the entry of a token is
+    dropped when the token is deleted or its user is saved, so deactivating or
+    updating a user takes effect within AUTH_LOCAL_CACHE_TTL.
+    """
+
+    def authenticate_credentials(self, key):
+        cache_key = _get_cache_key(key)
+        if (token := _local_cache.get(cache_key)) is not None:
+            return token.user, token
+        if (token := cache.get(cache_key)) is not None:
+            _local_cache.set(cache_key, token)
+            return token.user, token
+
+        # Raises for unknown keys and inactive users, so only active users are cached.
+        user, token = super().authenticate_credentials(key)
+        cache.set(cache_key, token, settings.AUTH_CACHE_TTL)
+        _local_cache.set(cache_key, token)
+        return user, token
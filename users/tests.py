@@ -1,7 +1,16 @@
+import uuid
+from types import SimpleNamespace
+
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
 
+from users.authentication import CachedTokenAuthentication, _local_cache
 from users.serializers import CreateUserSerializer, UpdateUserSerializer
 from users.services import UserService
+from users.throttling import ScopedSlidingWindowThrottle
 from users.utils import decrypt_data, encrypt_data
 
 
@@ -164,3 +173,76 @@ def test_encrypt_data_and_decrypt_data():
     encrypted_string = encrypt_data(test_string)
     decrypted_string = decrypt_data(encrypted_string)
     assert decrypted_string == test_string
+
+
+@pytest.mark.django_db
+def test_cached_token_authentication():
+    """
+    Test case for the cached token authentication.
+
+    This test verifies that a token is authenticated without database queries once
+    cached, and that saving its user drops the cached entry.
+
+    Steps:
+    1. Create a user and authenticate their token once.
+    2. Assert that authenticating the token again runs no queries.
+    3. Deactivate the user and assert that the token is rejected.
+    """
+    _local_cache.clear()
+    service = UserService()
+    user = service.create_user(
+        username="test_user",
+        email="test@gmail.com",
+        password="test_password",
+        github_token="test_token",
+    )
+    key = Token.objects.get(user=user).key
+    authentication = CachedTokenAuthentication()
+    authentication.authenticate_credentials(key)
+
+    with CaptureQueriesContext(connection) as queries:
+        cached_user, _ = authentication.authenticate_credentials(key)
+    assert cached_user.pk == user.pk
+    assert len(queries) == 0
+
+    user.is_active = False
+    user.save()
+    with pytest.raises(AuthenticationFailed):
+        authentication.authenticate_credentials(key)
+
+
+def test_sliding_window_throttle(monkeypatch):
+    """
+    Test case for the sliding window throttle.
+
+    This test verifies that a user is let through up to the rate of the scope of
+    the view, and then told how long to wait.
+    """
+    scope = f"test_{uuid.uuid4().hex}"
+    monkeypatch.setattr(ScopedSlidingWindowThrottle, "THROTTLE_RATES", {scope: "2/min"})
+    request = SimpleNamespace(user=SimpleNamespace(is_authenticated=True, pk=1))
+    view = SimpleNamespace(throttle_scope=scope)
+
+    throttle = ScopedSlidingWindowThrottle()
+    assert throttle.allow_request(request, view)
+    assert throttle.allow_request(request, view)
+    assert not throttle.allow_request(request, view)
+    assert 1 <= throttle.wait() <= 60
+
+
+@pytest.mark.django_db
+def test_throttled_view_returns_retry_after(api_client, monkeypatch):
+    """
+    Test case for a throttled endpoint.
+
+    This test verifies that a request over the rate of the register scope gets a
+    429 response with a Retry-After header.
+    """
+    monkeypatch.setattr(
+        ScopedSlidingWindowThrottle, "THROTTLE_RATES", {"register": "0/min"}
+    )
+    data = {"username": "test_user", "email": "test@gmail.com", "password": "test"}
+
+    response = api_client.post("/api/v1/users/register/", data)
+    assert response.status_code == 429
+    assert 1 <= int(response.headers["Retry-After"]) <= 60
@@ -0,0 +1,92 @@
+import logging
+import math
+import time
+
+from redis.exceptions import RedisError
+from rest_framework.throttling import SimpleRateThrottle
+
+from pilot.cache import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# Counts the request in the current window unless the weighted sum of the previous
+# and current windows reached the limit. Returns 0 when the request is allowed,
+# otherwise the milliseconds until it would be.
+_SLIDING_WINDOW_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local elapsed = tonumber(ARGV[3])
+local current = tonumber(redis.call("GET", KEYS[1]) or "0")
+local previous = tonumber(redis.call("GET", KEYS[2]) or "0")
+local weight = (window * 1000 - elapsed) / (window * 1000)
+if previous * weight + current < limit then
+    redis.call("INCR", KEYS[1])
+    redis.call("EXPIRE", KEYS[1], window * 2)
+    return 0
+end
+if current >= limit or previous == 0 then
+    return window * 1000 - elapsed
+end
+local until_allowed = window * 1000 * (1 - (limit - current) / previous)
+return math.max(math.ceil(until_allowed - elapsed), 1)
+"""
+
+
+class ScopedSlidingWindowThrottle(SimpleRateThrottle):
+    """
+    Throttle that limits each user, or each client address when anonymous, per
+    scope with a Redis sliding window counter.
+
+    The scope comes from the `throttle_scope` attribute of the view and its rate
+    from DEFAULT_THROTTLE_RATES. Requests are counted in fixed windows, and the
+    count of the previous window is weighted by how much of it still overlaps
+    the sliding window. Checking and counting a request is a single script call,
+    so it costs one Redis round trip. Requests are let through when Redis is
+    unreachable.
+    """
+
+    scope_attr = "throttle_scope"
+    script = None
+
+    def __init__(self):
+        # The rate is only known once the view, and so the scope, is.
+        self.wait_seconds = None
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return f"throttle:{self.scope}:{ident}"
+
+    def allow_request(self, request, view):
+        self.scope = getattr(view, self.scope_attr, None)
+        if not self.scope:
+            return True
+        self.rate = self.get_rate()
+        if self.rate is None:
+            return True
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+
+        self.key = self.get_cache_key(request, view)
+        window, offset = divmod(time.time(), self.duration)
+        if ScopedSlidingWindowThrottle.script is None:
+            ScopedSlidingWindowThrottle.script = get_redis_client().register_script(
+                _SLIDING_WINDOW_SCRIPT
+            )
+        try:
+            wait = self.script(
+                keys=[f"{self.key}:{int(window)}", f"{self.key}:{int(window) - 1}"],
+                args=[self.num_requests, self.duration, int(offset * 1000)],
+                client=get_redis_client(),
+            )
+        except RedisError as e:
+            logger.warning("Throttle check failed for %s: %s", self.scope, e)
+            return True
+        if wait:
+            self.wait_seconds = math.ceil(wait / 1000)
+            return False
+        return True
+
+    def wait(self):
+        return self.wait_seconds
@@ -1,6 +1,7 @@
 from cryptography.fernet import Fernet
 
 from IssuePilot import settings
+from IssuePilot.tracing import tracer
 
 cipher_suite = Fernet(settings.FERNET_KEY.encode())
 
@@ -16,7 +17,8 @@ def encrypt_data(data: str) -> str:
         bytes: The encrypted data.
 
     """
-    encrypted_data = cipher_suite.encrypt(data.encode())
+    with tracer.start_as_current_span("fernet.encrypt"):
+        encrypted_data = cipher_suite.encrypt(data.encode())
     return encrypted_data.decode()
 
 
@@ -31,5 +33,6 @@ def decrypt_data(encrypted_data: str) -> str:
         str: The decrypted string.
 
     """
-    decrypted_data = cipher_suite.decrypt(encrypted_data).decode()
+    with tracer.start_as_current_span("fernet.decrypt"):
+        decrypted_data = cipher_suite.decrypt(encrypted_data).decode()
     return decrypted_data
@@ -1,12 +1,13 @@
 from rest_framework import status
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from users.authentication import CachedTokenAuthentication
 from users.models import User
 from users.serializers import CreateUserSerializer, UpdateUserSerializer
 from users.services import UserService
+from users.throttling import ScopedSlidingWindowThrottle
 
 
 class CreateUserView(APIView):
@@ -22,6 +23,8 @@ class CreateUserView(APIView):
         serializer_class (Serializer): The serializer class for creating users.
     """
 
+    throttle_classes = [ScopedSlidingWindowThrottle]
+    throttle_scope = "register"
     queryset = User.objects.all()
     serializer_class = CreateUserSerializer
     service = UserService()
@@ -56,7 +59,9 @@ class UpdateUserView(APIView):
     """
 
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
+    throttle_classes = [ScopedSlidingWindowThrottle]
+    throttle_scope = "account"
     queryset = User.objects.all()
     serializer_class = UpdateUserSerializer
     service = UserService()